@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
-from src.Curses.main import main
+import sys
 
 if __name__ == '__main__':
+    # With a word list or --enrich, cards are made without the interface.
+    if len(sys.argv) > 1:
+        from src.bulk import main as bulk_main
+        raise SystemExit(bulk_main(sys.argv[1:]))
+
+    from src.Curses.main import main
     try:
         main()
     except KeyboardInterrupt:
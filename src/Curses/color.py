@@ -116,6 +116,9 @@ class _Color:
         self.success   = _Color.color(c, 'c.success')
         self.syn       = _Color.color(c, 'c.syn')
 
+    def values(self) -> tuple[int, ...]:
+        return tuple(getattr(self, x) for x in self.__slots__)
+
     def init(self, c: config_t, ncolors: int) -> None:
         for k, v in COLOR_NAME_TO_COLOR.items():
             COLOR_NAME_TO_COLOR[k] = v % ncolors
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import curses
-import functools
 from typing import Callable
 from typing import get_args
 from typing import Mapping
@@ -25,6 +24,7 @@ from src.data import config_save
 from src.data import config_t
 from src.data import configkey_t
 from src.data import configval_t
+from src.Dictionaries.wordnet import wordnet_database_paths
 
 
 def _configv_annotations(key: str) -> list[str]:
@@ -158,18 +158,19 @@ Column([
         Option(
             'note',
             'Note used for adding cards',
-            functools.partial(anki.invoke, 'modelNames')
+            anki.models.model_names
         ),
         Option(
             'deck',
             'Deck used for adding cards',
-            functools.partial(anki.invoke, 'deckNames')
+            anki.models.deck_names
         ),
         Option(
             'mediadir',
             'Path to the media directory',
             anki.collection_media_paths
         ),
+        Option('mediaupload', 'Upload audio through AnkiConnect', bool),
         Option('duplicates', 'Allow duplicates', bool),
         Option(
             'dupescope',
@@ -200,6 +201,11 @@ Column([
             _configv_annotations('secondary'),
             strict=True
         ),
+        Option(
+            'wordnetdir',
+            'Path to the WordNet database used by `wordnet-local`',
+            wordnet_database_paths
+        ),
         ]
     ),
     Section(
@@ -220,6 +226,16 @@ Column([
             'Hide the F-key help bar on program startup',
             bool
         ),
+        Option(
+            'prebuild',
+            'Lay out the next dictionary while waiting for input',
+            bool
+        ),
+        Option(
+            'framelog',
+            'Write frame timings (F12 overlay) to frames.jsonl',
+            bool
+        ),
         ]
     )
 ]),
@@ -16,9 +16,9 @@ import atexit
 import functools
 import subprocess
 import os
+import time
 from collections import deque
 from typing import Callable
-from typing import Iterator
 from typing import Mapping
 from typing import NamedTuple
 from typing import Sequence
@@ -32,6 +32,7 @@ from src.Curses.color import ATTR_NAME_TO_ATTR
 from src.Curses.color import init_colors
 from src.Curses.configmenu import ConfigMenu
 from src.Curses.pager import Pager
+from src.Curses.profiling import profiler
 from src.Curses.prompt import CompletionMenu
 from src.Curses.prompt import Prompt
 from src.Curses.proto import extra_margin
@@ -40,6 +41,7 @@ from src.Curses.proto import StatusProto
 from src.Curses.screen import Screen
 from src.Curses.util import Attr
 from src.Curses.util import clipboard_or_selection
+from src.Curses.util import compile_search_pattern
 from src.Curses.util import compose_attrs
 from src.Curses.util import CURSES_COLS_MIN_VALUE
 from src.Curses.util import Mpv
@@ -50,12 +52,15 @@ from src.Curses.util import mouse_left_click
 from src.Curses.util import mouse_wheel_click
 from src.Curses.util import mouse_wheel_down
 from src.Curses.util import mouse_wheel_up
+from src.Curses.util import split_search_phrase
 from src.Curses.util import start_mpv_play_url
 from src.Curses.util import truncate
+from src.Curses.worker import Worker
 from src.data import config
 from src.data import getconf
 from src.data import config_save
-from src.data import DATA_DIR
+from src.data import FRAMES_LOG_PATH
+from src.data import HISTORY_PATH
 from src.data import WINDOWS
 
 
@@ -230,6 +235,8 @@ f'Ankidodawacz v{__version__} @bold',
 '  -des, -diki-es   query Diki Spanish',
 '  -i, -farlex      query Farlex Idioms',
 '  -wnet, -wordnet  query WordNet',
+'  -wnl, -wordnet-local',
+'                   query the locally installed WordNet database',
 '  -c, -compare     query the primary and secondary dictionary one after',
 '                   the other, expands to "-ahd -farlex" by default',
 '  -all             query all monolingual dictionaries,',
@@ -261,6 +268,9 @@ f' To make multiple queries at once separate them with a "{search.QUERY_SEPARATO
 'FIND IN PAGE @bold underline',
 ' Search is case sensitive if there is at least one uppercase',
 ' letter present, i.e. "smartcase search".',
+' Phrases starting with "/" are regular expressions, e.g.',
+' "/colou?r" or "/^adj|^adv". Start with "//" to find a phrase',
+' starting with "/" literally, e.g. "//ˈwɜrd/".',
 '',
 ' ^F F4      open the "Find in page" prompt',
 ' n N        go to the next/previous match',
@@ -287,7 +297,8 @@ f' To make multiple queries at once separate them with a "{search.QUERY_SEPARATO
 ' ^L         redraw the screen (if it gets corrupted somehow)',
 ' F5         recheck note (if you have changed note\'s field layout in Anki)',
 ' ?          hide the F-key help bar',
-' Esc        clear the status bar',
+' Esc        clear the status bar, cancel requests to Anki',
+' F12        show frame and layout timings',
 ])
 
 
@@ -320,36 +331,56 @@ class QueryHistory:
 
 
 class Screens:
-    def __init__(self, items: Sequence[Screen]) -> None:
-        self.items = items
+    # Screens are built on first access, so that only the dictionaries
+    # that are actually looked at get laid out.
+    def __init__(self, thunks: Sequence[Callable[[], Screen]]) -> None:
+        self._thunks = thunks
+        self._built: dict[int, Screen] = {}
         self.i = 0
 
+    def _get(self, i: int) -> Screen:
+        try:
+            return self._built[i]
+        except KeyError:
+            screen = self._built[i] = self._thunks[i]()
+            return screen
+
     @property
     def current(self) -> Screen:
-        return self.items[self.i]
+        return self._get(self.i)
+
+    def built(self) -> list[Screen]:
+        return list(self._built.values())
+
+    # return: True if a screen has been built, False otherwise.
+    def prebuild_next(self) -> bool:
+        for i in (self.i + 1, self.i - 1):
+            if 0 <= i < len(self._thunks) and i not in self._built:
+                self._get(i)
+                return True
+
+        return False
 
     def next(self, *, wrap: bool = False) -> None:
-        if self.items:
+        if self._thunks:
             self.i += 1
             if wrap:
-                self.i %= len(self.items)
+                self.i %= len(self._thunks)
             else:
-                self.i = min(self.i, len(self.items) - 1)
+                self.i = min(self.i, len(self._thunks) - 1)
 
     def prev(self, *, wrap: bool = False) -> None:
-        if self.items:
+        if self._thunks:
             self.i -= 1
             if wrap:
-                self.i %= len(self.items)
+                self.i %= len(self._thunks)
             else:
                 self.i = max(self.i, 0)
 
     def __bool__(self) -> bool:
-        return bool(self.items)
+        return bool(self._thunks)
     def __len__(self) -> int:
-        return len(self.items)
-    def __iter__(self) -> Iterator[Screen]:
-        return iter(self.items)
+        return len(self._thunks)
 
 
 class Program(ProgramProto):
@@ -358,10 +389,11 @@ class Program(ProgramProto):
         self.help = Pager(win, HELP)
         self.screens = Screens([])
         self.status = Status(win, persistence=7)
-        self.history = QueryHistory(win, os.path.join(DATA_DIR, 'history.txt'))
+        self.history = QueryHistory(win, HISTORY_PATH)
         self.page: Screen | Pager = self.help
         self.bar_margin = not getconf('nohelp')
         self.margin_bot = 0
+        self.worker = Worker()
 
     def _search_prompt(self, pretype: str) -> None:
         with extra_margin(self, not self.bar_margin):
@@ -385,7 +417,7 @@ class Program(ProgramProto):
         except KeyboardInterrupt:
             return
 
-        screens = []
+        screens: list[Callable[[], Screen]] = []
 
         assert len(queries) == len(results)
         for query, dictionaries in zip(queries, results):
@@ -393,7 +425,7 @@ class Program(ProgramProto):
                 continue
 
             for dictionary in dictionaries:
-                screens.append(Screen(self.win, dictionary))
+                screens.append(functools.partial(Screen, self.win, dictionary))
                 if not getconf('histsave'):
                     continue
 
@@ -500,10 +532,10 @@ class Program(ProgramProto):
         (2, HIGHLIGHT, 15),
     )
     def _draw_fkey_bar(self) -> None:
-        bar = truncate(
-            'F1 Help  F2 Config  F3 Anki-setup  F4 Find  F5 Recheck-note',
-            curses.COLS
-        )
+        tiles = 'F1 Help  F2 Config  F3 Anki-setup  F4 Find  F5 Recheck-note'
+        if nqueued := len(anki.card_queue):
+            tiles += f'  Queued cards: {nqueued}'
+        bar = truncate(tiles, curses.COLS)
         if bar is None:
             return
 
@@ -529,26 +561,94 @@ class Program(ProgramProto):
         if curses.COLS < CURSES_COLS_MIN_VALUE:
             return
 
-        self.win.erase()
-
         self.page.margin_bot = (
             self.margin_bot
             + max(self.bar_margin, self.status.height)
         )
-        self.page.draw()
+
+        ncalls = self.page.ncalls_drawn if isinstance(self.page, Screen) else 0
+        with profiler.measure('draw'):
+            self.win.erase()
+            self.page.draw()
+        if isinstance(self.page, Screen):
+            profiler.add('calls', self.page.ncalls_drawn - ncalls)
+
         self._draw_border(self.page.margin_bot)
-        if not self.status.draw_if_available() and self.bar_margin:
+        with profiler.measure('status'):
+            status_drawn = self.status.draw_if_available()
+        if not status_drawn and self.bar_margin:
             self._draw_fkey_bar()
 
+        if profiler.overlay:
+            profiler.draw_overlay(self.win)
+
     def resize(self) -> None:
         curses.update_lines_cols()
 
         self.help.resize()
-        for screen in self.screens:
+        for screen in self.screens.built():
             screen.resize()
 
         self.win.clearok(True)
 
+    # return: True if the phrases marked on the `screen` have changed.
+    def _mark_phrases(self, screen: Screen) -> bool:
+        state = anki.duplicates.state()
+        if screen.marked_phrases_state == state:
+            return False
+
+        marked = anki.duplicates.phrase_indices(screen.selector.dictionary)
+        screen.marked_phrases_state = state
+        if marked == screen.marked_phrases:
+            return False
+
+        screen.marked_phrases = marked
+        return True
+
+    def idle(self) -> bool:
+        # Does a bit of background work while waiting for input.
+        # Returns False if there is nothing left to do.
+        with profiler.paused():
+            if self.worker.poll(self.status):
+                self.draw()
+                self.win.noutrefresh()
+                curses.doupdate()
+                return True
+
+            nadded, failures = anki.card_queue.poll()
+            if nadded or failures:
+                if nadded:
+                    self.status.success('Queued cards added:', str(nadded))
+                for phrase, err in failures:
+                    if phrase:
+                        self.status.error(f'Adding queued card failed ({phrase}):', err)
+                    else:
+                        self.status.error('Adding queued cards failed:', err)
+                self.draw()
+                self.win.noutrefresh()
+                curses.doupdate()
+                return True
+
+            if self.help.search_more():
+                if self.page is self.help:
+                    self.draw()
+                    self.win.noutrefresh()
+                    curses.doupdate()
+                return True
+            if isinstance(self.page, Screen) and self.page.layout_idle():
+                return True
+            if isinstance(self.page, Screen) and self._mark_phrases(self.page):
+                self.draw()
+                self.win.noutrefresh()
+                curses.doupdate()
+                return True
+            if getconf('prebuild') and self.screens.prebuild_next():
+                return True
+
+            # Keep polling, until Anki has responded and the queued cards
+            # are added.
+            return self.worker.busy or len(anki.card_queue) > 0
+
     def ask_yes_no(self, prompt_name: str, *, default: bool) -> bool:
         typed = Prompt(
             self,
@@ -597,7 +697,12 @@ class Program(ProgramProto):
             st.error('Could not continue:', str(e))
             return
 
-        decks = anki.invoke('deckNames')
+        try:
+            decks = anki.models.deck_names()
+        except anki.AnkiError as e:
+            st.error('Could not continue:', str(e))
+            return
+
         if len(decks) == 1:
             chosen_deck = decks.pop()
         else:
@@ -640,12 +745,42 @@ class Program(ProgramProto):
     def find_in_page(self) -> None:
         self.status.clear()
 
-        with extra_margin(self, not self.bar_margin):
-            typed = Prompt(self, 'Find in page: ').run()
-        if typed is None or not typed:
+        page = self.page
+        if isinstance(page, Screen):
+            # Screens are searched as you type, their search index makes it
+            # cheap enough. Cancelling brings back the previous highlight.
+            prev_hl = page.hl
+
+            def on_change(s: str) -> None:
+                if s:
+                    page.hlsearch(s)
+                else:
+                    page.hl_clear()
+
+            with extra_margin(self, not self.bar_margin):
+                typed = Prompt(self, 'Find in page: ', on_change=on_change).run()
+            if typed is None or not typed:
+                page.hl = prev_hl
+                return
+        else:
+            with extra_margin(self, not self.bar_margin):
+                typed = Prompt(self, 'Find in page: ').run()
+            if typed is None or not typed:
+                return
+
+        phrase, regex = split_search_phrase(typed)
+        if regex and compile_search_pattern(phrase) is None:
+            self.status.error('Invalid regular expression', repr(typed))
             return
 
-        if self.page.hlsearch(typed):
+        nmatches = self.page.hlsearch(typed)
+        if isinstance(self.page, Pager):
+            # Only the first chunk of lines has been searched, find at least
+            # one match before leaving the rest to be searched while idle.
+            while not nmatches and self.page.search_more():
+                nmatches = 0 if self.page.hl is None else self.page.hl.nmatches
+
+        if nmatches:
             assert self.page.hl is not None
             # Go to the first match if there were matches, but outside of
             # the currently visible region, otherwise - do not move - there
@@ -716,7 +851,14 @@ def perror_currently_reviewed_phrase(status: Status) -> str | None:
         return None
 
 
-def perror_recheck_note(status: Status) -> None:
+def perror_browse(status: StatusProto, query: str) -> None:
+    try:
+        anki.invoke('guiBrowse', query=query)
+    except anki.AnkiError as e:
+        status.error('Could not open the card browser:', str(e))
+
+
+def perror_recheck_note(status: StatusProto) -> None:
     try:
         model = anki.models.get_model(getconf('note'), recheck=True)
     except anki.AnkiError as e:
@@ -747,6 +889,43 @@ SEARCH_ENTER_ACTIONS: Mapping[bytes, Callable[[Status], str | None]] = {
 }
 
 
+# How long to wait for more resize events before laying out the pages.
+RESIZE_SETTLE_MS = 30
+
+
+def drain_resize_events(win: curses.window) -> None:
+    # Dragging a terminal edge sends a burst of KEY_RESIZE events, only the
+    # final size is worth laying out.
+    win.timeout(RESIZE_SETTLE_MS)
+    try:
+        while (c := win.getch()) == curses.KEY_RESIZE:
+            pass
+        if c != -1:
+            curses.ungetch(c)
+    finally:
+        win.timeout(-1)
+
+
+# How long the input has to be idle before background work is done, e.g.
+# building the next screen, wrapping the rest of a huge entry or searching
+# the rest of the pager.
+IDLE_MS = 200
+
+
+def getch_while_idle(win: curses.window, idle: Callable[[], bool]) -> int:
+    # Calls `idle` every time no key has been pressed for a while, until it
+    # returns False, i.e. there is nothing left to do.
+    win.timeout(IDLE_MS)
+    try:
+        while (c := win.getch()) == -1:
+            if not idle():
+                win.timeout(-1)
+    finally:
+        win.timeout(-1)
+
+    return c
+
+
 def curses_main(stdscr: curses.window) -> None:
     program = Program(stdscr)
     configmenu = ConfigMenu(stdscr)
@@ -754,12 +933,30 @@ def curses_main(stdscr: curses.window) -> None:
     recent_nids: list[int] | None = None
     mpv = None
 
+    if getconf('framelog'):
+        profiler.open_log(FRAMES_LOG_PATH)
+
+    anki.models.revalidate()
+    anki.card_queue.start()
+    anki.duplicates.start()
+
+    # When the last navigation key has been read.
+    t_input = None
     while True:
         program.status.tick()
-        program.draw()
-
-        c = curses.keyname(stdscr.getch())
+        with profiler.measure('frame'):
+            program.draw()
+            stdscr.noutrefresh()
+            curses.doupdate()
+        if t_input is not None:
+            profiler.add('latency', (time.perf_counter() - t_input) * 1000)
+            t_input = None
+        profiler.end_frame()
+
+        c = curses.keyname(getch_while_idle(stdscr, program.idle))
+        t = time.perf_counter()
         if program.page.dispatch(c):
+            t_input = t
             continue
 
         elif c == b'KEY_MOUSE':
@@ -812,16 +1009,16 @@ def curses_main(stdscr: curses.window) -> None:
                     mpv = perror_play_audio(mpv, program.status, audio.resource)
 
         elif c in {b'b', b'B'}:
-            try:
-                anki.invoke(
-                    'guiBrowse',
+            program.worker.submit(
+                'Opening the card browser',
+                functools.partial(
+                    perror_browse,
                     query=(
                         'added:1' if recent_nids is None
                         else f'deck:{getconf("deck")} nid:{",".join(map(str, recent_nids))}'
                     )
                 )
-            except anki.AnkiError as e:
-                program.status.error('Could not open the card browser:', str(e))
+            )
 
         elif c in {b'c', b'C'}:
             if isinstance(program.page, Screen):
@@ -833,12 +1030,17 @@ def curses_main(stdscr: curses.window) -> None:
                 if selections is None:
                     program.status.error('Nothing selected')
                 else:
-                    added_nids = create_and_add_card(
-                        StatusEcho(program, program.status),
-                        selections
+                    def set_recent_nids(added_nids: list[int]) -> None:
+                        nonlocal recent_nids
+                        if added_nids:
+                            recent_nids = added_nids
+
+                    program.status.writeln('Adding cards...', '(Esc to cancel)')
+                    program.worker.submit(
+                        'Adding cards',
+                        functools.partial(create_and_add_card, selections=selections),
+                        set_recent_nids
                     )
-                    if added_nids:
-                        recent_nids = added_nids
                     program.page.deselect_all()
 
         elif c == b'KEY_F(1)':
@@ -856,6 +1058,10 @@ def curses_main(stdscr: curses.window) -> None:
 
             if configmenu.apply_changes() or curses.is_term_resized(_l, _c):
                 program.resize()
+            if getconf('framelog'):
+                profiler.open_log(FRAMES_LOG_PATH)
+            else:
+                profiler.close_log()
 
         elif c == b'KEY_F(3)':
             program.anki_configurator()
@@ -865,21 +1071,39 @@ def curses_main(stdscr: curses.window) -> None:
 
         elif c == b'KEY_F(5)':
             program.status.clear()
-            perror_recheck_note(program.status)
+            program.worker.submit('Recheck-note', perror_recheck_note)
 
-        elif c in {b'KEY_RESIZE', b'^L'}:
+        elif c == b'KEY_RESIZE':
+            drain_resize_events(stdscr)
+            program.resize()
+
+        elif c == b'^L':
             program.resize()
 
         elif c == b'?':
             program.bar_margin = not program.bar_margin
 
+        elif c == b'KEY_F(12)':
+            profiler.overlay = not profiler.overlay
+
         elif c == b'^[':  #]
             program.status.clear()
+            if ncancelled := program.worker.cancel():
+                program.status.attention(
+                    f'Cancelled {ncancelled} request(s),',
+                    'the ones that have been sent might still get through'
+                )
 
         elif c in {b'q', b'Q', b'^X'}:
             if program.screens and isinstance(program.page, Pager):
                 program.page = program.screens.current
             else:
+                # Cards that are being added shouldn't get lost.
+                if program.worker.busy:
+                    program.status.writeln('Waiting for Anki...')
+                    program.draw()
+                    stdscr.refresh()
+                    program.worker.wait(anki.ANKI_TIMEOUT)
                 raise KeyboardInterrupt
 
         elif isinstance(program.page, Screen):
@@ -916,3 +1140,4 @@ def main() -> None:
         curses_main(stdscr)
     finally:
         curses.endwin()
+        profiler.close_log()
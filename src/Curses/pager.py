@@ -2,25 +2,32 @@ from __future__ import annotations
 
 import curses
 from typing import Callable
+from typing import Iterator
 from typing import Mapping
 from typing import NamedTuple
 from typing import TYPE_CHECKING
 
 from src.Curses.color import Color
 from src.Curses.util import BORDER_PAD
+from src.Curses.util import compile_search_pattern
 from src.Curses.util import CURSES_COLS_MIN_VALUE
 from src.Curses.util import mouse_wheel_down
 from src.Curses.util import mouse_wheel_up
+from src.Curses.util import split_search_phrase
 from src.Curses.util import truncate
 
 if TYPE_CHECKING:
     from src.Curses.util import Attr
 
 
+# Number of lines searched at once, the rest is searched while idle.
+PAGER_SEARCH_CHUNK = 1000
+
+
 class PagerHighlight(NamedTuple):
-    hl: dict[int, list[int]]
+    # (x, span) of matches in each line.
+    hl: dict[int, list[tuple[int, int]]]
     nmatches: int
-    span: int
 
 
 class Pager:
@@ -32,6 +39,9 @@ class Pager:
         self.margin_bot = self._scroll = 0
         self.hl: PagerHighlight | None = None
         self._buf = buf
+        # Search of the lines not searched yet and the number of searched ones.
+        self._search: Iterator[None] | None = None
+        self._nsearched = 0
 
     @property
     def page_height(self) -> int:
@@ -95,8 +105,7 @@ class Pager:
 
             hlindices = self.hl.hl
             if line_i in hlindices:
-                span = self.hl.span
-                for hl_i in hlindices[line_i]:
+                for hl_i, span in hlindices[line_i]:
                     if BORDER_PAD + hl_i + span > width:
                         span = width - hl_i
                         if span <= 0:
@@ -129,45 +138,91 @@ class Pager:
         self.move_up(self.page_height - 2)
 
     def hlsearch(self, s: str) -> int:
-        against_lowercase = s.islower()
+        # Searches the first chunk of lines, `search_more()` searches the rest.
+        self.hl = None
+        self._search = None
+        self._nsearched = 0
+
+        find: Callable[[str], list[tuple[int, int]]]
+        s, regex = split_search_phrase(s)
+        if regex:
+            pattern = compile_search_pattern(s)
+            if pattern is None:
+                return 0
+
+            def find(text: str) -> list[tuple[int, int]]:
+                return [
+                    (m.start(), m.end() - m.start())
+                    for m in pattern.finditer(text) if m.end() > m.start()
+                ]
+        else:
+            against_lowercase = s.islower()
+            hl_span = len(s)
 
-        hl_span = len(s)
+            def find(text: str) -> list[tuple[int, int]]:
+                if against_lowercase:
+                    text = text.lower()
 
+                indices = []
+                x = text.find(s)
+                while x != -1:
+                    indices.append((x, hl_span))
+                    x = text.find(s, x + hl_span)
+
+                return indices
+
+        self._search = self._search_chunks(find)
+        self.search_more()
+        return 0 if self.hl is None else self.hl.nmatches
+
+    def _search_chunks(self, find: Callable[[str], list[tuple[int, int]]]) -> Iterator[None]:
         hlmap = {}
         nmatches = 0
-        for i, (text, _) in enumerate(self._buf):
-            if against_lowercase:
-                text = text.lower()
-
-            indices = []
-            x = text.find(s)
-            while x != -1:
-                nmatches += 1
-                indices.append(x)
-                x = text.find(s, x + hl_span)
-
-            if indices:
-                hlmap[i] = indices
-
-        if nmatches:
-            self.hl = PagerHighlight(hlmap, nmatches, hl_span)
-        else:
-            self.hl = None
+        for start in range(0, len(self._buf), PAGER_SEARCH_CHUNK):
+            end = min(start + PAGER_SEARCH_CHUNK, len(self._buf))
+            for i in range(start, end):
+                indices = find(self._buf[i][0])
+                if indices:
+                    hlmap[i] = indices
+                    nmatches += len(indices)
+
+            self._nsearched = end
+            if nmatches:
+                self.hl = PagerHighlight(hlmap, nmatches)
+            yield
+
+    def search_more(self) -> bool:
+        # Returns False if there was nothing left to search.
+        if self._search is None:
+            return False
+        try:
+            next(self._search)
+        except StopIteration:
+            self._search = None
+            return False
 
-        return nmatches
+        return True
+
+    def _search_up_to(self, line_i: int) -> None:
+        while self._nsearched <= line_i and self.search_more():
+            pass
 
     def hl_clear(self) -> None:
         self.hl = None
+        self._search = None
 
     def hl_next(self) -> None:
-        if self.hl is None:
-            return
-        for line_i in self.hl.hl:
-            if line_i > self._scroll:
-                self._scroll = line_i
+        while True:
+            if self.hl is not None:
+                for line_i in self.hl.hl:
+                    if line_i > self._scroll:
+                        self._scroll = line_i
+                        return
+            if not self.search_more():
                 return
 
     def hl_prev(self) -> None:
+        self._search_up_to(self._scroll - 1)
         if self.hl is None:
             return
         for line_i in reversed(self.hl.hl):
@@ -176,6 +231,7 @@ class Pager:
                 return
 
     def is_hl_in_view(self) -> bool:
+        self._search_up_to(self._scroll + self.page_height - 1)
         if self.hl is None:
             return False
         for i in range(self._scroll, self._scroll + self.page_height):
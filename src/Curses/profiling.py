@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import contextlib
+import curses
+import json
+import time
+from collections import deque
+from typing import Iterable
+from typing import Iterator
+from typing import TextIO
+
+from src.Curses.util import BORDER_PAD
+
+# Number of samples the rolling percentiles are computed over.
+PROFILER_SAMPLES = 200
+
+# Names of the samples in the order they are displayed. Everything is in
+# milliseconds, except for "calls", which is the number of curses calls
+# a screen has made to draw a frame.
+PROFILER_SAMPLE_NAMES = (
+    'layout', 'format', 'draw', 'status', 'frame', 'latency', 'calls',
+)
+
+
+def percentile(samples: Iterable[float], p: float) -> float:
+    s = sorted(samples)
+    if not s:
+        raise ValueError('no samples')
+
+    return s[min(len(s) - 1, int(p * len(s)))]
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.overlay = False
+        self._log: TextIO | None = None
+        self._paused = False
+        self._samples: dict[str, deque[float]] = {
+            name: deque(maxlen=PROFILER_SAMPLES) for name in PROFILER_SAMPLE_NAMES
+        }
+        # Samples of the current frame, written to the log by `end_frame()`.
+        self._frame: dict[str, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return (self.overlay or self._log is not None) and not self._paused
+
+    def open_log(self, path: str) -> None:
+        if self._log is None:
+            self._log = open(path, 'a', encoding='UTF-8')
+
+    def close_log(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def add(self, name: str, value: float) -> None:
+        if not self.enabled:
+            return
+
+        self._samples[name].append(value)
+        # Layout can be measured more than once per frame, e.g. when a lazy
+        # layout gets filled in before a draw.
+        self._frame[name] = self._frame.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - t0) * 1000)
+
+    # Work done in the background is not a part of any frame.
+    @contextlib.contextmanager
+    def paused(self) -> Iterator[None]:
+        prev = self._paused
+        self._paused = True
+        try:
+            yield
+        finally:
+            self._paused = prev
+
+    def end_frame(self) -> None:
+        if self._log is not None and self._frame:
+            self._log.write(json.dumps({'time': time.time(), **self._frame}) + '\n')
+            self._log.flush()
+        self._frame.clear()
+
+    # return: last sample and the 95th percentile or None if there are no samples.
+    def stats(self, name: str) -> tuple[float, float] | None:
+        samples = self._samples[name]
+        if not samples:
+            return None
+
+        return samples[-1], percentile(samples, 0.95)
+
+    def draw_overlay(self, win: curses.window) -> None:
+        lines = ['          last ms   p95 ms']
+        for name in PROFILER_SAMPLE_NAMES:
+            stats = self.stats(name)
+            if stats is None:
+                lines.append(f'{name:8s}{"-":>9s}{"-":>9s}')
+            elif name == 'calls':
+                lines.append(f'{name:8s}{stats[0]:9.0f}{stats[1]:9.0f}')
+            else:
+                lines.append(f'{name:8s}{stats[0]:9.2f}{stats[1]:9.2f}')
+
+        width = max(map(len, lines)) + 1
+        x = curses.COLS - width - BORDER_PAD
+        if x < BORDER_PAD or len(lines) > curses.LINES - 2*BORDER_PAD:
+            return
+
+        for y, line in enumerate(lines, BORDER_PAD):
+            win.addstr(y, x, line.ljust(width), curses.A_STANDOUT)
+        win.chgat(BORDER_PAD, x, width, curses.A_STANDOUT | curses.A_BOLD)
+
+
+profiler = Profiler()
@@ -195,7 +195,8 @@ class Prompt:
             pretype: str = '',
             exiting_bspace: bool = True,
             completion_separator: str | None = None,
-            up_arrow_entries: deque[str] | None = None
+            up_arrow_entries: deque[str] | None = None,
+            on_change: Callable[[str], None] | None = None
     ) -> None:
         self.program = program
         self.win = program.win
@@ -206,6 +207,8 @@ class Prompt:
         self._entered = pretype
         self._up_arrow_entries = up_arrow_entries or deque()
         self._up_arrow_i: int | None = None
+        # Called with the entered text every time it changes, before redraw.
+        self.on_change = on_change
 
     def draw(self) -> None:
         if curses.COLS < CURSES_COLS_MIN_VALUE:
@@ -394,7 +397,12 @@ class Prompt:
         if entered_before_completion:
             cmenu.complete(entered_before_completion)
 
+        notified = self._entered
         while True:
+            if self.on_change is not None and self._entered != notified:
+                notified = self._entered
+                self.on_change(notified)
+
             if cmenu.has_completions():
                 with extra_margin(self.program, cmenu.height()):
                     self.program.draw()
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import bisect
 import curses
+import functools
+import re
 from typing import Callable
+from typing import Iterator
 from typing import Literal
 from typing import Mapping
 from typing import NamedTuple
@@ -9,9 +13,13 @@ from typing import Sequence
 from typing import TYPE_CHECKING
 
 from src.Curses.color import Color
+from src.Curses.profiling import profiler
 from src.Curses.util import Attr
 from src.Curses.util import BORDER_PAD
+from src.Curses.util import compile_search_pattern
 from src.Curses.util import compose_attrs
+from src.Curses.util import merge_attrs
+from src.Curses.util import split_search_phrase
 from src.Curses.util import truncate
 from src.data import getconf
 from src.Dictionaries.base import AUDIO
@@ -32,6 +40,18 @@ if TYPE_CHECKING:
 AUTO_COLUMN_WIDTH = 52
 COLUMN_MARGIN = 1
 
+# Number of laid out dictionaries kept around, so that resizing back and
+# forth and switching between screens doesn't have to wrap them again.
+LAYOUT_CACHE_SIZE = 64
+
+# Dictionaries with at least this many ops are laid out lazily, only the
+# lines in and around the view are wrapped before the first frame.
+LAZY_LAYOUT_MIN_OPS = 1000
+
+# Number of ops wrapped at a time when filling in a lazy layout.
+LAZY_LAYOUT_STEP = 16
+LAZY_LAYOUT_IDLE_CHUNK = 256
+
 
 class FLine(NamedTuple):
     op_i: int
@@ -39,19 +59,6 @@ class FLine(NamedTuple):
     attrs: list[Attr]
 
 
-def _next_hl(hls: Sequence[tuple[int, int]], hl_i: int) -> tuple[int, int, int]:
-    try:
-        while True:
-            hl_i += 1
-            span_left, attr = hls[hl_i]
-            if span_left > 0:
-                return hl_i, span_left, attr
-    except IndexError:
-        # TODO: If handling of incomplete hls is ever desired.
-        w = sum(x[0] for x in hls)
-        raise AssertionError(f'sum of lengths of hls spans ({w}) < len(s)')
-
-
 def wrap(
         dest: list[FLine],
         op_i: int,
@@ -82,101 +89,117 @@ def wrap(
         dest.append(FLine(op_i, predent + s, attrs))
         return
 
-    indent_len = len(indent)
-    hl_i = attr_i = line_i = brk_i = 0
-
-    span_left, attr = hls[hl_i]
-    attrs = []
+    # Lines are packed a word at a time: `brk` is the index of the space
+    # that ends the word starting at `i`, and `line_start` is the index of
+    # the first character of the current line.
 
     # skipping preceding spaces to avoid line breaks
     # if there is not enough space for single words.
-    try:
-        while s[brk_i] == ' ':
-            brk_i += 1
-    except IndexError:
-        brk_i = 0
+    brk = len(s) - len(s.lstrip(' '))
+    if brk == s_len:
+        brk = 0
     else:
-        brk_i = s.find(' ', brk_i + 1)
-        if brk_i == -1:
-            brk_i = 0
+        brk = s.find(' ', brk + 1)
+        if brk == -1:
+            brk = 0
 
-    break_line = word_cannot_fit = brk_i > width
+    break_line = word_cannot_fit = brk > width
     overflow = False
 
-    def PUSH_LINE(_line: str) -> None:
-        _attr_i = cur_indent_len + attr_i
+    # Highlight spans are sliced per line. `hl_i` is the first span that
+    # ends after the start of the current line and `hl_start` its index.
+    hl_i = hl_start = 0
+
+    def PUSH_LINE(line_start: int, line_end: int) -> None:
+        nonlocal hl_i, hl_start
+        try:
+            while hl_start + hls[hl_i][0] <= line_start:
+                hl_start += hls[hl_i][0]
+                hl_i += 1
+        except IndexError:
+            w = sum(x[0] for x in hls)
+            raise AssertionError(f'sum of lengths of hls spans ({w}) < len(s)')
+
+        attrs = []
+        i, start = hl_i, hl_start
+        while start < line_end:
+            try:
+                span, attr = hls[i]
+            except IndexError:
+                w = sum(x[0] for x in hls)
+                raise AssertionError(f'sum of lengths of hls spans ({w}) < len(s)')
+
+            left = start if start > line_start else line_start
+            right = start + span
+            if right > line_end:
+                right = line_end
+            if right > left:
+                attrs.append(Attr(cur_indent_len + left - line_start, right - left, attr))
+
+            start += span
+            i += 1
+
+        line = cur_indent + s[line_start:line_end]
         if overflow:
-            _trunc_line = truncate(_line, width)
+            _trunc_line = truncate(line, width)
             if _trunc_line is None:
                 # we don't want to lose any FLines,
                 # even if they can't be displayed
-                _trunc_line = ''
-            else:
-                # -1: space for the truncation character "»"
-                _span = width - _attr_i - 1
-                if _span > 0:
-                    attrs.append(Attr(_attr_i, _span, attr))
-                attrs.append(Attr(width - 1, 1, Color.err | curses.A_STANDOUT))
+                dest.append(FLine(op_i, '', []))
+                return
+
+            # An overflowing word starts the line, it is a single run of
+            # the attribute of its last character.
+            attrs.clear()
+            # -1: space for the truncation character "»"
+            _span = width - cur_indent_len - 1
+            if _span > 0:
+                attrs.append(Attr(cur_indent_len, _span, attr))
+            attrs.append(Attr(width - 1, 1, Color.err | curses.A_STANDOUT))
             dest.append(FLine(op_i, _trunc_line, attrs))
         else:
-            span = line_i - attr_i
-            if span > 0:
-                attrs.append(Attr(_attr_i, span, attr))
-                dest.append(FLine(op_i, _line, attrs))
-            else:
-                raise AssertionError('unreachable')
+            dest.append(FLine(op_i, line, attrs))
 
-    for i in range(s_len):
-        if line_i == brk_i:
-            e = s.find(' ', i + 1)
-            if e != -1:
-                brk_i += e - i
-            else:
-                brk_i += s_len - i
+    i = line_start = 0
+    while i < s_len:
+        if i == brk:
+            brk = s.find(' ', i + 1)
+            if brk == -1:
+                brk = s_len
 
-            break_line = brk_i > width - cur_indent_len
-            word_cannot_fit = break_line and not line_i
+            break_line = brk - line_start > width - cur_indent_len
+            word_cannot_fit = break_line and i == line_start
 
         if not break_line:
-            if not span_left:
-                span = line_i - attr_i
-                if span > 0:
-                    attrs.append(Attr(attr_i + cur_indent_len, span, attr))
-                    attr_i = line_i
-
-                hl_i, span_left, attr = _next_hl(hls, hl_i)
-
-            line_i += 1
+            i = brk
         elif word_cannot_fit:
-            if not span_left:
-                hl_i, span_left, attr = _next_hl(hls, hl_i)
-
-            line_i += 1
+            i = brk
             overflow = True
         else:
-            PUSH_LINE(cur_indent + s[i - line_i:i])
-
-            if not span_left:
-                hl_i, span_left, attr = _next_hl(hls, hl_i)
-
+            # the space at the line break is dropped
+            PUSH_LINE(line_start, i)
             cur_indent = indent
-            cur_indent_len = indent_len
-            attr_i = line_i = brk_i = 0
-            attrs = []
+            cur_indent_len = len(indent)
+            i += 1
+            line_start = brk = i
             overflow = False
 
-        span_left -= 1
+    if line_start < s_len:
+        PUSH_LINE(line_start, s_len)
 
-    if line_i:
-        PUSH_LINE(cur_indent + s[-line_i:])
 
-
-def format_dictionary(dictionary: Dictionary, width: int) -> list[FLine]:
+def format_dictionary(
+        dictionary: Dictionary,
+        width: int,
+        start: int = 0,
+        stop: int | None = None, *,
+        index: int = 0
+) -> list[FLine]:
+    # `index`: number of definitions before `start`.
     indent_weight = 0 if width > AUTO_COLUMN_WIDTH / 2 else -width
 
-    index = 0
     result: list[FLine] = []
-    for i, op in enumerate(dictionary.contents):
+    for i, op in enumerate(dictionary.contents[start:stop], start):
         if isinstance(op, DEF):
             index += 1
             index_len = len(str(index))
@@ -360,10 +383,136 @@ def currently_selected_ops() -> tuple[type[op_t], ...]:
     return tuple(result)
 
 
-def layout(
-        dictionary: Dictionary,
-        height: int
-) -> tuple[list[list[FLine]], int]:
+def _estimate_nlines(op: op_t, width: int) -> int:
+    # A cheap guess of how many lines `format_dictionary()` wraps `op` into.
+    def nlines(n: int) -> int:
+        return 1 + n // width if width > 0 else 1
+
+    if isinstance(op, DEF):
+        return (
+              nlines(len(op.definition) + len(op.label) + 6)
+            + sum(nlines(len(x) + 4) for x in op.examples)
+        )
+    elif isinstance(op, LABEL):
+        return 1 + bool(op.label)
+    elif isinstance(op, PHRASE):
+        return nlines(len(op.phrase) + len(op.extra) + 2)
+    elif isinstance(op, HEADER):
+        return 1
+    elif isinstance(op, AUDIO):
+        return 0
+    elif isinstance(op, ETYM):
+        return 1 + nlines(len(op.etymology))
+    elif isinstance(op, POS):
+        return 1 + len(op.pos)
+    elif isinstance(op, SYN):
+        return (
+              nlines(len(op.synonyms))
+            + nlines(len(op.definition) + 4)
+            + sum(nlines(len(x) + 4) for x in op.examples)
+        )
+    elif isinstance(op, NOTE):
+        return nlines(len(op.note) + 2)
+    else:
+        raise AssertionError(f'unreachable {op!r}')
+
+
+def _count_definitions(dictionary: Dictionary, start: int, stop: int) -> int:
+    return sum(isinstance(op, (DEF, SYN)) for op in dictionary.contents[start:stop])
+
+
+class Layout:
+    # Columns of formatted lines. Lazy layouts wrap every column top to
+    # bottom as the lines are needed, so lines are only ever appended and
+    # their numbers never change. Column breaks of a lazy layout are chosen
+    # upfront from estimated line counts and stay where they are.
+    def __init__(self,
+            dictionary: Dictionary,
+            width: int,
+            columns: list[list[FLine]],
+            ranges: list[tuple[int, int]]
+    ) -> None:
+        self.columns = columns
+        self._dictionary = dictionary
+        self._width = width
+        # Next op to wrap, the op the column ends at and the number of
+        # definitions before the next op.
+        self._next = [start for start, _ in ranges]
+        self._ends = [end for _, end in ranges]
+        self._index = [_count_definitions(dictionary, 0, start) for start in self._next]
+        # (column, line) of the first line of every op laid out so far and
+        # the number of lines of each column looked through.
+        self._op_lines: dict[int, tuple[int, int]] = {}
+        self._nlines_seen = [0] * len(columns)
+
+    def is_complete(self) -> bool:
+        return self._next == self._ends
+
+    def _wrap_more(self, col_i: int, nops: int) -> None:
+        start = self._next[col_i]
+        stop = min(start + nops, self._ends[col_i])
+        with profiler.measure('format'):
+            self.columns[col_i].extend(
+                FLine(op_i, text, merge_attrs(attrs, len(text)))
+                for op_i, text, attrs in format_dictionary(
+                    self._dictionary, self._width, start, stop,
+                    index=self._index[col_i]
+                )
+            )
+        self._next[col_i] = stop
+        self._index[col_i] += _count_definitions(self._dictionary, start, stop)
+
+    # return: True if any lines have been added, False otherwise.
+    def fill(self, nlines: int) -> bool:
+        # Wraps every column up to at least `nlines` lines.
+        r = False
+        for col_i, column in enumerate(self.columns):
+            while len(column) < nlines and self._next[col_i] < self._ends[col_i]:
+                self._wrap_more(col_i, LAZY_LAYOUT_STEP)
+                r = True
+
+        return r
+
+    def fill_through_op(self, op_i: int) -> bool:
+        r = False
+        for col_i in range(len(self.columns)):
+            while self._next[col_i] <= op_i and self._next[col_i] < self._ends[col_i]:
+                self._wrap_more(col_i, LAZY_LAYOUT_STEP)
+                r = True
+
+        return r
+
+    def fill_idle(self) -> bool:
+        # Wraps a chunk of the first incomplete column.
+        for col_i in range(len(self.columns)):
+            if self._next[col_i] < self._ends[col_i]:
+                self._wrap_more(col_i, LAZY_LAYOUT_IDLE_CHUNK)
+                return True
+
+        return False
+
+    def complete(self) -> bool:
+        r = False
+        for col_i in range(len(self.columns)):
+            if self._next[col_i] < self._ends[col_i]:
+                self._wrap_more(col_i, self._ends[col_i])
+                r = True
+
+        return r
+
+    def op_line(self, op_i: int) -> tuple[int, int] | None:
+        # return: (column, line) of the first line of `op_i` or None if it
+        #         hasn't been laid out or it takes no lines.
+        if op_i not in self._op_lines:
+            for col_i, column in enumerate(self.columns):
+                for line_i in range(self._nlines_seen[col_i], len(column)):
+                    self._op_lines.setdefault(column[line_i].op_i, (col_i, line_i))
+                self._nlines_seen[col_i] = len(column)
+
+        return self._op_lines.get(op_i)
+
+
+def layout(dictionary: Dictionary, height: int) -> tuple[Layout, int]:
     width = curses.COLS - 2*BORDER_PAD + 1
     ndefinitions = dictionary.count(lambda x: isinstance(x, DEF))
 
@@ -385,7 +534,28 @@ def layout(
     except ZeroDivisionError:
         column_width = width
 
-    lines = format_dictionary(dictionary, column_width - 2*COLUMN_MARGIN)
+    return _layout(dictionary, column_width, ncolumns, Color.values()), column_width
+
+
+# `Dictionary` is hashed by identity. Colors are a part of the key, because
+# they are baked into the attributes of FLines.
+@functools.lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def _layout(
+        dictionary: Dictionary,
+        column_width: int,
+        ncolumns: int,
+        colors: tuple[int, ...]
+) -> Layout:
+    width = column_width - 2*COLUMN_MARGIN
+    contents = dictionary.contents
+    if len(contents) >= LAZY_LAYOUT_MIN_OPS:
+        return _lazy_layout(dictionary, width, ncolumns)
+
+    with profiler.measure('format'):
+        lines = [
+            FLine(op_i, text, merge_attrs(attrs, len(text)))
+            for op_i, text, attrs in format_dictionary(dictionary, width)
+        ]
 
     max_column_height = len(lines) // ncolumns - 1
     column_break = max_column_height
@@ -395,7 +565,7 @@ def layout(
     for i, line in enumerate(lines):
         columns[cur].append(line)
 
-        op = dictionary.contents[line.op_i]
+        op = contents[line.op_i]
         if (
                 i > column_break
             and (isinstance(op, (DEF, SYN, ETYM)))
@@ -406,7 +576,71 @@ def layout(
             column_break += max_column_height
             cur += 1
 
-    return columns, column_width
+    return Layout(dictionary, width, columns, [(len(contents), len(contents))] * ncolumns)
+
+
+def _lazy_layout(dictionary: Dictionary, width: int, ncolumns: int) -> Layout:
+    # Same column breaks as above, only from estimated line counts.
+    contents = dictionary.contents
+    nlines = [_estimate_nlines(op, width) for op in contents]
+    if isinstance(contents[0], HEADER):
+        nlines[0] = 0  # not displayed
+    total = sum(nlines)
+
+    max_column_height = total // ncolumns - 1
+    column_break = max_column_height
+
+    starts = [0]
+    line_i = 0
+    for op_i, (op, n) in enumerate(zip(contents, nlines)):
+        line_i += n
+        if (
+                n
+            and line_i - 1 > column_break
+            and isinstance(op, (DEF, SYN, ETYM))
+            and len(starts) < ncolumns
+            and line_i != total
+        ):
+            column_break += max_column_height
+            starts.append(op_i + 1)
+
+    starts.extend([len(contents)] * (ncolumns - len(starts)))
+    ends = starts[1:] + [len(contents)]
+    return Layout(dictionary, width, [[] for _ in range(ncolumns)], list(zip(starts, ends)))
+
+
+def _substitute_hls(
+        attrs: list[Attr],
+        hls: list[tuple[int, int]],
+        hl_attr: int
+) -> list[Attr]:
+    # Matches replace whatever attributes the cells they cover have.
+    result = []
+    k = 0
+    nattrs = len(attrs)
+
+    def clip(lo: int, hi: int) -> None:
+        nonlocal k
+        while k < nattrs:
+            i, span, attr = attrs[k]
+            if i >= hi:
+                return
+            left = i if i > lo else lo
+            right = i + span if i + span < hi else hi
+            if right > left:
+                result.append(Attr(left, right - left, attr))
+            if i + span > hi:
+                return
+            k += 1
+
+    x = 0
+    for hl_x, hl_span in hls:
+        clip(x, hl_x)
+        result.append(Attr(hl_x, hl_span, hl_attr))
+        x = hl_x + hl_span
+    clip(x, 1 << 30)
+
+    return result
 
 
 class Cursor:
@@ -416,48 +650,53 @@ class Cursor:
         self._col = self._cur_indx = 0
         self._phantom_cur_indices = [-1] * len(columns)
 
-        self._col_cur_lineof = []
-        self._col_indx_to_cur = []
-
-        contents = selector.dictionary.contents
-        for col in columns:
-            _cur_lineof = {}
-            _indx_to_cur = []
-            for i, line in enumerate(col):
+        # For every column: op indices of cursor positions and their line
+        # numbers, sorted, so that lines can be mapped back with bisect.
+        self._col_indx_to_cur: list[list[int]] = [[] for _ in columns]
+        self._col_cur_lines: list[list[int]] = [[] for _ in columns]
+
+        self._selector = selector
+        self._nlines_seen = [0] * len(columns)
+        self.update()
+
+    def update(self) -> None:
+        # Picks up lines appended to the columns since, see `Layout`.
+        contents = self._selector.dictionary.contents
+        toggleable = self._selector.TOGGLEABLE
+        for col_i, col in enumerate(self.columns):
+            _indx_to_cur = self._col_indx_to_cur[col_i]
+            _cur_lines = self._col_cur_lines[col_i]
+            for i in range(self._nlines_seen[col_i], len(col)):
+                op_i = col[i].op_i
                 if (
-                        line.op_i not in _cur_lineof
-                    and isinstance(contents[line.op_i], selector.TOGGLEABLE)
+                        (not _indx_to_cur or _indx_to_cur[-1] != op_i)
+                    and isinstance(contents[op_i], toggleable)
                 ):
-                    _indx_to_cur.append(line.op_i)
-                    _cur_lineof[line.op_i] = i
+                    _indx_to_cur.append(op_i)
+                    _cur_lines.append(i)
 
-            self._col_cur_lineof.append(_cur_lineof)
-            self._col_indx_to_cur.append(_indx_to_cur)
+            self._nlines_seen[col_i] = len(col)
 
     def has_toggleable_entries(self) -> bool:
-        return any(self._col_cur_lineof)
+        return any(self._col_indx_to_cur)
 
     def cur(self) -> int:
         return self._col_indx_to_cur[self._col][self._cur_indx]
 
     def line_at_cur(self) -> int:
-        return self._col_cur_lineof[self._col][self.cur()]
+        return self._col_cur_lines[self._col][self._cur_indx]
 
     def line_at_next_cur_down(self) -> int:
         try:
-            next_cur = self._col_indx_to_cur[self._col][self._cur_indx + 1]
+            return self._col_cur_lines[self._col][self._cur_indx + 1]
         except IndexError:
-            steps = 0
             cur = self.cur()
-            for line in self.columns[self._col]:
-                if line.op_i == cur:
-                    steps += 1
-                elif steps:
-                    break
+            column = self.columns[self._col]
+            line_i = self.line_at_cur()
+            while line_i < len(column) and column[line_i].op_i == cur:
+                line_i += 1
 
-            return self._col_cur_lineof[self._col][cur] + steps
-        else:
-            return self._col_cur_lineof[self._col][next_cur]
+            return line_i
 
     @property
     def _last_cur_indx(self) -> int:
@@ -501,11 +740,10 @@ class Cursor:
         prev_line = self.line_at_cur()
 
         self._col += direction
-        lineof = self._col_cur_lineof[self._col]
-        for i, line in enumerate(lineof.values()):
-            if line > prev_line:
-                self._cur_indx = i - 1 if i else 0
-                break
+        lines = self._col_cur_lines[self._col]
+        i = bisect.bisect_right(lines, prev_line)
+        if i < len(lines):
+            self._cur_indx = i - 1 if i else 0
         else:
             self._cur_indx = self._last_cur_indx
 
@@ -527,49 +765,226 @@ class Cursor:
             self._invalidate_phantom_cur_indices()
         self._cur_indx = 0
 
-    def _cur_indx_by_cur(self, cur_to_find: int) -> int:
-        for i, cur in enumerate(self._col_indx_to_cur[self._col]):
-            if cur == cur_to_find:
-                return i
-
-        raise AssertionError('unreachable')
-
     def go_to_cur_at_line_after(self, line_i: int) -> None:
         if line_i <= 0:
             self._cur_indx = 0
             return
 
-        lineof = self._col_cur_lineof[self._col]
-        for cur, line in lineof.items():
-            if line >= line_i:
-                self._cur_indx = self._cur_indx_by_cur(cur)
-                return
-
-        self._cur_indx = self._last_cur_indx
+        lines = self._col_cur_lines[self._col]
+        i = bisect.bisect_left(lines, line_i)
+        if i < len(lines):
+            self._cur_indx = i
+        else:
+            self._cur_indx = self._last_cur_indx
 
     def go_to_cur_at_line_before(self, line_i: int) -> None:
         if line_i <= 0:
             self._cur_indx = 0
             return
 
-        lineof = self._col_cur_lineof[self._col]
-        for cur, line in reversed(lineof.items()):
-            if line < line_i:
-                self._cur_indx = self._cur_indx_by_cur(cur)
-                return
-
-        self._cur_indx = 0
+        i = bisect.bisect_left(self._col_cur_lines[self._col], line_i)
+        self._cur_indx = i - 1 if i else 0
 
 
 class ScreenHighlight(NamedTuple):
-    hl: list[dict[int, list[int]]]
+    # (x, span) of matches in each line of each column.
+    hl: list[dict[int, list[tuple[int, int]]]]
     nmatches: int
     phrase: str
     last_line: int
 
-    @property
-    def span(self) -> int:
-        return len(self.phrase)
+
+def _search_lines(dictionary: Dictionary) -> Iterator[tuple[int, str]]:
+    # Yields (op index, text) of the lines of `format_dictionary()` as they
+    # are before wrapping. A single example is joined with its definition,
+    # the way it is if it fits.
+    index = 0
+    for i, op in enumerate(dictionary.contents):
+        if isinstance(op, DEF):
+            index += 1
+            sign = ' ' if op.subdef else '>'
+            if op.label:
+                buf = f'{sign}{index} {{{op.label}}} {op.definition}'
+            else:
+                buf = f'{sign}{index} {op.definition}'
+
+            if len(op.examples) == 1:
+                yield i, f'{buf}  {op.examples[0]}'
+            else:
+                yield i, buf
+                for example in op.examples:
+                    yield i, example
+
+        elif isinstance(op, LABEL):
+            if op.label:
+                yield i, f'{op.label}  {op.extra}' if op.extra else op.label
+
+        elif isinstance(op, PHRASE):
+            yield i, f'{op.phrase}  {op.extra}' if op.extra else op.phrase
+
+        elif isinstance(op, HEADER):
+            if i and op.header:
+                yield i, op.header
+
+        elif isinstance(op, AUDIO):
+            pass
+
+        elif isinstance(op, ETYM):
+            yield i, op.etymology
+
+        elif isinstance(op, POS):
+            for pos, phon in op.pos:
+                yield i, f'{pos}  {phon}'
+
+        elif isinstance(op, SYN):
+            index += 1
+            yield i, op.synonyms
+            yield i, f'>{index} {op.definition}'
+            for example in op.examples:
+                yield i, example
+
+        elif isinstance(op, NOTE):
+            yield i, f'> {op.note}'
+
+        else:
+            raise AssertionError(f'unreachable {op!r}')
+
+
+class _SearchIndex:
+    # Text of the ops of a dictionary, independent of the layout, so that
+    # it's built only once. Lines of an op are separated with a newline, so
+    # are the ops, matches can span wrapped lines but not lines of the text.
+    def __init__(self, dictionary: Dictionary) -> None:
+        parts = []
+        # Index offset and index of each op that has any text.
+        self._starts: list[int] = []
+        self._op_indices: list[int] = []
+
+        offset = 0
+        prev_op_i = -1
+        for op_i, text in _search_lines(dictionary):
+            # displayed as spaces, see `wrap()`
+            text = text.replace('\n', ' ').replace('\r', ' ')
+            if op_i != prev_op_i:
+                self._starts.append(offset + 1)
+                self._op_indices.append(op_i)
+                prev_op_i = op_i
+            parts.append('\n')
+            parts.append(text)
+            offset += 1 + len(text)
+
+        self.text = ''.join(parts)
+        self.lowercase_text = self.text.lower()
+        if len(self.lowercase_text) != len(self.text):
+            # Some characters lowercase to more than one, offsets must agree.
+            self.lowercase_text = ''.join(
+                c.lower() if len(c.lower()) == 1 else c for c in self.text
+            )
+
+        # Every occurrence of the last phrase, overlapping ones too. Matches
+        # of an extended phrase are a subset of them.
+        self._last_phrase = ''
+        self._last_occurrences: list[int] = []
+
+    def search(self, s: str) -> list[int]:
+        # Returns offsets of non-overlapping matches of `s`.
+        against_lowercase = s.islower()
+        text = self.lowercase_text if against_lowercase else self.text
+
+        last = self._last_phrase
+        if last and s.startswith(last) and last.islower() == against_lowercase:
+            occurrences = [x for x in self._last_occurrences if text.startswith(s, x)]
+        else:
+            occurrences = []
+            x = text.find(s)
+            # NOTE: On Python 3.11+ `x != -1` is finally faster than `~x`
+            while x != -1:
+                occurrences.append(x)
+                x = text.find(s, x + 1)
+
+        self._last_phrase = s
+        self._last_occurrences = occurrences
+
+        result = []
+        end = 0
+        for x in occurrences:
+            if x >= end:
+                result.append(x)
+                end = x + len(s)
+
+        return result
+
+    def search_regex(self, pattern: re.Pattern[str]) -> list[tuple[int, int]]:
+        # Returns (start, end) of matches, empty matches are of no use.
+        return [m.span() for m in pattern.finditer(self.text) if m.end() > m.start()]
+
+    def op_at(self, offset: int) -> int:
+        return self._op_indices[bisect.bisect_right(self._starts, offset) - 1]
+
+    def _op_lines(
+            self, layout: Layout, i: int
+    ) -> list[tuple[int, int, int, int, int]]:
+        # Returns (index offset, column, line, x, length) of the lines of the
+        # `i`th op. Wrapped lines are found in its text in order, only the
+        # parts of truncated lines that are displayed as they are count.
+        op_i = self._op_indices[i]
+        pos = self._starts[i]
+        end = self._starts[i + 1] - 1 if i + 1 < len(self._starts) else len(self.text)
+
+        line = layout.op_line(op_i)
+        if line is None:
+            return []
+        col_i, line_i = line
+        column = layout.columns[col_i]
+
+        result = []
+        while line_i < len(column) and column[line_i].op_i == op_i:
+            text = column[line_i].text
+            x = len(text) - len(text.lstrip(' '))
+            if x < len(text):
+                content = text[x:]
+                if content.endswith('»'):
+                    content = content[:-1]
+                found = self.text.find(content, pos, end)
+                if found == -1:
+                    # e.g. a header, the text is in the middle of the line
+                    dx = content.find(self.text[pos:end])
+                    if dx != -1:
+                        result.append((pos, col_i, line_i, x + dx, end - pos))
+                else:
+                    result.append((found, col_i, line_i, x, len(content)))
+                    pos = found + len(content)
+            line_i += 1
+
+        return result
+
+    # Yields (column, line, x, span) of the parts of the matches in `layout`,
+    # ops of the matches have to be laid out.
+    def locate(
+            self, layout: Layout, matches: list[tuple[int, int]]
+    ) -> Iterator[tuple[int, int, int, int]]:
+        # `matches` are sorted, so the lines of an op are looked up once.
+        lines_i = -1
+        lines: list[tuple[int, int, int, int, int]] = []
+        for start, end in matches:
+            i = bisect.bisect_right(self._starts, start) - 1
+            while i < len(self._starts) and self._starts[i] < end:
+                if i != lines_i:
+                    lines_i = i
+                    lines = self._op_lines(layout, i)
+
+                for line_start, col_i, line_i, x, length in lines:
+                    left = max(start, line_start)
+                    right = min(end, line_start + length)
+                    if right > left:
+                        yield col_i, line_i, x + left - line_start, right - left
+                i += 1
+
+
+# `Dictionary` is hashed by identity.
+@functools.lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def _search_index(dictionary: Dictionary) -> _SearchIndex:
+    return _SearchIndex(dictionary)
 
 
 class Screen:
@@ -579,18 +994,49 @@ class Screen:
 
         # self.margin_bot is needed for `self.page_height`
         self.margin_bot = self._scroll = 0
-        self.columns, self.column_width = layout(dictionary, self.page_height)
+        with profiler.measure('layout'):
+            self._layout, self.column_width = layout(dictionary, self.page_height)
+            self._layout.fill(2 * self.page_height)
+        self.columns = self._layout.columns
         self.hl: ScreenHighlight | None = None
+        # Indices of phrases that already have a note in Anki, they are
+        # drawn underlined.
+        self.marked_phrases: set[int] = set()
+        # What `self.marked_phrases` has been computed for.
+        self.marked_phrases_state: object = None
 
         self.vmode = False
         self.cursor = Cursor(self.selector, self.columns)
 
+        # Number of curses calls made by `draw()` so far.
+        self.ncalls_drawn = 0
+
     @property
     def page_height(self) -> int:
         r = curses.LINES - 2*BORDER_PAD - self.margin_bot
         return r if r > 0 else 0
 
+    # Lazy layouts are wrapped as far as the view goes plus a page below it,
+    # which is also as far as moving down a page can go in one step.
+    def _fill(self, nlines: int) -> None:
+        with profiler.measure('layout'):
+            if self._layout.fill(nlines):
+                self.cursor.update()
+
+    def _complete_layout(self) -> None:
+        with profiler.measure('layout'):
+            if self._layout.complete():
+                self.cursor.update()
+
+    # return: False if there was nothing left to lay out.
+    def layout_idle(self) -> bool:
+        if self._layout.fill_idle():
+            self.cursor.update()
+            return True
+        return False
+
     def _scroll_end(self) -> int:
+        self._fill(self._scroll + 3*self.page_height)
         r = max(map(len, self.columns)) - self.page_height
         return r if r > 0 else 0
 
@@ -621,6 +1067,9 @@ class Screen:
         page_height = self.page_height
         column_width = self.column_width
 
+        self._fill(self._scroll + 2*page_height)
+
+        ncalls = 0
         try:
             for x in range(
                     BORDER_PAD + column_width,
@@ -628,6 +1077,7 @@ class Screen:
                     column_width + 1
             ):
                 win.vline(BORDER_PAD, x, 0, page_height)
+                ncalls += 1
         except curses.error:  # window height too small
             return
 
@@ -641,6 +1091,11 @@ class Screen:
 
         text_x = BORDER_PAD + COLUMN_MARGIN
         for col_i, column in enumerate(self.columns):
+            if self.hl is None:
+                hlindices = None
+            else:
+                hlindices = self.hl.hl[col_i]
+
             for y, line_i in enumerate(
                     range(self._scroll, self._scroll + page_height), BORDER_PAD
             ):
@@ -652,13 +1107,13 @@ class Screen:
                 if not text:
                     continue
 
-                win.addstr(y, text_x, text)
-
                 if op_i == cur:
                     t = Color.cursor
-                    for i, span, attr in attrs:
-                        attr &= ~curses.A_INVIS  # 'show on hover' effect
-                        win.chgat(y, text_x + i, span, t | attr)
+                    attrs = [
+                        # 'show on hover' effect
+                        Attr(i, span, t | (attr & ~curses.A_INVIS))
+                        for i, span, attr in attrs
+                    ]
                 else:
                     if self.selector.is_toggled(op_i):
                         op = contents[op_i]
@@ -670,21 +1125,32 @@ class Screen:
                             t = 0
                     else:
                         t = 0
-
-                    for i, span, attr in attrs:
-                        win.chgat(y, text_x + i, span, t | attr)
-
-                if self.hl is None:
-                    continue
-
-                hlindices = self.hl.hl[col_i]
-                if line_i in hlindices:
-                    span = self.hl.span
-                    for hl_i in hlindices[line_i]:
-                        win.chgat(y, text_x + hl_i, span, hl_attr)
+                    if op_i in self.marked_phrases:
+                        t |= curses.A_UNDERLINE
+                    if t:
+                        attrs = [Attr(i, span, t | attr) for i, span, attr in attrs]
+
+                if hlindices is not None and line_i in hlindices:
+                    attrs = _substitute_hls(attrs, hlindices[line_i], hl_attr)
+
+                # Every cell is written once, spans without attributes
+                # (indentation) are written as they are.
+                x = 0
+                for i, span, attr in attrs:
+                    if i > x:
+                        win.addstr(y, text_x + x, text[x:i])
+                        ncalls += 1
+                    x = i + span
+                    win.addstr(y, text_x + i, text[i:x], attr)
+                    ncalls += 1
+                if x < len(text):
+                    win.addstr(y, text_x + x, text[x:])
+                    ncalls += 1
 
             text_x += column_width + 1
 
+        self.ncalls_drawn += ncalls
+
     def resize(self) -> None:
         # save previous op index to avoid page scrolling off when terminal
         # window shrinks and content above wraps
@@ -699,23 +1165,27 @@ class Screen:
             # Just bail out.
             prev_op_i_at_scroll = -1
 
-        self.columns, self.column_width = layout(
-            self.selector.dictionary,
-            self.page_height
-        )
-
-        if prev_op_i_at_scroll != -1:
-            for i, line in enumerate(self.columns[0]):
-                if prev_op_i_at_scroll == line.op_i:
-                    self._scroll = i
-                    break
+        with profiler.measure('layout'):
+            self._layout, self.column_width = layout(
+                self.selector.dictionary,
+                self.page_height
+            )
+            self.columns = self._layout.columns
+            # TODO: restore cursor position as it was before resize?
+            self.cursor = Cursor(self.selector, self.columns)
+
+            if prev_op_i_at_scroll != -1:
+                self._layout.fill_through_op(prev_op_i_at_scroll)
+                self.cursor.update()
+                for i, line in enumerate(self.columns[0]):
+                    if prev_op_i_at_scroll == line.op_i:
+                        self._scroll = i
+                        break
 
         self.check_scroll_after_eof()
         if self.hl is not None:
             self.hlsearch(self.hl.phrase)
 
-        # TODO: restore cursor position as it was before resize?
-        self.cursor = Cursor(self.selector, self.columns)
         self.bring_cursor_to_view()
 
     def vmode_toggle(self) -> None:
@@ -783,6 +1253,7 @@ class Screen:
             self._scroll = 0
 
     def view_bottom(self) -> None:
+        self._complete_layout()
         self._scroll = self._scroll_end()
 
     def view_top(self) -> None:
@@ -796,6 +1267,9 @@ class Screen:
 
     def cursor_down(self) -> bool:
         r = self.cursor.down()
+        while not r and not self._layout.is_complete():
+            self._fill(max(map(len, self.columns)) + self.page_height)
+            r = self.cursor.down()
         if r:
             next_cur_line = self.cursor.line_at_next_cur_down()
             if next_cur_line > (end := self._scroll + self.page_height):
@@ -831,46 +1305,32 @@ class Screen:
         return r
 
     def hlsearch(self, s: str) -> int:
-        # `hlsearch()` is entirely dependent on the output of
-        # `format_dictionary()`. As a result of this, it is easy to search for
-        # matches line by line with no regard for line breaks, but we have
-        # the necessary information to make it more robust and not rely on
-        # window dimensions to make successful multi-word searches.
-        # TODO: Improve `format_dictionary()`, so that we can reliably merge
-        #       its output and make multi-words searches across line breaks.
+        index = _search_index(self.selector.dictionary)
+        phrase, regex = split_search_phrase(s)
+        if regex:
+            pattern = compile_search_pattern(phrase)
+            matches = [] if pattern is None else index.search_regex(pattern)
+        else:
+            matches = [(x, x + len(phrase)) for x in index.search(phrase)]
 
-        against_lowercase = s.islower()
+        if not matches:
+            self.hl = None
+            return 0
 
-        hls: list[dict[int, list[int]]] = []
-        nmatches = 0
+        # Lazy layouts are wrapped only as far as the matches go.
+        with profiler.measure('layout'):
+            if self._layout.fill_through_op(index.op_at(matches[-1][1] - 1)):
+                self.cursor.update()
+
+        hls: list[dict[int, list[tuple[int, int]]]] = [{} for _ in self.columns]
         hllast_line = -1
-        for column in self.columns:
-            hlmap = {}
-            for i, (_, text, _) in enumerate(column):
-                if against_lowercase:
-                    text = text.lower()
-
-                indices = []
-                x = text.find(s)
-                # NOTE: On Python 3.11+ `x != -1` is finally faster than `~x`
-                while x != -1:
-                    nmatches += 1
-                    indices.append(x)
-                    x = text.find(s, x + len(s))
-
-                if indices:
-                    hlmap[i] = indices
-                    if i > hllast_line:
-                        hllast_line = i
-
-            hls.append(hlmap)
-
-        if nmatches:
-            self.hl = ScreenHighlight(hls, nmatches, s, hllast_line)
-        else:
-            self.hl = None
+        for col_i, line_i, hl_x, span in index.locate(self._layout, matches):
+            hls[col_i].setdefault(line_i, []).append((hl_x, span))
+            if line_i > hllast_line:
+                hllast_line = line_i
 
-        return nmatches
+        self.hl = ScreenHighlight(hls, len(matches), s, hllast_line)
+        return len(matches)
 
     def hl_clear(self) -> None:
         self.hl = None
@@ -926,6 +1386,7 @@ class Screen:
 
     def key_end(self) -> None:
         if self.vmode:
+            self._complete_layout()
             self.cursor.go_bottom()
         self.view_bottom()
 
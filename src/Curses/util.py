@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import curses
+import functools
+import re
 import shutil
 from subprocess import DEVNULL
 from subprocess import PIPE
@@ -20,6 +22,12 @@ BORDER_PAD = 1
 
 HIGHLIGHT = curses.A_STANDOUT | curses.A_BOLD
 
+# "Find in page" phrases starting with this are regular expressions. A
+# doubled prefix escapes it, e.g. "//ˈwɜrd/" finds "/ˈwɜrd/" literally.
+REGEX_SEARCH_PREFIX = '/'
+
+SEARCH_PATTERN_CACHE_SIZE = 32
+
 if WINDOWS:
     def _selection_command() -> tuple[str, ...] | None:
         powershell = shutil.which('powershell.exe')
@@ -124,6 +132,57 @@ def compose_attrs(
     return attrs
 
 
+def merge_attrs(attrs: Iterable[Attr], end: int) -> list[Attr]:
+    # Clips `attrs` to [0, end) and merges adjacent spans of equal attributes.
+    # Gaps are left as they are, they are drawn without any attributes.
+    result: list[Attr] = []
+    x = 0
+    for i, span, attr in attrs:
+        if i < x:
+            span -= x - i
+            i = x
+        if i + span > end:
+            span = end - i
+        if span <= 0:
+            continue
+
+        if result and result[-1].attr == attr and result[-1].i + result[-1].span == i:
+            result[-1] = Attr(result[-1].i, result[-1].span + span, attr)
+        else:
+            result.append(Attr(i, span, attr))
+        x = i + span
+
+    return result
+
+
+def split_search_phrase(s: str) -> tuple[str, bool]:
+    # return: the phrase to look for and whether it's a regular expression.
+    if s.startswith(2 * REGEX_SEARCH_PREFIX):
+        return s[len(REGEX_SEARCH_PREFIX):], False
+    if s.startswith(REGEX_SEARCH_PREFIX):
+        return s[len(REGEX_SEARCH_PREFIX):], True
+    return s, False
+
+
+_ESCAPE_RE = re.compile(r'\\.')
+
+
+# Patterns are recompiled on every keystroke of a "Find in page" prompt and
+# for every column layout after a resize. Invalid patterns are cached too.
+@functools.lru_cache(maxsize=SEARCH_PATTERN_CACHE_SIZE)
+def compile_search_pattern(s: str) -> re.Pattern[str] | None:
+    # Smartcase, same as the literal search, escapes like "\S" don't count.
+    # "^" and "$" match at the start and end of every op (screens) or line
+    # (pagers).
+    flags = re.MULTILINE
+    if not any(c.isupper() for c in _ESCAPE_RE.sub('', s)):
+        flags |= re.IGNORECASE
+    try:
+        return re.compile(s, flags)
+    except re.error:
+        return None
+
+
 def mouse_left_click(bstate: int) -> bool:
     return bool(bstate & curses.BUTTON1_PRESSED)
 
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Any
+from typing import Callable
+from typing import NamedTuple
+
+from src.Curses.proto import StatusProto
+
+
+class _Job(NamedTuple):
+    name: str
+    f: Callable[[StatusProto], Any]
+    on_done: Callable[[Any], None] | None
+    cancelled: threading.Event
+
+
+class _Recorder(StatusProto):
+    # Status of a job running in the worker thread, its messages are
+    # replayed on the real Status by `Worker.poll()`.
+    def __init__(self, job: _Job, results: queue.Queue[tuple[_Job, str, Any]]) -> None:
+        self.job = job
+        self.results = results
+
+    def _put(self, method: str, header: str, body: str | None) -> None:
+        self.results.put((self.job, method, (header, body)))
+
+    def writeln(self, header: str, body: str | None = None) -> None:
+        self._put('writeln', header, body)
+
+    def error(self, header: str, body: str | None = None) -> None:
+        self._put('error', header, body)
+
+    def success(self, header: str, body: str | None = None) -> None:
+        self._put('success', header, body)
+
+    def attention(self, header: str, body: str | None = None) -> None:
+        self._put('attention', header, body)
+
+    def clear(self) -> None:
+        self.results.put((self.job, 'clear', None))
+
+
+class Worker:
+    # Runs AnkiConnect requests one at a time on a background thread, so
+    # that a slow or hung Anki doesn't block the interface. Jobs write to
+    # a Status of their own, which is replayed on the program's Status and
+    # their results are handed to `on_done` in the main thread by `poll()`.
+    def __init__(self) -> None:
+        self._jobs: queue.Queue[_Job] = queue.Queue()
+        self._results: queue.Queue[tuple[_Job, str, Any]] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._pending: list[_Job] = []
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._pending)
+
+    def submit(self,
+            name: str,
+            f: Callable[[StatusProto], Any],
+            on_done: Callable[[Any], None] | None = None
+    ) -> None:
+        job = _Job(name, f, on_done, threading.Event())
+        self._pending.append(job)
+        self._jobs.put(job)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            job = self._jobs.get()
+            try:
+                if job.cancelled.is_set():
+                    self._results.put((job, 'done', None))
+                    continue
+                result = job.f(_Recorder(job, self._results))
+            except Exception as e:
+                # Anything a job raises ends up on the status, raising it in
+                # the curses loop would take the whole program down.
+                message = (f'{job.name} failed:', str(e) or repr(e))
+                self._results.put((job, 'error', message))
+                self._results.put((job, 'done', None))
+            else:
+                self._results.put((job, 'done', result))
+            finally:
+                self._jobs.task_done()
+
+    def wait(self, timeout: float) -> bool:
+        # Waits for the submitted jobs to finish, e.g. before exiting.
+        # return: False if they haven't finished within `timeout` seconds.
+        with self._jobs.all_tasks_done:
+            return self._jobs.all_tasks_done.wait_for(
+                lambda: not self._jobs.unfinished_tasks, timeout
+            )
+
+    def cancel(self) -> int:
+        # Results of the cancelled jobs are discarded, but a request that
+        # has already been sent cannot be taken back.
+        # return: the number of jobs cancelled.
+        for job in self._pending:
+            job.cancelled.set()
+        n = len(self._pending)
+        self._pending.clear()
+        return n
+
+    def poll(self, status: StatusProto) -> bool:
+        # return: True if anything has been written to the `status`.
+        written = False
+        while True:
+            try:
+                job, kind, value = self._results.get_nowait()
+            except queue.Empty:
+                return written
+
+            if kind == 'done':
+                try:
+                    self._pending.remove(job)
+                except ValueError:
+                    pass
+            if job.cancelled.is_set():
+                continue
+
+            if kind == 'done':
+                if job.on_done is not None:
+                    job.on_done(value)
+            elif kind == 'clear':
+                status.clear()
+                written = True
+            else:
+                getattr(status, kind)(*value)
+                written = True
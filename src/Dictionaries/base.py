@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import bisect
 from dataclasses import dataclass
 from itertools import chain
 from typing import Callable
@@ -127,31 +128,46 @@ class EntrySelector:
 
         self._ptoggled: dict[int, int] = {}
         self._pgrouped: dict[int, list[int]] = {}
-        self._toggles: list[bool] = [False] * len(dictionary.contents)
+        # Bitset of toggled indices.
+        self._toggles = 0
+
+        # Sorted indices of PHRASEs, indices of toggleable entries in order
+        # of their definition numbers and a bitmask of selectable entries
+        # of each phrase.
+        self._phrase_indices: list[int] = []
+        self._def_indices: list[int] = []
+        self._pselectable: dict[int, int] = {}
 
         last_i = None
         for i, op in enumerate(dictionary.contents):
+            if isinstance(op, self.TOGGLEABLE):
+                self._def_indices.append(i)
+
             if isinstance(op, PHRASE):
                 self._ptoggled[i] = 0
                 self._pgrouped[i] = [i]
+                self._pselectable[i] = 1 << i
+                self._phrase_indices.append(i)
                 last_i = i
             elif last_i is None:
                 continue
             else:
                 self._pgrouped[last_i].append(i)
+                if isinstance(op, self.SELECTABLE):
+                    self._pselectable[last_i] |= 1 << i
 
     TOGGLEABLE = (DEF, SYN)
     SELECTABLE = (PHRASE, AUDIO, ETYM, POS)
 
     def _toggle(self, index: int) -> None:
         pi = self.phrase_index_for(index)
-        self._toggles[index] = not self._toggles[index]
-        self._ptoggled[pi] += 1 if self._toggles[index] else -1
+        self._toggles ^= 1 << index
+        self._ptoggled[pi] += 1 if self.is_toggled(index) else -1
 
-        contents = self.dictionary.contents
-        for i in self._pgrouped[pi]:
-            if isinstance(contents[i], self.SELECTABLE):
-                self._toggles[i] = bool(self._ptoggled[pi])
+        if self._ptoggled[pi]:
+            self._toggles |= self._pselectable[pi]
+        else:
+            self._toggles &= ~self._pselectable[pi]
 
     def toggle_index(self, index: int) -> None:
         if not isinstance(self.dictionary.contents[index], self.TOGGLEABLE):
@@ -160,16 +176,11 @@ class EntrySelector:
         self._toggle(index)
 
     def toggle_def_index(self, index: int) -> None:
-        current = 0
-        for i, op in enumerate(self.dictionary.contents):
-            if isinstance(op, self.TOGGLEABLE):
-                current += 1
-                if current == index:
-                    self._toggle(i)
-                    return
+        if 0 < index <= len(self._def_indices):
+            self._toggle(self._def_indices[index - 1])
 
     def is_toggled(self, index: int) -> bool:
-        return self._toggles[index]
+        return bool(self._toggles >> index & 1)
 
     def is_phrase_index(self, index: int) -> bool:
         return index in self._ptoggled
@@ -178,9 +189,9 @@ class EntrySelector:
         if not self._ptoggled:
             raise ValueError('dictionary has no PHRASE entries')
 
-        for pi in reversed(self._ptoggled):
-            if index >= pi:
-                return pi
+        i = bisect.bisect_right(self._phrase_indices, index)
+        if i:
+            return self._phrase_indices[i - 1]
 
         raise ValueError(f'out of bounds: {len(self.dictionary.contents)=}, {index=}')
 
@@ -230,7 +241,7 @@ class EntrySelector:
 
         result = []
         for pi, indices in pgrouped:
-            if not toggles[pi]:
+            if not toggles >> pi & 1:
                 continue
 
             phrase: PHRASE = contents[pi]  # type: ignore[assignment]
@@ -242,7 +253,7 @@ class EntrySelector:
             etymology: ETYM | None = None
             pos: POS | None = None
             for i in indices:
-                if not toggles[i]:
+                if not toggles >> i & 1:
                     continue
 
                 op = contents[i]
@@ -283,7 +294,7 @@ class EntrySelector:
             return self._retrieve_selection(self._pgrouped.items())
         else:
             for pi in self._pgrouped:
-                if self._toggles[pi]:
+                if self.is_toggled(pi):
                     return self._retrieve_selection((
                         (pi, chain.from_iterable(self._pgrouped.values())),
                     ))
@@ -292,5 +303,4 @@ class EntrySelector:
 
     def clear_selection(self) -> None:
         self._ptoggled = {k: 0 for k in self._ptoggled}
-        for i, _ in enumerate(self._toggles):
-            self._toggles[i] = False
+        self._toggles = 0
@@ -1,5 +1,12 @@
 from __future__ import annotations
 
+import mmap
+import os
+import re
+import threading
+
+from src.data import DATA_DIR
+from src.data import getconf
 from src.Dictionaries.base import Dictionary
 from src.Dictionaries.base import DictionaryError
 from src.Dictionaries.base import HEADER
@@ -13,6 +20,36 @@ from src.Dictionaries.util import try_request
 DICTIONARY = 'WordNet'
 DICTIONARY_URL = 'http://wordnetweb.princeton.edu/perl/webwn'
 
+# Order in which parts of speech are presented by the WordNet web interface.
+POS_TO_LABEL = (
+    ('noun', 'Noun'),
+    ('verb', 'Verb'),
+    ('adj',  'Adjective'),
+    ('adv',  'Adverb'),
+)
+
+# Detachment rules of the WordNet morphological processor (morphy).
+MORPHY_SUFFIXES = {
+    'noun': (
+        ('s', ''), ('ses', 's'), ('xes', 'x'), ('zes', 'z'),
+        ('ches', 'ch'), ('shes', 'sh'), ('men', 'man'), ('ies', 'y'),
+    ),
+    'verb': (
+        ('s', ''), ('ies', 'y'), ('es', 'e'), ('es', ''),
+        ('ed', 'e'), ('ed', ''), ('ing', 'e'), ('ing', ''),
+    ),
+    'adj': (
+        ('er', ''), ('est', ''), ('er', 'e'), ('est', 'e'),
+    ),
+    'adv': (),
+}
+
+# Syntactic markers of adjectives, e.g. "galore(ip)".
+ADJ_MARKERS = (b'(a)', b'(p)', b'(ip)')
+
+# Semicolons between the quoted examples of a gloss.
+EXAMPLE_SEPARATOR_RE = re.compile(r'(?<=");\s*(?=")')
+
 
 def ask_wordnet(query: str) -> Dictionary:
     soup = parse_response(try_request(DICTIONARY_URL, {'s': query}))
@@ -52,3 +89,220 @@ def ask_wordnet(query: str) -> Dictionary:
                 )
 
     return wordnet
+
+
+def wordnet_database_paths() -> list[str]:
+    candidates = []
+    if (wnsearchdir := os.environ.get('WNSEARCHDIR')) is not None:
+        candidates.append(wnsearchdir)
+    if (wnhome := os.environ.get('WNHOME')) is not None:
+        candidates.append(os.path.join(wnhome, 'dict'))
+    candidates.extend((
+        os.path.join(DATA_DIR, 'WordNet'),
+        '/usr/share/wordnet',
+        '/usr/local/share/wordnet',
+        '/usr/local/WordNet-3.0/dict',
+        '/opt/homebrew/share/wordnet',
+    ))
+
+    result = [
+        x for x in candidates
+        if os.path.isfile(os.path.join(x, 'index.noun'))
+    ]
+    if not result:
+        raise ValueError('no WordNet database found')
+
+    return result
+
+
+def _bisect_line(mm: mmap.mmap, key: bytes) -> bytes | None:
+    # Binary search over a file sorted line by line. `key` has to include
+    # the separator that follows it, so that "dog" does not match "dog_days".
+    lo = 0
+    hi = len(mm)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start = mm.rfind(b'\n', 0, mid) + 1
+        end = mm.find(b'\n', start)
+        if end == -1:
+            end = len(mm)
+
+        line = mm[start:end]
+        if line.startswith(key):
+            return line
+        elif line < key:
+            lo = end + 1
+        else:
+            hi = start
+
+    return None
+
+
+def _map_file(path: str) -> mmap.mmap | None:
+    try:
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):  # ValueError: empty file
+        return None
+
+
+class _WordNetDatabase:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._index: dict[str, mmap.mmap | None] = {}
+        self._data: dict[str, mmap.mmap | None] = {}
+        self._exc: dict[str, mmap.mmap | None] = {}
+        for pos, _ in POS_TO_LABEL:
+            self._index[pos] = _map_file(os.path.join(path, f'index.{pos}'))
+            self._data[pos] = _map_file(os.path.join(path, f'data.{pos}'))
+            self._exc[pos] = _map_file(os.path.join(path, f'{pos}.exc'))
+
+    def close(self) -> None:
+        for files in (self._index, self._data, self._exc):
+            for mm in files.values():
+                if mm is not None:
+                    mm.close()
+
+    def offsets(self, lemma: bytes, pos: str) -> list[int]:
+        index = self._index[pos]
+        if index is None:
+            return []
+
+        line = _bisect_line(index, lemma + b' ')
+        if line is None:
+            return []
+
+        # lemma pos synset_cnt p_cnt [ptr_symbol...] sense_cnt tagsense_cnt
+        # synset_offset [synset_offset...]
+        fields = line.split()
+        synset_cnt = int(fields[2])
+        return [int(x) for x in fields[-synset_cnt:]]
+
+    def synset(self, offset: int, pos: str) -> SYN:
+        data = self._data[pos]
+        if data is None:
+            raise DictionaryError(f'ERROR: {DICTIONARY}: no data.{pos} file')
+
+        end = data.find(b'\n', offset)
+        line = data[offset:end if end != -1 else len(data)]
+
+        # synset_offset lex_filenum ss_type w_cnt word lex_id [word lex_id...]
+        # p_cnt [ptr...] [frames...] | gloss
+        head, _, gloss = line.partition(b' | ')
+        fields = head.split()
+        try:
+            w_cnt = int(fields[3], 16)
+        except (IndexError, ValueError):
+            raise DictionaryError(f'ERROR: {DICTIONARY}: bad synset at {offset}')
+
+        words = []
+        for word in fields[4:4 + 2*w_cnt:2]:
+            if pos == 'adj' and word.endswith(b')'):
+                for marker in ADJ_MARKERS:
+                    if word.endswith(marker):
+                        word = word[:-len(marker)]
+                        break
+            words.append(word.decode().replace('_', ' '))
+
+        # Examples follow the definition and they might have semicolons of
+        # their own, only the ones between the quotes separate them.
+        definition = gloss.decode().strip()
+        if definition.startswith('"'):
+            definition, examples = '', definition
+        else:
+            definition, sep, examples = definition.partition('; "')
+            examples = sep.lstrip('; ') + examples
+
+        return SYN(
+            ', '.join(words),
+            f'({definition.strip()})',
+            [x for x in map(str.strip, EXAMPLE_SEPARATOR_RE.split(examples)) if x]
+        )
+
+    def _exceptions(self, lemma: bytes, pos: str) -> list[bytes]:
+        exc = self._exc[pos]
+        if exc is None:
+            return []
+
+        line = _bisect_line(exc, lemma + b' ')
+        if line is None:
+            return []
+
+        return line.split()[1:]
+
+    def morphy(self, lemma: bytes, pos: str) -> bytes | None:
+        if self.offsets(lemma, pos):
+            return lemma
+
+        candidates = self._exceptions(lemma, pos)
+        for suffix, ending in MORPHY_SUFFIXES[pos]:
+            bsuffix = suffix.encode()
+            if lemma.endswith(bsuffix) and len(lemma) > len(bsuffix):
+                candidates.append(lemma[:-len(bsuffix)] + ending.encode())
+
+        for candidate in candidates:
+            if self.offsets(candidate, pos):
+                return candidate
+
+        return None
+
+
+class _LocalWordNet:
+    def __init__(self) -> None:
+        self._db: _WordNetDatabase | None = None
+        self._lock = threading.Lock()
+
+    def _find_path(self) -> str:
+        path = getconf('wordnetdir')
+        if path != '-':
+            return os.path.expanduser(path)
+
+        try:
+            return wordnet_database_paths()[0]
+        except ValueError:
+            raise DictionaryError(
+                f'{DICTIONARY}: database not found, set the \'wordnetdir\' option'
+            )
+
+    @property
+    def db(self) -> _WordNetDatabase:
+        path = self._find_path()
+        with self._lock:
+            if self._db is None or self._db.path != path:
+                if self._db is not None:
+                    self._db.close()
+                if not os.path.isfile(os.path.join(path, 'index.noun')):
+                    raise DictionaryError(
+                        f'{DICTIONARY}: no database in {path!r}'
+                    )
+                self._db = _WordNetDatabase(path)
+
+            return self._db
+
+
+_local_wordnet = _LocalWordNet()
+
+
+def ask_wordnet_local(query: str) -> Dictionary:
+    lemma = '_'.join(query.lower().split()).encode()
+    if not lemma:
+        raise DictionaryError(f'{DICTIONARY}: invalid query {query!r}')
+
+    db = _local_wordnet.db
+
+    wordnet = Dictionary()
+    wordnet.add(HEADER(DICTIONARY))
+    wordnet.add(PHRASE(query, ''))
+    for pos, label in POS_TO_LABEL:
+        base = db.morphy(lemma, pos)
+        if base is None:
+            continue
+
+        wordnet.add(LABEL(label, ''))
+        for offset in db.offsets(base, pos):
+            wordnet.add(db.synset(offset, pos))
+
+    if len(wordnet.contents) == 2:
+        raise DictionaryError(f'{DICTIONARY}: {query!r} not found')
+
+    return wordnet
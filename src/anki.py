@@ -1,28 +1,45 @@
 from __future__ import annotations
 
 import atexit
+import base64
+import hashlib
+import html
 import json
 import os
+import socket
+import re
 import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
+from typing import Iterable
 from typing import Literal
 from typing import overload
 from typing import TYPE_CHECKING
 
 from urllib3.exceptions import NewConnectionError
+from urllib3.exceptions import TimeoutError as HTTPTimeoutError
 
+from src.data import ANKI_CACHE_PATH
+from src.data import CARD_QUEUE_PATH
 from src.data import DATA_DIR
 from src.data import getconf
 from src.data import LINUX
 from src.data import MAC
+from src.data import MEDIA_INDEX_PATH
 from src.data import note_t
 from src.data import ROOT_DIR
 from src.data import WINDOWS
+from src.Dictionaries.base import PHRASE
 from src.Dictionaries.util import http
 
 if TYPE_CHECKING:
     from src.card import cardkey_t
     from src.card import Card
+    from src.Dictionaries.base import Dictionary
 
 SCHEME_TO_FIELD: tuple[tuple[str, cardkey_t], ...] = (
     ('def',      'DEF'),
@@ -74,10 +91,16 @@ SCHEME_TO_FIELD: tuple[tuple[str, cardkey_t], ...] = (
 
 PHRASE_SCHEMES = [x[0] for x in SCHEME_TO_FIELD if x[1] == 'PHRASE']
 
+# Seconds to wait for AnkiConnect to respond.
+ANKI_TIMEOUT = 10
+
 
 class AnkiError(Exception):
     pass
 
+class AnkiUnreachableError(AnkiError):
+    pass
+
 class FirstFieldEmptyError(AnkiError):
     pass
 
@@ -88,28 +111,42 @@ class ModelExistsError(AnkiError):
     pass
 
 
+# Whether the last request has reached Anki, None before the first one.
+_reachable: bool | None = None
+
+
 INVOKE_ACTIONS = Literal[
     'addNote',
     'createModel',
     'deckNames',
+    'findNotes',
     'guiBrowse',
     'guiCurrentCard',
     'modelFieldNames',
     'modelNames',
+    'multi',
+    'notesInfo',
+    'storeMediaFile',
+    'updateNoteFields',
 ]
 # Overloads are added on an as-needed basis, some
 # signatures are just too complex to bother typing them.
 @overload
 def invoke(action: Literal['deckNames', 'modelFieldNames', 'modelNames'], **params: Any) -> list[str]: ...
 @overload
-def invoke(action: Literal['guiBrowse'], **params: Any) -> list[int]: ...
+def invoke(action: Literal['findNotes', 'guiBrowse'], **params: Any) -> list[int]: ...
 @overload
 def invoke(action: Literal['addNote'], **params: Any) -> int: ...
 @overload
-def invoke(action: Literal['createModel', 'guiCurrentCard'], **params: Any) -> Any: ...
+def invoke(action: Literal['multi', 'notesInfo'], **params: Any) -> list[dict[str, Any]]: ...
+@overload
+def invoke(action: Literal['storeMediaFile'], **params: Any) -> str: ...
+@overload
+def invoke(action: Literal['createModel', 'guiCurrentCard', 'updateNoteFields'], **params: Any) -> Any: ...
 
 
 def invoke(action: INVOKE_ACTIONS, **params: Any) -> Any:
+    global _reachable
     json_request = json.dumps(
         {'action': action, 'params': params, 'version': 6}
     ).encode()
@@ -120,55 +157,103 @@ def invoke(action: INVOKE_ACTIONS, **params: Any) -> Any:
                 'POST',
                 'http://127.0.0.1:8765',
                 retries=False,
+                timeout=ANKI_TIMEOUT,
                 body=json_request
             ).data.decode()
         )
     except NewConnectionError:
-        raise AnkiError('could not connect with Anki')
+        _reachable = False
+        raise AnkiUnreachableError('could not connect with Anki')
+    except HTTPTimeoutError:
+        raise AnkiError(f'Anki has not responded in {ANKI_TIMEOUT} seconds')
+
+    if _reachable is False:
+        # Anki has been restarted, decks and note types might have changed.
+        models.revalidate()
+    _reachable = True
 
     err = response['error']
     if err is None:
         return response['result']
 
-    err = err.lower()
+    raise _error_from_response(err)
+
+
+def _error_from_response(error: str) -> Exception:
+    err = error.lower()
     if err.startswith('model was not found:'):
-        raise AnkiError('could not find note: ' + getconf('note'))
+        return AnkiError('could not find note: ' + getconf('note'))
 
     elif err.startswith('deck was not found'):
-        raise AnkiError('could not find deck: ' + getconf('deck'))
+        return AnkiError('could not find deck: ' + getconf('deck'))
 
     elif err.startswith('cannot create note because it is empty'):
-        raise FirstFieldEmptyError('first field empty')
+        return FirstFieldEmptyError('first field empty')
 
     elif err.startswith('cannot create note because it is a duplicate'):
-        raise AnkiError('card is a duplicate')
+        return AnkiError('card is a duplicate')
 
     elif err.startswith('model name already exists'):
-        raise ModelExistsError('note with this name already exists')
+        return ModelExistsError('note with this name already exists')
 
     elif err.startswith('gui review is not currently active'):
-        raise AnkiError('action available only in review mode')
+        return AnkiError('action available only in review mode')
 
     elif err.startswith(('collection is not available', "'nonetype' object has no attribute")):
-        raise AnkiError('could not connect with Anki')
+        return AnkiUnreachableError('could not connect with Anki')
 
     else:
-        raise Exception(response['error'])
+        return Exception(error)
 
 
-def currently_reviewed_phrase() -> str:
-    for key, value in invoke('guiCurrentCard')['fields'].items():
-        key = key.lower()
+def invoke_multi(actions: list[tuple[INVOKE_ACTIONS, dict[str, Any]]]) -> list[Any]:
+    # Sends all `actions` in a single request. Failed actions don't fail the
+    # request, their results are the exceptions `invoke` would have raised.
+    if not actions:
+        return []
+
+    responses = invoke('multi', actions=[
+        {'action': action, 'params': params, 'version': 6}
+        for action, params in actions
+    ])
+
+    result = []
+    for response in responses:
+        err = response['error']
+        if err is None:
+            result.append(response['result'])
+        else:
+            result.append(_error_from_response(err))
+
+    return result
+
+
+def phrase_field(field_names: Iterable[str]) -> str | None:
+    for field_name in field_names:
+        key = field_name.lower()
         for scheme in PHRASE_SCHEMES:
             if scheme in key:
-                return value['value']  # type: ignore[no-any-return]
+                return field_name
+
+    return None
 
-    raise AnkiError('could not find a "Phrase-like" field')
+
+def currently_reviewed_phrase() -> str:
+    fields = invoke('guiCurrentCard')['fields']
+    field_name = phrase_field(fields)
+    if field_name is None:
+        raise AnkiError('could not find a "Phrase-like" field')
+
+    return fields[field_name]['value']  # type: ignore[no-any-return]
 
 
 def _map_scheme_to_fields(model_name: str) -> dict[str, cardkey_t | None]:
+    return map_field_names(invoke('modelFieldNames', modelName=model_name))
+
+
+def map_field_names(field_names: list[str]) -> dict[str, cardkey_t | None]:
     result: dict[str, cardkey_t | None] = {}
-    for field_name in invoke('modelFieldNames', modelName=model_name):
+    for field_name in field_names:
         first_word_of_field_name = field_name.lower().partition(' ')[0]
         for scheme, base in SCHEME_TO_FIELD:
             if scheme in first_word_of_field_name:
@@ -180,37 +265,153 @@ def _map_scheme_to_fields(model_name: str) -> dict[str, cardkey_t | None]:
     return result
 
 
+# Incremented when the format of the metadata cache changes, caches in
+# other formats are discarded.
+ANKI_CACHE_VERSION = 1
+
+
 class _AnkiModels:
-    def __init__(self) -> None:
+    # Field mappings of the note types, names of the note types and names of
+    # the decks, kept on disk so that nothing has to wait for Anki to respond.
+    # The cache is revalidated in the background at startup and every time
+    # Anki becomes reachable again.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
         self._model_cache: dict[str, dict[str, cardkey_t | None]] | None = None
-
-    def _save_models(self, path: str) -> None:
-        with open(path, 'w') as f:
-            json.dump(self._model_cache, f, indent=2)
+        self._model_names: list[str] | None = None
+        self._deck_names: list[str] | None = None
+
+    def _load(self) -> dict[str, dict[str, cardkey_t | None]]:
+        if self._model_cache is not None:
+            return self._model_cache
+
+        try:
+            with open(self.path) as f:
+                cache = json.load(f)
+        except (FileNotFoundError, ValueError):
+            cache = None
+        if not isinstance(cache, dict) or cache.get('version') != ANKI_CACHE_VERSION:
+            cache = {}
+            # Models saved by previous versions.
+            try:
+                with open(os.path.join(DATA_DIR, 'ankiconnect.json')) as f:
+                    cache['models'] = json.load(f)
+            except (FileNotFoundError, ValueError):
+                pass
+
+        self._model_cache = cache.get('models', {})
+        self._model_names = cache.get('modelNames')
+        self._deck_names = cache.get('deckNames')
+        return self._model_cache
+
+    def _save(self) -> None:
+        # Written to a temporary file first, so that a crash can't leave a
+        # truncated cache behind.
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': ANKI_CACHE_VERSION,
+                'models': self._model_cache,
+                'modelNames': self._model_names,
+                'deckNames': self._deck_names,
+            }, f, indent=2)
+        os.replace(tmp_path, self.path)
 
     def get_model(self,
             model: str,
             recheck: bool = False
     ) -> dict[str, cardkey_t | None]:
-        if self._model_cache is None:
-            path = os.path.join(DATA_DIR, 'ankiconnect.json')
-            try:
-                with open(path) as f:
-                    self._model_cache = json.load(f)
-            except FileNotFoundError:
-                self._model_cache = {}
-            atexit.register(self._save_models, path)
-
-        if recheck or model not in self._model_cache:
-            self._model_cache[model] = _map_scheme_to_fields(model)
-
-        return self._model_cache[model]
-
-
-models = _AnkiModels()
-
-
-def _add_card(model_name: str, card: Card, model: dict[str, cardkey_t | None]) -> int:
+        with self._lock:
+            cached = self._load().get(model)
+        if cached is not None and not recheck:
+            return cached
+
+        mapping = _map_scheme_to_fields(model)
+        with self._lock:
+            self._load()[model] = mapping
+            self._save()
+        return mapping
+
+    def model_names(self) -> list[str]:
+        with self._lock:
+            self._load()
+            names = self._model_names
+        if names is None:
+            names = invoke('modelNames')
+            with self._lock:
+                self._model_names = names
+                self._save()
+        return list(names)
+
+    def deck_names(self) -> list[str]:
+        with self._lock:
+            self._load()
+            names = self._deck_names
+        if names is None:
+            names = invoke('deckNames')
+            with self._lock:
+                self._deck_names = names
+                self._save()
+        return list(names)
+
+    def add_model_name(self, model: str) -> None:
+        # For note types created by this program, before the next revalidation.
+        with self._lock:
+            self._load()
+            if self._model_names is not None and model not in self._model_names:
+                self._model_names.append(model)
+                self._save()
+
+    def _revalidate(self) -> None:
+        with self._lock:
+            names = list({**self._load(), getconf('note'): None})
+
+        model_names, deck_names, *mappings = invoke_multi([
+            ('modelNames', {}),
+            ('deckNames', {}),
+            *[('modelFieldNames', {'modelName': name}) for name in names],
+        ])
+        if isinstance(model_names, Exception):
+            raise model_names
+        if isinstance(deck_names, Exception):
+            raise deck_names
+
+        model_cache = {
+            name: map_field_names(field_names)
+            for name, field_names in zip(names, mappings)
+            if name in model_names and not isinstance(field_names, Exception)
+        }
+        with self._lock:
+            self._model_cache = model_cache
+            self._model_names = model_names
+            self._deck_names = deck_names
+            self._save()
+
+    def _run(self) -> None:
+        try:
+            self._revalidate()
+        except Exception:
+            # The cache is kept until Anki can be asked again.
+            pass
+        finally:
+            with self._lock:
+                self._thread = None
+
+    def revalidate(self) -> None:
+        # Refreshes the whole cache in the background with a single request.
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+
+models = _AnkiModels(ANKI_CACHE_PATH)
+
+
+def _note_fields(card: Card, model: dict[str, cardkey_t | None]) -> dict[str, str]:
     fields = {
         anki_field_name: card[ckey]
         for anki_field_name, ckey in model.items()
@@ -219,19 +420,28 @@ def _add_card(model_name: str, card: Card, model: dict[str, cardkey_t | None]) -
     if not fields:
         raise IncompatibleModelError(f'note {getconf("note")} has no compatible fields, try rechecking (F4)')
 
-    return invoke(
-        'addNote',
-        note={
-            'deckName': getconf('deck'),
-            'modelName': model_name,
-            'fields': fields,
-            'options': {
-                'allowDuplicate': getconf('duplicates'),
-                'duplicateScope': getconf('dupescope')
-            },
-            'tags': getconf('tags').split(',')
-        }
-    )
+    return fields
+
+
+# Everything `addNote` needs except for the fields.
+def _note_template(model_name: str) -> dict[str, Any]:
+    return {
+        'deckName': getconf('deck'),
+        'modelName': model_name,
+        'options': {
+            'allowDuplicate': getconf('duplicates'),
+            'duplicateScope': getconf('dupescope')
+        },
+        'tags': getconf('tags').split(',')
+    }
+
+
+def _note(model_name: str, card: Card, model: dict[str, cardkey_t | None]) -> dict[str, Any]:
+    return {**_note_template(model_name), 'fields': _note_fields(card, model)}
+
+
+def _add_card(model_name: str, card: Card, model: dict[str, cardkey_t | None]) -> int:
+    return invoke('addNote', note=_note(model_name, card, model))
 
 
 def add_card(card: Card) -> int:
@@ -245,6 +455,57 @@ def add_card(card: Card) -> int:
         return _add_card(model_name, card, models.get_model(model_name, recheck=True))
 
 
+def _add_cards(
+        model_name: str,
+        cards: list[Card],
+        model: dict[str, cardkey_t | None]
+) -> list[int | Exception]:
+    notes = [_note(model_name, card, model) for card in cards]
+
+    check_duplicates = not getconf('duplicates')
+    # Anki rejects duplicates the index doesn't know about yet by itself.
+    local: list[Exception | None] = [
+        AnkiError('card is a duplicate')
+        if check_duplicates and duplicates.is_duplicate(note) else None
+        for note in notes
+    ]
+    sent = iter(invoke_multi([
+        ('addNote', {'note': note})
+        for note, x in zip(notes, local)
+        if x is None
+    ]))
+
+    result: list[int | Exception] = []
+    for note, x in zip(notes, local):
+        if x is None:
+            x = next(sent)
+            if not isinstance(x, Exception):
+                duplicates.add(note)
+        result.append(x)
+
+    return result
+
+
+def add_cards(cards: list[Card]) -> list[int | Exception]:
+    # Adds `cards` in a single request. Results are in the order of `cards`,
+    # either a note id or the exception adding that card has failed with.
+    model_name = getconf('note')
+
+    try:
+        result = _add_cards(model_name, cards, models.get_model(model_name))
+    except IncompatibleModelError:
+        return _add_cards(model_name, cards, models.get_model(model_name, recheck=True))
+
+    # Same as in `add_card()`, only the notes that failed are sent again.
+    retry = [i for i, x in enumerate(result) if isinstance(x, FirstFieldEmptyError)]
+    if retry:
+        model = models.get_model(model_name, recheck=True)
+        for i, x in zip(retry, _add_cards(model_name, [cards[i] for i in retry], model)):
+            result[i] = x
+
+    return result
+
+
 def add_custom_note(note_name: str) -> str:
     with open(os.path.join(ROOT_DIR, note_name)) as f:
         note: note_t = json.load(f)
@@ -260,6 +521,7 @@ def add_custom_note(note_name: str) -> str:
             'Back': note['back']
         }]
     )
+    models.add_model_name(note['modelName'])
 
     return note['modelName']
 
@@ -289,3 +551,458 @@ def collection_media_paths() -> list[str]:
         raise ValueError('no collection.media paths found')
 
     return result
+
+
+# Seconds after which the duplicate index is rebuilt, notes might have been
+# added or deleted in Anki in the meantime.
+DUPLICATE_INDEX_TTL = 600
+# Seconds between attempts to build the index if Anki isn't reachable.
+DUPLICATE_INDEX_RETRY_INTERVAL = 60
+# Number of notes requested by a single `notesInfo` request.
+DUPLICATE_INDEX_CHUNK = 500
+
+_HTML_TAG_RE = re.compile(r'<[^>]*>')
+
+
+def normalize_field(s: str) -> str:
+    # Close enough to what Anki compares when it looks for duplicates.
+    return html.unescape(_HTML_TAG_RE.sub('', s)).strip()
+
+
+class _DuplicateIndex:
+    # First fields of the notes in Anki, so that duplicates can be rejected
+    # without asking Anki every time, and the fields phrases go into, so
+    # that phrases that already have a card can be marked. Notes are
+    # duplicates if they have the same model and first field and, if
+    # `dupescope` is "deck", are in the same deck.
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._fields: dict[tuple[str, str | None], set[str]] = {}
+        self._phrases: dict[tuple[str, str | None], set[str]] = {}
+        self._built: dict[tuple[str, str | None], float] = {}
+        self._attempted: dict[tuple[str, str | None], float] = {}
+        self._first_field: dict[str, str] = {}
+        self._phrase_field: dict[str, str | None] = {}
+        # Incremented every time the index changes.
+        self.version = 0
+
+    @staticmethod
+    def _scope(model_name: str, deck: str) -> tuple[str, str | None]:
+        return model_name, deck if getconf('dupescope') == 'deck' else None
+
+    def _fresh(self, key: tuple[str, str | None]) -> bool:
+        built = self._built.get(key)
+        return built is not None and time.monotonic() - built < DUPLICATE_INDEX_TTL
+
+    def _build(self, key: tuple[str, str | None]) -> None:
+        model_name, deck = key
+        first_field = invoke('modelFieldNames', modelName=model_name)[0]
+        phrase_field = next((
+            field_name
+            for field_name, cardkey in models.get_model(model_name).items()
+            if cardkey == 'PHRASE'
+        ), None)
+
+        query = f'"note:{model_name}"'
+        if deck is not None:
+            # Anki doesn't look for duplicates in subdecks.
+            query += f' "deck:{deck}" -"deck:{deck}::*"'
+        nids = invoke('findNotes', query=query)
+
+        fields = set()
+        phrases = set()
+        for i in range(0, len(nids), DUPLICATE_INDEX_CHUNK):
+            for info in invoke('notesInfo', notes=nids[i:i + DUPLICATE_INDEX_CHUNK]):
+                for field_name, field in info['fields'].items():
+                    if field['order'] == 0:
+                        fields.add(normalize_field(field['value']))
+                    if field_name == phrase_field:
+                        phrases.add(normalize_field(field['value']))
+
+        with self._lock:
+            self._first_field[model_name] = first_field
+            self._phrase_field[model_name] = phrase_field
+            self._fields[key] = fields
+            self._phrases[key] = phrases
+            self._built[key] = time.monotonic()
+            self.version += 1
+
+    def _run(self, key: tuple[str, str | None]) -> None:
+        try:
+            self._build(key)
+        except Exception:
+            # The index is only a shortcut, Anki checks for duplicates anyway.
+            pass
+        finally:
+            with self._lock:
+                self._thread = None
+
+    def start(self) -> None:
+        # Builds the index of the configured note and deck in the background
+        # if it's missing or out of date.
+        key = self._scope(getconf('note'), getconf('deck'))
+        with self._lock:
+            if self._thread is not None or self._fresh(key):
+                return
+            attempted = self._attempted.get(key)
+            if (
+                    attempted is not None
+                and time.monotonic() - attempted < DUPLICATE_INDEX_RETRY_INTERVAL
+            ):
+                return
+
+            self._attempted[key] = time.monotonic()
+            self._thread = threading.Thread(target=self._run, args=(key,), daemon=True)
+            self._thread.start()
+
+    def is_duplicate(self, note: dict[str, Any]) -> bool:
+        # Notes might have been deleted in Anki since the index was built,
+        # an out of date index is not trusted.
+        # return: False if the note is not a duplicate or the index of its
+        #         model and deck is missing or out of date.
+        model_name = note['modelName']
+        key = self._scope(model_name, note['deckName'])
+        with self._lock:
+            fresh = self._fresh(key)
+            result = fresh and normalize_field(
+                note['fields'].get(self._first_field[model_name], '')
+            ) in self._fields[key]
+
+        if not fresh:
+            self.start()
+        return result
+
+    def add(self, note: dict[str, Any]) -> None:
+        model_name = note['modelName']
+        key = self._scope(model_name, note['deckName'])
+        with self._lock:
+            if key not in self._fields:
+                return
+
+            size = len(self._fields[key]) + len(self._phrases[key])
+            self._fields[key].add(normalize_field(
+                note['fields'].get(self._first_field[model_name], '')
+            ))
+            phrase_field = self._phrase_field[model_name]
+            if phrase_field is not None:
+                self._phrases[key].add(normalize_field(
+                    note['fields'].get(phrase_field, '')
+                ))
+            if size != len(self._fields[key]) + len(self._phrases[key]):
+                self.version += 1
+
+    def state(self) -> tuple[tuple[str, str | None], int]:
+        return self._scope(getconf('note'), getconf('deck')), self.version
+
+    def phrase_indices(self, dictionary: Dictionary) -> set[int]:
+        # return: indices of the PHRASE ops of `dictionary` that already
+        #         have a note in Anki.
+        key = self._scope(getconf('note'), getconf('deck'))
+        with self._lock:
+            # Marks of an out of date index are kept until it is rebuilt.
+            present = self._phrases.get(key)
+            fresh = self._fresh(key)
+
+        if not fresh:
+            self.start()
+        if present is None:
+            return set()
+
+        return {
+            i for i, op in enumerate(dictionary.contents)
+            if isinstance(op, PHRASE) and normalize_field(op.phrase) in present
+        }
+
+
+duplicates = _DuplicateIndex()
+
+
+# Number of cards sent in a single request when the queue is flushed.
+CARD_QUEUE_BATCH = 50
+# Seconds between checks whether Anki is reachable again.
+CARD_QUEUE_RETRY_INTERVAL = 5
+
+
+def _anki_reachable() -> bool:
+    try:
+        with socket.create_connection(('127.0.0.1', 8765), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+class _CardQueue:
+    # Cards that could not be added, because Anki wasn't running. They are
+    # kept in an append-only journal and added by a background thread as
+    # soon as AnkiConnect is reachable again.
+    #
+    # Every line of the journal is a JSON object with the "key" of a queued
+    # card and one of:
+    #   "note" and "card": the card has been queued, with "media", the URL
+    #                      of its audio, if it has to be uploaded first,
+    #   "sent": a request with the card has been sent,
+    #   "done": the card has been added or rejected by Anki.
+    # Cards are sent with the options they have been queued with. Cards that
+    # have been sent, but not acknowledged, may have been added already, if
+    # duplicates are disallowed, Anki rejecting them means they have been.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pending: dict[str, dict[str, Any]] | None = None
+        self._sent: set[str] = set()
+        self._nadded = 0
+        self._failures: list[tuple[str, str]] = []
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if self._pending is not None:
+            return self._pending
+
+        self._pending = {}
+        try:
+            with open(self.path, encoding='UTF-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:  # torn write
+                        continue
+                    key = record['key']
+                    if 'note' in record:
+                        self._pending[key] = record
+                    elif record.get('sent'):
+                        self._sent.add(key)
+                    elif record.get('done'):
+                        self._pending.pop(key, None)
+                        self._sent.discard(key)
+        except FileNotFoundError:
+            return self._pending
+
+        # Compact the journal.
+        with open(self.path, 'w', encoding='UTF-8') as f:
+            for key, record in self._pending.items():
+                f.write(json.dumps(record) + '\n')
+                if key in self._sent:
+                    f.write(json.dumps({'key': key, 'sent': True}) + '\n')
+
+        return self._pending
+
+    def _write(self, records: list[dict[str, Any]]) -> None:
+        with open(self.path, 'a', encoding='UTF-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    def enqueue(self, cards: list[Card], media: list[str | None] | None = None) -> None:
+        # `media` are the URLs of audio uploaded with the cards, if any.
+        model_name = getconf('note')
+        if media is None:
+            media = [None] * len(cards)
+        records: list[dict[str, Any]] = []
+        for card, url in zip(cards, media):
+            record: dict[str, Any] = {
+                'key': uuid.uuid4().hex,
+                'note': _note_template(model_name),
+                'card': card,
+            }
+            if url is not None:
+                record['media'] = url
+            records.append(record)
+        with self._lock:
+            pending = self._load()
+            self._write(records)
+            for record in records:
+                pending[record['key']] = record
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                self._wake.set()
+            elif self._load():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        last_error = None
+        while True:
+            with self._lock:
+                if not self._load():
+                    self._thread = None
+                    return
+
+            try:
+                if _anki_reachable() and self.flush():
+                    last_error = None
+                    continue
+            except AnkiUnreachableError:
+                pass
+            except Exception as e:
+                # Reported once, the queue is kept until it can be added.
+                if str(e) != last_error:
+                    last_error = str(e)
+                    with self._lock:
+                        self._failures.append(('', last_error))
+
+            self._wake.wait(CARD_QUEUE_RETRY_INTERVAL)
+            self._wake.clear()
+
+    def flush(self) -> bool:
+        # Sends a batch of queued cards to Anki.
+        # Returns False if no card has been added or rejected.
+        with self._lock:
+            batch = list(self._load().values())[:CARD_QUEUE_BATCH]
+            if not batch:
+                return False
+
+        # Audio has to be in Anki before the cards that play it.
+        uploads = [
+            (record, media_uploads.upload(record['media'])[1])
+            for record in batch if 'media' in record
+        ]
+        media_failures = []
+        for record, upload in uploads:
+            try:
+                upload.result()
+            except AnkiUnreachableError:
+                raise
+            except AnkiError as e:
+                phrase = record['card'].get('PHRASE', '')
+                media_failures.append((phrase, f'uploading audio failed: {e}'))
+
+        with self._lock:
+            self._write([{'key': x['key'], 'sent': True} for x in batch])
+            resent = {x['key'] for x in batch if x['key'] in self._sent}
+            self._sent.update(x['key'] for x in batch)
+
+        # Field names are rechecked once per flush, because the cards might
+        # have been queued a long time ago.
+        mappings = {
+            name: models.get_model(name, recheck=True)
+            for name in {x['note']['modelName'] for x in batch}
+        }
+
+        actions: list[tuple[INVOKE_ACTIONS, dict[str, Any]]] = []
+        results: list[Any] = []
+        for record in batch:
+            note = {**record['note']}
+            try:
+                note['fields'] = _note_fields(record['card'], mappings[note['modelName']])
+            except IncompatibleModelError as e:
+                results.append(e)
+                continue
+            actions.append(('addNote', {'note': note}))
+            results.append(None)
+
+        sent = iter(invoke_multi(actions))
+        results = [next(sent) if x is None else x for x in results]
+
+        done = []
+        with self._lock:
+            self._failures.extend(media_failures)
+            pending = self._load()
+            for record, result in zip(batch, results):
+                if isinstance(result, AnkiUnreachableError):
+                    continue
+                if isinstance(result, Exception):
+                    if not (
+                            record['key'] in resent
+                        and not record['note']['options']['allowDuplicate']
+                        and str(result) == 'card is a duplicate'
+                    ):
+                        phrase = record['card'].get('PHRASE', '')
+                        self._failures.append((phrase, str(result)))
+                else:
+                    self._nadded += 1
+                done.append({'key': record['key'], 'done': True})
+                del pending[record['key']]
+                self._sent.discard(record['key'])
+
+            if pending:
+                self._write(done)
+            else:
+                # Nothing left, start a new journal.
+                with open(self.path, 'w', encoding='UTF-8'):
+                    pass
+
+        return bool(done)
+
+    def poll(self) -> tuple[int, list[tuple[str, str]]]:
+        # return: the number of cards added and the (phrase, error) pairs of
+        #         cards that have been rejected since the last call.
+        with self._lock:
+            result = self._nadded, self._failures
+            self._nadded = 0
+            self._failures = []
+            return result
+
+
+card_queue = _CardQueue(CARD_QUEUE_PATH)
+
+
+# Number of media files uploaded at once.
+MEDIA_UPLOAD_WORKERS = 4
+
+
+class _MediaUploads:
+    # Downloads audio and stores it in Anki's media collection through
+    # AnkiConnect. Hashes of the uploaded files are kept, so that files Anki
+    # already has are not sent again.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._pool: ThreadPoolExecutor | None = None
+        self._index: dict[str, str] | None = None
+
+    def _save_index(self) -> None:
+        with self._lock:
+            with open(self.path, 'w') as f:
+                json.dump(self._index, f)
+
+    def _load_index(self) -> dict[str, str]:
+        if self._index is None:
+            try:
+                with open(self.path) as f:
+                    self._index = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._index = {}
+            atexit.register(self._save_index)
+
+        return self._index
+
+    def _upload(self, url: str, filename: str) -> None:
+        try:
+            data = http.urlopen('GET', url).data
+        except Exception as e:
+            raise AnkiError(f'could not download {filename}: {e}')
+
+        digest = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            if self._load_index().get(filename) == digest:
+                return
+
+        invoke(
+            'storeMediaFile',
+            filename=filename,
+            data=base64.b64encode(data).decode()
+        )
+        with self._lock:
+            self._load_index()[filename] = digest
+
+    def upload(self, url: str) -> tuple[str, Future[None]]:
+        # return: the filename the audio will be stored under and a future
+        #         that raises AnkiError if the upload fails.
+        _, _, filename = url.rpartition('/')
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(MEDIA_UPLOAD_WORKERS)
+
+        return filename, self._pool.submit(self._upload, url, filename)
+
+
+media_uploads = _MediaUploads(MEDIA_INDEX_PATH)
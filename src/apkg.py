@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import zipfile
+from typing import Any
+from typing import Iterable
+from typing import Iterator
+from typing import TYPE_CHECKING
+
+from src.anki import map_field_names
+from src.anki import normalize_field
+from src.card import media_dir
+from src.data import getconf
+from src.data import note_t
+from src.data import ROOT_DIR
+
+if TYPE_CHECKING:
+    from src.card import Card
+
+# Writes cards to an .apkg file, which Anki imports with File > Import,
+# without going through AnkiConnect. The package is in the legacy format
+# (schema 11), that every Anki version since 2.1 can import: a zip of an
+# SQLite collection, a JSON "media" map and the media files named by
+# their number in the map.
+
+_SCHEMA = '''
+CREATE TABLE col (
+    id integer PRIMARY KEY, crt integer NOT NULL, mod integer NOT NULL,
+    scm integer NOT NULL, ver integer NOT NULL, dty integer NOT NULL,
+    usn integer NOT NULL, ls integer NOT NULL, conf text NOT NULL,
+    models text NOT NULL, decks text NOT NULL, dconf text NOT NULL,
+    tags text NOT NULL
+);
+CREATE TABLE notes (
+    id integer PRIMARY KEY, guid text NOT NULL, mid integer NOT NULL,
+    mod integer NOT NULL, usn integer NOT NULL, tags text NOT NULL,
+    flds text NOT NULL, sfld integer NOT NULL, csum integer NOT NULL,
+    flags integer NOT NULL, data text NOT NULL
+);
+CREATE TABLE cards (
+    id integer PRIMARY KEY, nid integer NOT NULL, did integer NOT NULL,
+    ord integer NOT NULL, mod integer NOT NULL, usn integer NOT NULL,
+    type integer NOT NULL, queue integer NOT NULL, due integer NOT NULL,
+    ivl integer NOT NULL, factor integer NOT NULL, reps integer NOT NULL,
+    lapses integer NOT NULL, left integer NOT NULL, odue integer NOT NULL,
+    odid integer NOT NULL, flags integer NOT NULL, data text NOT NULL
+);
+CREATE TABLE revlog (
+    id integer PRIMARY KEY, cid integer NOT NULL, usn integer NOT NULL,
+    ease integer NOT NULL, ivl integer NOT NULL, lastIvl integer NOT NULL,
+    factor integer NOT NULL, time integer NOT NULL, type integer NOT NULL
+);
+CREATE TABLE graves (
+    usn integer NOT NULL, oid integer NOT NULL, type integer NOT NULL
+);
+CREATE INDEX ix_notes_usn ON notes (usn);
+CREATE INDEX ix_cards_usn ON cards (usn);
+CREATE INDEX ix_revlog_usn ON revlog (usn);
+CREATE INDEX ix_cards_nid ON cards (nid);
+CREATE INDEX ix_cards_sched ON cards (did, queue, due);
+CREATE INDEX ix_revlog_cid ON revlog (cid);
+CREATE INDEX ix_notes_csum ON notes (csum);
+'''
+
+_DECK_CONF = {
+    'id': 1, 'name': 'Default', 'mod': 0, 'usn': 0, 'maxTaken': 60,
+    'autoplay': True, 'timer': 0, 'replayq': True, 'dyn': False,
+    'new': {
+        'bury': False, 'delays': [1, 10], 'initialFactor': 2500,
+        'ints': [1, 4, 0], 'order': 1, 'perDay': 20,
+    },
+    'lapse': {
+        'delays': [10], 'leechAction': 1, 'leechFails': 8, 'minInt': 1,
+        'mult': 0,
+    },
+    'rev': {
+        'bury': False, 'ease4': 1.3, 'ivlFct': 1, 'maxIvl': 36500,
+        'perDay': 200, 'hardFactor': 1.2,
+    },
+}
+
+_SOUND_RE = re.compile(r'\[sound:([^\]]+)\]')
+
+
+def _model(note: note_t, mid: int, did: int, now: int) -> dict[str, Any]:
+    # Fields the front side can't be empty without, like "req" of the models
+    # created by Anki.
+    required = [
+        i for i, name in enumerate(note['fields'])
+        if '{{' + name + '}}' in note['front'] or ':' + name + '}}' in note['front']
+    ]
+    return {
+        'id': mid,
+        'name': note['modelName'],
+        'type': 0,
+        'mod': now,
+        'usn': -1,
+        'sortf': 0,
+        'did': did,
+        'tmpls': [{
+            'name': note['cardName'],
+            'ord': 0,
+            'qfmt': note['front'],
+            'afmt': note['back'],
+            'did': None,
+            'bqfmt': '',
+            'bafmt': '',
+        }],
+        'flds': [
+            {
+                'name': name, 'ord': i, 'sticky': False, 'rtl': False,
+                'font': 'Arial', 'size': 20, 'media': [],
+            }
+            for i, name in enumerate(note['fields'])
+        ],
+        'css': note['css'],
+        'latexPre': '\\documentclass[12pt]{article}\n\\special{papersize=3in,5in}\n'
+                    '\\usepackage[utf8]{inputenc}\n\\usepackage{amssymb,amsmath}\n'
+                    '\\pagestyle{empty}\n\\setlength{\\parindent}{0in}\n'
+                    '\\begin{document}\n',
+        'latexPost': '\\end{document}',
+        'latexsvg': False,
+        'req': [[0, 'any', required]],
+        'tags': [],
+        'vers': [],
+    }
+
+
+def _deck(did: int, name: str, now: int) -> dict[str, Any]:
+    return {
+        'id': did, 'name': name, 'mod': now, 'usn': -1, 'desc': '', 'dyn': 0,
+        'conf': 1, 'collapsed': False, 'browserCollapsed': False,
+        'extendNew': 0, 'extendRev': 0,
+        'newToday': [0, 0], 'revToday': [0, 0], 'lrnToday': [0, 0],
+        'timeToday': [0, 0],
+    }
+
+
+def _id_for(s: str) -> int:
+    # Stable ids, so that exporting to the same deck or with the same model
+    # again doesn't create new ones on import.
+    return int(hashlib.sha1(s.encode()).hexdigest()[:12], 16)
+
+
+def export_apkg(
+        path: str,
+        cards: Iterable[Card], *,
+        note_name: str = 'gryzus-std.json',
+        deck: str | None = None,
+        audio_dir: str | None = None
+) -> int:
+    # Writes `cards` to the .apkg file at `path` with the note model in the
+    # `note_name` file (in the format `add_custom_note()` takes). Audio of
+    # the cards is looked for in `audio_dir` and skipped if it's missing.
+    # return: the number of notes written.
+    with open(os.path.join(ROOT_DIR, note_name)) as f:
+        note: note_t = json.load(f)
+
+    if deck is None:
+        deck = getconf('deck')
+    if audio_dir is None:
+        audio_dir = media_dir()
+    tags = ' '.join(x.strip() for x in getconf('tags').split(',') if x.strip())
+    if tags:
+        tags = f' {tags} '
+
+    now = int(time.time())
+    mid = _id_for('model ' + note['modelName'])
+    did = _id_for('deck ' + deck)
+    mapping = list(map_field_names(note['fields']).values())
+
+    filenames: dict[str, None] = {}
+    base_nid = now * 1000
+    nnotes = 0
+
+    # Notes are streamed into the database, cards are created from them.
+    def note_rows() -> Iterator[tuple[Any, ...]]:
+        nonlocal nnotes
+        for nid, card in enumerate(cards, base_nid):
+            fields = ['' if ckey is None else card[ckey] for ckey in mapping]
+            flds = '\x1f'.join(fields)
+            first = normalize_field(fields[0])
+            for filename in _SOUND_RE.findall(card['AUDIO']):
+                filenames[filename] = None
+            nnotes += 1
+            yield (
+                nid,
+                # The same note exported again updates the imported one,
+                # as long as it's the same note in Anki's eyes.
+                hashlib.sha1(f'{mid} {first}'.encode()).hexdigest()[:10],
+                mid, now, -1, tags, flds, first,
+                int(hashlib.sha1(first.encode()).hexdigest()[:8], 16),
+                0, '',
+            )
+
+    fd, db_path = tempfile.mkstemp(suffix='.anki2')
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.execute('PRAGMA journal_mode = OFF')
+            conn.executescript(_SCHEMA)
+            with conn:
+                conn.execute(
+                    'INSERT INTO col VALUES (1, ?, ?, ?, 11, 0, 0, 0, ?, ?, ?, ?, ?)',
+                    (
+                        now, now * 1000, now * 1000,
+                        json.dumps({
+                            'activeDecks': [1], 'curDeck': 1, 'newSpread': 0,
+                            'collapseTime': 1200, 'timeLim': 0, 'estTimes': True,
+                            'dueCounts': True, 'curModel': mid, 'nextPos': 1,
+                            'sortType': 'noteFld', 'sortBackwards': False,
+                            'addToCur': True,
+                        }),
+                        json.dumps({str(mid): _model(note, mid, did, now)}),
+                        json.dumps({
+                            '1': _deck(1, 'Default', now),
+                            str(did): _deck(did, deck, now),
+                        }),
+                        json.dumps({'1': _DECK_CONF}),
+                        '{}',
+                    )
+                )
+                conn.executemany(
+                    'INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    note_rows()
+                )
+                # One card per note, with the note's id, due in the order
+                # the notes have been added.
+                conn.execute(
+                    'INSERT INTO cards SELECT id, id, ?, 0, ?, -1, 0, 0, id - ?, '
+                    "0, 0, 0, 0, 0, 0, 0, 0, '' FROM notes",
+                    (did, now, base_nid - 1)
+                )
+        finally:
+            conn.close()
+
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+            z.write(db_path, 'collection.anki2')
+            media_map: dict[str, str] = {}
+            for filename in filenames:
+                file_path = os.path.join(audio_dir, filename)
+                if not os.path.isfile(file_path):
+                    continue
+                name = str(len(media_map))
+                # Audio is compressed already.
+                z.write(file_path, name, compress_type=zipfile.ZIP_STORED)
+                media_map[name] = filename
+            z.writestr('media', json.dumps(media_map))
+    finally:
+        os.remove(db_path)
+
+    return nnotes
@@ -0,0 +1,475 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Iterable
+from typing import Iterator
+from typing import NamedTuple
+from typing import TextIO
+from typing import TypeVar
+from typing import TYPE_CHECKING
+
+import src.anki as anki
+from src.apkg import export_apkg
+from src.card import make_card
+from src.card import perror_audio_url
+from src.card import perror_save_audio
+from src.data import dictkey_t
+from src.data import ENRICH_PROGRESS_PATH
+from src.data import getconf
+from src.Dictionaries.base import DEF
+from src.Dictionaries.base import Dictionary
+from src.Dictionaries.base import DictionaryError
+from src.Dictionaries.base import EntrySelector
+from src.Dictionaries.base import PHRASE
+from src.Dictionaries.base import SYN
+from src.search import DICTIONARY_LOOKUP
+from src.search import lookup_many
+from src.search import normalize_query
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from src.card import Card
+    from src.card import cardkey_t
+    from src.Curses.proto import StatusProto
+    from src.Dictionaries.base import DictionarySelection
+
+# Makes cards of a word list without the curses interface. Every stage is
+# a generator, so only a handful of entries are in memory at a time:
+#   read_words -> lookup_many -> select -> make_cards -> add_to_anki/export_apkg
+
+T = TypeVar('T')
+
+# Number of cards sent to AnkiConnect in a single request.
+BULK_ANKI_BATCH = 50
+# Number of audio files `make_cards()` fetches at once.
+BULK_AUDIO_WORKERS = 8
+# Number of notes read and updated in a single request when enriching.
+ENRICH_BATCH = 50
+
+
+class SelectionPolicy(NamedTuple):
+    # Number of definitions and synonyms selected per phrase.
+    ndefs: int = 1
+    nsyns: int = 0
+    # Whether subdefinitions count as definitions.
+    subdefs: bool = False
+    # Number of phrases of each entry that cards are made of.
+    nphrases: int = 1
+
+
+class PrintStatus:
+    def __init__(self, file: TextIO) -> None:
+        self.file = file
+
+    def writeln(self, header: str, body: str | None = None) -> None:
+        print(header if body is None else f'{header} {body}', file=self.file)
+
+    error = success = attention = writeln
+
+    def clear(self) -> None:
+        pass
+
+
+def read_words(lines: Iterable[str]) -> Iterator[str]:
+    # Skips empty lines, comments and words that have been read already.
+    seen = set()
+    for line in lines:
+        word = line.strip()
+        if not word or word.startswith('#'):
+            continue
+
+        normalized = normalize_query(word)
+        if normalized not in seen:
+            seen.add(normalized)
+            yield word
+
+
+def select_by_policy(
+        dictionary: Dictionary,
+        policy: SelectionPolicy
+) -> list[DictionarySelection] | None:
+    selector = EntrySelector(dictionary)
+
+    nphrases = ndefs = nsyns = 0
+    for i, op in enumerate(dictionary.contents):
+        if isinstance(op, PHRASE):
+            nphrases += 1
+            ndefs = nsyns = 0
+        elif nphrases == 0 or nphrases > policy.nphrases:
+            continue
+        elif isinstance(op, DEF):
+            if ndefs < policy.ndefs and (policy.subdefs or not op.subdef):
+                selector.toggle_index(i)
+                ndefs += 1
+        elif isinstance(op, SYN):
+            if nsyns < policy.nsyns:
+                selector.toggle_index(i)
+                nsyns += 1
+
+    return selector.dump_selection(respect_phrase_boundaries=True)
+
+
+def select(
+        status: StatusProto,
+        entries: Iterable[tuple[str, Dictionary | DictionaryError | ConnectionError]],
+        policy: SelectionPolicy
+) -> Iterator[DictionarySelection]:
+    for query, entry in entries:
+        if not isinstance(entry, Dictionary):
+            status.error(f'{query}:', str(entry))
+            continue
+
+        selections = select_by_policy(entry, policy)
+        if selections is None:
+            status.attention(f'{query}:', 'nothing to select')
+            continue
+
+        yield from selections
+
+
+def _perror_audio(
+        status: StatusProto,
+        selection: DictionarySelection,
+        uploads: list[Future[None]] | None
+) -> str:
+    # Audio is uploaded with AnkiConnect if the 'mediaupload' option is set
+    # and `uploads`, where the uploads are collected, is given, otherwise
+    # it's saved into the media directory.
+    if uploads is None or not getconf('mediaupload'):
+        return perror_save_audio(status, selection)
+
+    url = perror_audio_url(status, selection)
+    if url is None:
+        return ''
+
+    filename, upload = anki.media_uploads.upload(url)
+    uploads.append(upload)
+    return f'[sound:{filename}]'
+
+
+def _perror_wait_for_uploads(status: StatusProto, uploads: list[Future[None]]) -> None:
+    for upload in uploads:
+        try:
+            upload.result()
+        except anki.AnkiError as e:
+            status.error('Uploading audio failed:', str(e))
+
+
+def make_cards(
+        status: StatusProto,
+        selections: Iterable[DictionarySelection], *,
+        upload: bool = False,
+        nworkers: int = BULK_AUDIO_WORKERS
+) -> Iterator[Card]:
+    # Cards come in the order of `selections`. Their audio is fetched by a
+    # pool of threads, at most twice as many as there are workers at a
+    # time, the same way `lookup_many()` looks up entries.
+    # `upload`: whether the audio can be uploaded with AnkiConnect.
+    if not getconf('audio'):
+        yield from map(make_card, selections)
+        return
+
+    uploads: list[Future[None]] | None = [] if upload else None
+    pending: deque[tuple[Card, Future[str]]] = deque()
+
+    def pop() -> Card:
+        card, audio = pending.popleft()
+        card['AUDIO'] = audio.result()
+        return card
+
+    with ThreadPoolExecutor(nworkers) as pool:
+        for selection in selections:
+            pending.append((
+                make_card(selection),
+                pool.submit(_perror_audio, status, selection, uploads)
+            ))
+            while pending and (
+                   len(pending) > 2 * nworkers
+                or pending[0][1].done()
+            ):
+                yield pop()
+
+        while pending:
+            yield pop()
+
+    if uploads:
+        _perror_wait_for_uploads(status, uploads)
+
+
+def batched(it: Iterable[T], n: int) -> Iterator[list[T]]:
+    batch = []
+    for x in it:
+        batch.append(x)
+        if len(batch) == n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def add_to_anki(
+        status: StatusProto,
+        cards: Iterable[Card],
+        batch: int = BULK_ANKI_BATCH
+) -> Iterator[int]:
+    # Cards are queued if Anki stops responding halfway through, the
+    # interactive program adds them when it's running again.
+    queued = False
+    for chunk in batched(cards, batch):
+        if queued:
+            anki.card_queue.enqueue(chunk)
+            continue
+
+        try:
+            results: list[int | Exception] = anki.add_cards(chunk)
+        except anki.AnkiUnreachableError:
+            anki.card_queue.enqueue(chunk)
+            queued = True
+            status.attention(
+                'Anki is not running:',
+                'the rest of the cards has been queued, they will be added '
+                'the next time the program runs'
+            )
+            continue
+
+        for card, result in zip(chunk, results):
+            if isinstance(result, Exception):
+                status.error(f'Adding card failed ({card["PHRASE"]}):', str(result))
+            else:
+                yield result
+
+
+# Notes of a deck that have been enriched are recorded after every batch,
+# so that an interrupted run continues where it has stopped. The records
+# of a deck are removed when all of its notes have been enriched.
+def load_enriched(path: str, deck: str) -> set[int]:
+    result = set()
+    try:
+        with open(path, encoding='UTF-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # torn write
+                    continue
+                if record['deck'] == deck:
+                    result.update(record['nids'])
+    except FileNotFoundError:
+        pass
+
+    return result
+
+
+def mark_enriched(path: str, deck: str, nids: list[int]) -> None:
+    with open(path, 'a', encoding='UTF-8') as f:
+        f.write(json.dumps({'deck': deck, 'nids': nids}) + '\n')
+
+
+def clear_enriched(path: str, deck: str) -> None:
+    try:
+        with open(path, encoding='UTF-8') as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return
+
+    def keep(line: str) -> bool:
+        try:
+            return json.loads(line)['deck'] != deck  # type: ignore[no-any-return]
+        except ValueError:
+            return False
+
+    with open(path, 'w', encoding='UTF-8') as f:
+        f.writelines(filter(keep, lines))
+
+
+def missing_fields(info: dict[str, Any]) -> tuple[str, dict[str, cardkey_t]] | None:
+    # return: the phrase of the note in `info` (as returned by `notesInfo`)
+    #         and its empty fields that a card can fill in or None if there
+    #         is nothing to fill in.
+    field_name = anki.phrase_field(info['fields'])
+    if field_name is None:
+        return None
+    phrase = anki.normalize_field(info['fields'][field_name]['value'])
+    if not phrase:
+        return None
+
+    model = anki.models.get_model(info['modelName'])
+    missing: dict[str, cardkey_t] = {}
+    for name, field in info['fields'].items():
+        ckey = model.get(name)
+        if ckey is not None and ckey != 'PHRASE' and not anki.normalize_field(field['value']):
+            missing[name] = ckey
+
+    if not missing:
+        return None
+    return phrase, missing
+
+
+def _enrich_batch(
+        status: StatusProto,
+        nids: list[int],
+        key: dictkey_t,
+        policy: SelectionPolicy
+) -> tuple[int, list[int]]:
+    # return: the number of notes updated and ids of the notes that are done.
+    notes = {}
+    for info in anki.invoke('notesInfo', notes=nids):
+        t = missing_fields(info)
+        if t is not None:
+            notes[info['noteId']] = t
+
+    selections: dict[str, DictionarySelection] = {}
+    phrases = list(dict.fromkeys(phrase for phrase, _ in notes.values()))
+    for query, entry in lookup_many(phrases, key):
+        if not isinstance(entry, Dictionary):
+            status.error(f'{query}:', str(entry))
+            continue
+        selected = select_by_policy(entry, policy._replace(nphrases=sys.maxsize))
+        if selected is None:
+            status.attention(f'{query}:', 'nothing to select')
+            continue
+        # The phrase of the note if the entry has more than one.
+        selections[query] = next(
+            (x for x in selected if x.PHRASE.phrase.lower() == query.lower()),
+            selected[0]
+        )
+
+    # Notes whose phrase could not be looked up are tried again by the next
+    # run, the lookup might have failed only for the time being.
+    failed = set()
+    audio = getconf('audio')
+    uploads: list[Future[None]] = []
+    actions: list[tuple[anki.INVOKE_ACTIONS, dict[str, Any]]] = []
+    updated = []
+    for nid, (phrase, missing) in notes.items():
+        selection = selections.get(phrase)
+        if selection is None:
+            failed.add(nid)
+            continue
+
+        card = make_card(selection)
+        if audio and 'AUDIO' in missing.values():
+            card['AUDIO'] = _perror_audio(status, selection, uploads)
+
+        fields = {name: card[ckey] for name, ckey in missing.items() if card[ckey]}
+        if fields:
+            actions.append(('updateNoteFields', {'note': {'id': nid, 'fields': fields}}))
+            updated.append((nid, phrase))
+
+    nupdated = 0
+    for (nid, phrase), result in zip(updated, anki.invoke_multi(actions)):
+        if isinstance(result, anki.AnkiUnreachableError):
+            raise result
+        if isinstance(result, Exception):
+            status.error(f'Updating note failed ({phrase}):', str(result))
+            failed.add(nid)
+        else:
+            nupdated += 1
+
+    _perror_wait_for_uploads(status, uploads)
+    return nupdated, [x for x in nids if x not in failed]
+
+
+def enrich(
+        status: StatusProto,
+        deck: str,
+        key: dictkey_t,
+        policy: SelectionPolicy,
+        progress_path: str = ENRICH_PROGRESS_PATH
+) -> int:
+    # Fills in the empty fields of the notes in `deck` with cards made of
+    # their phrases. Fields that have a value are never overwritten.
+    # return: the number of notes updated.
+    nids = anki.invoke('findNotes', query=f'"deck:{deck}"')
+    done = load_enriched(progress_path, deck)
+    todo = [x for x in nids if x not in done]
+    if done:
+        status.writeln(f'Resuming, {len(nids) - len(todo)} of {len(nids)} note(s) done already')
+
+    nupdated = 0
+    ndone = 0
+    for chunk in batched(todo, ENRICH_BATCH):
+        n, chunk_done = _enrich_batch(status, chunk, key, policy)
+        mark_enriched(progress_path, deck, chunk_done)
+        nupdated += n
+        ndone += len(chunk)
+        status.writeln(f'{ndone}/{len(todo)} note(s) checked, {nupdated} updated')
+
+    clear_enriched(progress_path, deck)
+    return nupdated
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog='ankidodawacz',
+        description='Makes cards of the words in WORDLIST without the interface.'
+    )
+    parser.add_argument(
+        'wordlist', metavar='WORDLIST', nargs='?',
+        help='one word per line, "-" reads stdin'
+    )
+    parser.add_argument(
+        '--enrich', metavar='DECK',
+        help='fill in the empty fields of the notes in DECK instead, '
+             'an interrupted run continues where it has stopped'
+    )
+    parser.add_argument(
+        '-d', '--dictionary', choices=list(DICTIONARY_LOOKUP),
+        help='dictionary to look the words up in, "primary" from the config by default'
+    )
+    parser.add_argument(
+        '-o', '--output', metavar='FILE.apkg',
+        help='write the cards to an .apkg file instead of adding them with AnkiConnect'
+    )
+    parser.add_argument('--defs', type=int, default=1, help='definitions per phrase (default: 1)')
+    parser.add_argument('--syns', type=int, default=0, help='synonyms per phrase (default: 0)')
+    parser.add_argument('--subdefs', action='store_true', help='count subdefinitions as definitions')
+    parser.add_argument('--phrases', type=int, default=1, help='phrases per entry (default: 1)')
+    args = parser.parse_args(argv)
+    if (args.wordlist is None) == (args.enrich is None):
+        parser.error('either WORDLIST or --enrich is required')
+    if args.enrich is not None and args.output is not None:
+        parser.error('--output cannot be used with --enrich')
+
+    key: dictkey_t = args.dictionary or getconf('primary')
+    policy = SelectionPolicy(args.defs, args.syns, args.subdefs, args.phrases)
+    status = PrintStatus(sys.stderr)
+
+    if args.enrich is not None:
+        try:
+            n = enrich(status, args.enrich, key, policy)
+        except anki.AnkiError as e:
+            status.error('Enriching notes failed:', str(e))
+            status.writeln('Run the same command again to continue')
+            return 1
+
+        print(f'{n} note(s) updated', file=sys.stderr)
+        return 0
+
+    try:
+        f = sys.stdin if args.wordlist == '-' else open(args.wordlist, encoding='UTF-8')
+        try:
+            cards = make_cards(
+                status,
+                select(status, lookup_many(read_words(f), key), policy),
+                # .apkg files are made of the audio in the media directory.
+                upload=args.output is None
+            )
+            if args.output is None:
+                n = sum(1 for _ in add_to_anki(status, cards))
+            else:
+                n = export_apkg(args.output, cards)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+    except (anki.AnkiError, OSError) as e:
+        status.error('Making cards failed:', str(e))
+        return 1
+
+    print(f'{n} card(s) {"added" if args.output is None else "written"}', file=sys.stderr)
+    return 0
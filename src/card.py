@@ -178,16 +178,19 @@ def make_card(selection: DictionarySelection) -> Card:
     return card
 
 
+def media_dir() -> str:
+    return os.path.expanduser(
+        AUDIO_DIR if getconf('mediadir') == '-' else getconf('mediadir')
+    )
+
+
 def _save_audio(url: str) -> str:
     audio_bytes = http.urlopen('GET', url).data
 
-    mediadir_path = os.path.expanduser(
-        AUDIO_DIR if getconf('mediadir') == '-' else getconf('mediadir')
-    )
     _, _, filename = url.rpartition('/')
 
     try:
-        with open(os.path.join(mediadir_path, filename), 'wb') as f:
+        with open(os.path.join(media_dir(), filename), 'wb') as f:
             f.write(audio_bytes)
     except Exception as e:
         raise anki.AnkiError(str(e))
@@ -195,21 +198,30 @@ def _save_audio(url: str) -> str:
     return f'[sound:{filename}]'
 
 
-def _perror_save_audio(
+def perror_audio_url(
         status: StatusProto,
         selection: DictionarySelection
-) -> str:
+) -> str | None:
     phrase = selection.PHRASE.phrase
 
     if selection.AUDIO is None:
         try:
-            url = diki_audio(phrase)
+            return diki_audio(phrase)
         except DictionaryError as e:
             status.error(str(e))
             status.attention(f'No audio available for {phrase!r}')
-            return ''
+            return None
     else:
-        url = selection.AUDIO.resource
+        return selection.AUDIO.resource
+
+
+def perror_save_audio(
+        status: StatusProto,
+        selection: DictionarySelection
+) -> str:
+    url = perror_audio_url(status, selection)
+    if url is None:
+        return ''
 
     try:
         return _save_audio(url)
@@ -222,17 +234,71 @@ def create_and_add_card(
         status: StatusProto,
         selections: list[DictionarySelection]
 ) -> list[int]:
-    nids = []
+    # Audio is uploaded while the notes are being added.
+    uploads = []
+    cards = []
+    urls: list[str | None] = []
     for selection in selections:
         card = make_card(selection)
+        url = None
         if getconf('audio'):
-            card['AUDIO'] = _perror_save_audio(status, selection)
+            if getconf('mediaupload'):
+                url = perror_audio_url(status, selection)
+                if url is not None:
+                    filename, upload = anki.media_uploads.upload(url)
+                    card['AUDIO'] = f'[sound:{filename}]'
+                    uploads.append(upload)
+            else:
+                card['AUDIO'] = perror_save_audio(status, selection)
+        cards.append(card)
+        urls.append(url)
+
+    try:
+        results: list[int | Exception] = anki.add_cards(cards)
+    except anki.AnkiUnreachableError as e:
+        results = [e] * len(cards)
+    except anki.AnkiError as e:
+        status.error('Adding card failed:', str(e))
+        results = []
 
+    for upload in uploads:
         try:
-            nids.append(anki.add_card(card))
+            upload.result()
+        except anki.AnkiUnreachableError:
+            # Uploaded again when the queued card is added.
+            pass
         except anki.AnkiError as e:
-            status.error('Adding card failed:', str(e))
+            status.error('Uploading audio failed:', str(e))
+    if not results:
+        return []
+
+    unreachable = [
+        i for i, result in enumerate(results)
+        if isinstance(result, anki.AnkiUnreachableError)
+    ]
+    if unreachable:
+        anki.card_queue.enqueue(
+            [cards[i] for i in unreachable],
+            [urls[i] for i in unreachable]
+        )
+        anki.card_queue.start()
+        status.attention(
+            'Anki is not running:',
+            f'{len(unreachable)} card(s) queued, they will be added when it is'
+        )
+
+    nids = []
+    for selection, result in zip(selections, results):
+        if isinstance(result, anki.AnkiUnreachableError):
+            continue
+        elif isinstance(result, Exception):
+            # Other cards of the request might have been added.
+            if len(selections) > 1:
+                status.error(f'Adding card failed ({selection.PHRASE.phrase}):', str(result))
+            else:
+                status.error('Adding card failed:', str(result))
         else:
+            nids.append(result)
             status.success('Card added successfully:', 'press "b" to open in Anki')
 
     return nids
@@ -10,7 +10,7 @@ from typing import Union
 
 dictkey_t = Literal[
     'ahd', 'diki-en', 'diki-fr', 'diki-de', 'diki-it', 'diki-es',
-    'farlex', 'wordnet'
+    'farlex', 'wordnet', 'wordnet-local'
 ]
 
 config_t = TypedDict(
@@ -23,6 +23,7 @@ config_t = TypedDict(
         'duplicates':  bool,
         'etym':        bool,
         'formatdefs':  bool,
+        'framelog':    bool,
         'hidedef':     bool,
         'hideexsen':   bool,
         'hidepreps':   bool,
@@ -31,15 +32,18 @@ config_t = TypedDict(
         'histsave':    bool,
         'histshow':    bool,
         'mediadir':    str,
+        'mediaupload': bool,
         'nohelp':      bool,
         'note':        str,
         'pos':         bool,
+        'prebuild':    bool,
         'primary':     dictkey_t,
         'secondary':   Literal[dictkey_t, '-'],
         'shortetyms':  bool,
         'syn':         bool,
         'tags':        str,
         'toipa':       bool,
+        'wordnetdir':  str,
         'c.cursor':    str,
         'c.def1':      str,
         'c.def2':      str,
@@ -63,16 +67,18 @@ config_t = TypedDict(
 )
 
 bool_configkey_t = Literal[
-    'audio', 'cachefile', 'duplicates', 'etym', 'formatdefs', 'hidedef',
-    'hideexsen', 'hidepreps', 'hidesyn', 'histsave', 'histshow', 'nohelp',
-    'pos', 'shortetyms', 'syn', 'toipa'
+    'audio', 'cachefile', 'duplicates', 'etym', 'formatdefs', 'framelog',
+    'hidedef', 'hideexsen', 'hidepreps', 'hidesyn', 'histsave', 'histshow',
+    'mediaupload', 'nohelp', 'pos', 'prebuild', 'shortetyms', 'syn', 'toipa'
 ]
 colorkey_t = Literal[
     'c.cursor', 'c.def1', 'c.def2', 'c.delimit', 'c.err', 'c.etym', 'c.exsen',
     'c.heed', 'c.hl', 'c.index', 'c.infl', 'c.label', 'c.phon', 'c.phrase',
     'c.pos', 'c.selection', 'c.sign', 'c.success', 'c.syn',
 ]
-str_configkey_t = Literal['deck', 'hides', 'mediadir', 'note', 'tags', colorkey_t]
+str_configkey_t = Literal[
+    'deck', 'hides', 'mediadir', 'note', 'tags', 'wordnetdir', colorkey_t
+]
 
 configkey_t = Literal[bool_configkey_t, str_configkey_t, 'dupescope', 'primary', 'secondary']
 configval_t = Union[bool, str, Literal['deck', 'collection'], dictkey_t, Literal[dictkey_t, '-']]
@@ -128,6 +134,13 @@ else:
     DATA_DIR = os.path.join(XDG_DATA_HOME, 'ankidodawacz')
 
 AUDIO_DIR = os.path.join(DATA_DIR, 'Audio')
+HISTORY_PATH = os.path.join(DATA_DIR, 'history.txt')
+SPELLING_WORDS_PATH = os.path.join(DATA_DIR, 'spelling_words.txt')
+ANKI_CACHE_PATH = os.path.join(DATA_DIR, 'anki_cache.json')
+CARD_QUEUE_PATH = os.path.join(DATA_DIR, 'card_queue.jsonl')
+ENRICH_PROGRESS_PATH = os.path.join(DATA_DIR, 'enrich_progress.jsonl')
+MEDIA_INDEX_PATH = os.path.join(DATA_DIR, 'media_index.json')
+FRAMES_LOG_PATH = os.path.join(DATA_DIR, 'frames.jsonl')
 
 # DATA_DIR is subsumed by AUDIO_DIR.
 os.makedirs(AUDIO_DIR, exist_ok=True)
@@ -2,22 +2,33 @@ from __future__ import annotations
 
 import atexit
 import os
+import re
 import shelve
 import threading
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import Mapping
 from typing import NamedTuple
 from typing import TYPE_CHECKING
 from typing import Union
 
 from src.data import DATA_DIR
+from src.data import SPELLING_WORDS_PATH
 from src.data import dictkey_t
 from src.data import getconf
 from src.Dictionaries.ahd import ask_ahd
 from src.Dictionaries.base import Dictionary
 from src.Dictionaries.base import DictionaryError
+from src.Dictionaries.base import LABEL
 from src.Dictionaries.base import MAGIC
+from src.Dictionaries.base import NOTE
+from src.Dictionaries.base import PHRASE
+from src.Dictionaries.base import POS
 from src.Dictionaries.diki import ask_diki_english
 from src.Dictionaries.diki import ask_diki_french
 from src.Dictionaries.diki import ask_diki_german
@@ -25,12 +36,18 @@ from src.Dictionaries.diki import ask_diki_italian
 from src.Dictionaries.diki import ask_diki_spanish
 from src.Dictionaries.farlex import ask_farlex
 from src.Dictionaries.wordnet import ask_wordnet
+from src.Dictionaries.wordnet import ask_wordnet_local
+from src.spelling import SpellingIndex
 
 if TYPE_CHECKING:
     from src.Curses.proto import StatusProto
 
 QUERY_SEPARATOR = ','
 
+# Characters stripped off the queries. Apostrophes are a part of words
+# like "'tis" and "goin'".
+QUERY_STRIP_CHARS = ' ";'
+
 DICT_KEY_ALIASES: Mapping[str, dictkey_t] = {
     'ahd':     'ahd',
     'den':     'diki-en',
@@ -47,6 +64,8 @@ DICT_KEY_ALIASES: Mapping[str, dictkey_t] = {
     'farlex':  'farlex',
     'wnet':    'wordnet',
     'wordnet': 'wordnet',
+    'wnl':     'wordnet-local',
+    'wordnet-local': 'wordnet-local',
 }
 
 # Every dictionary has its individual key to avoid cluttering cache
@@ -62,11 +81,56 @@ DICTIONARY_LOOKUP: Mapping[dictkey_t, Callable[[str], Dictionary]] = {
     'diki-es': ask_diki_spanish,
     'farlex': ask_farlex,
     'wordnet': ask_wordnet,
+    'wordnet-local': ask_wordnet_local,
 }
 
-MONOLINGUAL_DICTIONARIES = [x for x in DICTIONARY_LOOKUP if 'diki' not in x]
+# 'wordnet-local' is an offline counterpart of 'wordnet', there is no point
+# in querying both of them.
+MONOLINGUAL_DICTIONARIES = [
+    x for x in DICTIONARY_LOOKUP
+    if 'diki' not in x and x != 'wordnet-local'
+]
+
+# Dictionaries whose queries are lowercased, because case doesn't change
+# their results, unlike in e.g. German.
+CASE_INSENSITIVE_DICTIONARIES = frozenset(
+    ('ahd', 'diki-en', 'farlex', 'wordnet', 'wordnet-local')
+)
+
+# Dictionaries whose queries are lemmatized to look for cached entries.
+LEMMATIZED_DICTIONARIES = frozenset(('ahd', 'diki-en', 'wordnet', 'wordnet-local'))
+
+# Suffix detachment rules tried in order: (suffix, replacement).
+LEMMA_RULES = (
+    ("'s", ''),
+    ('ies', 'y'), ('ied', 'y'), ('ier', 'y'), ('iest', 'y'), ('ily', 'y'),
+    ('ves', 'f'), ('ves', 'fe'),
+    ('ses', 's'), ('xes', 'x'), ('zes', 'z'), ('ches', 'ch'), ('shes', 'sh'),
+    ('men', 'man'),
+    ('es', 'e'), ('es', ''), ('s', ''),
+    ('ed', 'e'), ('ed', ''), ('ing', 'e'), ('ing', ''),
+    ('er', 'e'), ('er', ''), ('est', 'e'), ('est', ''),
+    ('bly', 'ble'), ('ally', 'al'), ('ly', 'le'), ('ly', ''),
+)
+
+LEMMA_UNDOUBLE_SUFFIXES = frozenset(('ed', 'ing', 'er', 'est'))
+
+# Number of lookups `lookup_many()` makes at once.
+BULK_LOOKUP_WORKERS = 8
+
+# Added by dictionaries just before the phrase the query has been redirected to.
+REDIRECT_NOTE = NOTE('Showing results for:')
+
+
+# Cache entry that points at a Dictionary stored under a different key.
+class Alias(NamedTuple):
+    key: str
+
 
-db_t = Union[shelve.DbfilenameShelf[Dictionary], Dict[str, Dictionary]]
+db_t = Union[
+    shelve.DbfilenameShelf[Union[Dictionary, Alias]],
+    Dict[str, Union[Dictionary, Alias]]
+]
 
 
 class _Cache:
@@ -74,7 +138,7 @@ class _Cache:
         self._path = os.path.join(DATA_DIR, f'dictionary_cache.{MAGIC}')
         self._db: db_t | None = None
 
-    def _open_shelf(self) -> shelve.DbfilenameShelf[Dictionary] | None:
+    def _open_shelf(self) -> shelve.DbfilenameShelf[Dictionary | Alias] | None:
         try:
             # We use features from the 4th protocol at max.
             return shelve.DbfilenameShelf(self._path, protocol=4)
@@ -120,15 +184,282 @@ class _Cache:
 
 
 _cache = _Cache()
+
+
+def normalize_query(query: str, key: dictkey_t | None = None) -> str:
+    # Queries of a `key` dictionary are lowercased only if it's case
+    # insensitive, queries that aren't for any dictionary always are.
+    if key is None or key in CASE_INSENSITIVE_DICTIONARIES:
+        query = query.lower()
+    return ' '.join(query.split()).strip(QUERY_STRIP_CHARS)
+
+
+def lemmatize(word: str) -> list[str]:
+    result = []
+    for suffix, replacement in LEMMA_RULES:
+        if not word.endswith(suffix):
+            continue
+
+        stem = word[:-len(suffix)]
+        if len(stem) < 2:
+            continue
+
+        result.append(stem + replacement)
+        if (
+                not replacement
+            and suffix in LEMMA_UNDOUBLE_SUFFIXES
+            and len(stem) > 2
+            and stem[-1] == stem[-2]
+            and stem[-1] not in 'aeiouls'
+        ):
+            # E.g. "running" -> "run", "bigger" -> "big".
+            result.append(stem[:-1])
+
+    return list(dict.fromkeys(result))
+
+
+def _mentioned_forms(dictionary: Dictionary) -> set[str]:
+    # Phrases, inflections and derived forms listed by the dictionary.
+    result = set()
+    for op in dictionary.contents:
+        if isinstance(op, PHRASE):
+            text = op.phrase
+        elif isinstance(op, LABEL):
+            text = op.extra
+        elif isinstance(op, POS):
+            text = ' '.join(pos for pos, _ in op.pos)
+        else:
+            continue
+
+        text = text.lower().replace('·', '').replace('•', '')
+        result.update(re.findall(r"[\w'-]+", text))
+
+    return result
+
+
+def _with_redirect_note(dictionary: Dictionary) -> Dictionary:
+    contents = dictionary.contents
+    for i, op in enumerate(contents):
+        if isinstance(op, PHRASE):
+            if i > 0 and contents[i - 1] == REDIRECT_NOTE:
+                return dictionary
+            return Dictionary([*contents[:i], REDIRECT_NOTE, *contents[i:]])
+
+    return dictionary
+
+
+def _cache_get(db: db_t, key: str) -> Dictionary:
+    entry = db[key]
+    if isinstance(entry, Alias):
+        entry = db[entry.key]
+        assert isinstance(entry, Dictionary)
+        return _with_redirect_note(entry)
+
+    return entry
+
+
+def _cache_put(db: db_t, key: dictkey_t, query: str, dictionary: Dictionary) -> None:
+    query = normalize_query(query, key)
+    contents = dictionary.contents
+    # Only a redirect of the first entry says what the whole result is,
+    # results with more than one section might redirect in a later one.
+    i = next((i for i, op in enumerate(contents) if isinstance(op, PHRASE)), 0)
+    if i == 0 or contents[i - 1] != REDIRECT_NOTE:
+        db[key + query] = dictionary
+        return
+
+    # Redirected queries are stored as aliases of the phrase they have been
+    # redirected to, so that querying either one hits the same entry.
+    phrase_op = contents[i]
+    assert isinstance(phrase_op, PHRASE)
+    canonical = key + normalize_query(phrase_op.phrase.split(',')[0], key)
+    if canonical == key + query:
+        db[canonical] = dictionary
+        return
+
+    if not isinstance(db.get(canonical), Dictionary):
+        db[canonical] = Dictionary([*contents[:i - 1], *contents[i:]])
+    db[key + query] = Alias(canonical)
+
+
+def cached(key: dictkey_t, query: str, db: db_t) -> Dictionary:
+    query = normalize_query(query, key)
+    try:
+        return _cache_get(db, key + query)
+    except KeyError:
+        if key not in LEMMATIZED_DICTIONARIES or ' ' in query:
+            raise
+
+    # A lemma is good enough only if its cached entry lists the query as
+    # one of its forms, otherwise "news" would be served as "new".
+    for lemma in lemmatize(query):
+        target = key + lemma
+        entry = db.get(target)
+        if isinstance(entry, Alias):
+            target = entry.key
+            entry = db.get(target)
+        if entry is None:
+            continue
+
+        assert isinstance(entry, Dictionary)
+        if query in _mentioned_forms(entry):
+            return _with_redirect_note(entry)
+
+    raise KeyError(key + query)
+
+
+class _Corrections:
+    # Suggests corrections of mistyped queries from the phrases of the
+    # entries that have been looked up and prefetches the best one, so that
+    # searching for it doesn't have to wait. Prefetched results are cached
+    # only if the correction is searched for.
+    def __init__(self, path: str) -> None:
+        # The phrases are kept in a file of their own, unpickling every
+        # cached dictionary to get them would take ages.
+        self.path = path
+        self._lock = threading.Lock()
+        self._index: SpellingIndex | None = None
+        self._index_thread: threading.Thread | None = None
+        # Words added while the index is being built.
+        self._added: list[str] = []
+        self._threads: dict[str, tuple[str, threading.Thread]] = {}
+        self._results: dict[str, Dictionary] = {}
+
+    def _save(self, words: Iterable[str]) -> None:
+        with open(self.path, 'a', encoding='UTF-8') as f:
+            f.writelines(f'{x}\n' for x in words)
+
+    def _build_index(self) -> None:
+        index = SpellingIndex()
+        try:
+            with open(self.path, encoding='UTF-8') as f:
+                index.update(x.rstrip('\n') for x in f)
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            added = [x for x in dict.fromkeys(self._added) if x not in index]
+            self._added.clear()
+            index.update(added)
+            self._save(added)
+            self._index = index
+
+    def index(self) -> SpellingIndex | None:
+        # return: None if the index isn't ready yet.
+        with self._lock:
+            if self._index is None and self._index_thread is None:
+                self._index_thread = threading.Thread(
+                    target=self._build_index, daemon=True
+                )
+                self._index_thread.start()
+            return self._index
+
+    def add(self, dictionary: Dictionary) -> None:
+        words = list(map(normalize_query, dictionary.unique_phrases()))
+        self.index()
+        with self._lock:
+            if self._index is None:
+                self._added.extend(words)
+                return
+
+            words = [x for x in dict.fromkeys(words) if x not in self._index]
+            if words:
+                self._index.update(words)
+                self._save(words)
+
+    def suggest(self, query: str) -> list[str]:
+        query = normalize_query(query)
+        index = self.index()
+        if index is None:
+            return []
+
+        with self._lock:
+            if query in index:
+                return []
+            return index.lookup(query)
+
+    def _fetch(self, key: dictkey_t, query: str, thread_key: str) -> None:
+        try:
+            result = DICTIONARY_LOOKUP[key](query)
+        except (DictionaryError, ConnectionError):
+            return
+
+        with self._lock:
+            # Unless it has been discarded in the meantime.
+            if thread_key in self._threads:
+                self._results[thread_key] = result
+
+    def prefetch(self, key: dictkey_t, query: str, db: db_t) -> None:
+        # Keyed the same way as the cache, see `_query()`.
+        thread_key = key + normalize_query(query, key)
+        with self._lock:
+            if thread_key in self._threads:
+                return
+        try:
+            cached(key, query, db)
+        except KeyError:
+            t = threading.Thread(
+                target=self._fetch, args=(key, query, thread_key), daemon=True
+            )
+            with self._lock:
+                self._threads[thread_key] = (normalize_query(query), t)
+            t.start()
+
+    def wait(self, key: str) -> Dictionary | None:
+        # return: the prefetched result of `key` or None if it hasn't been
+        #         prefetched or the lookup has failed.
+        with self._lock:
+            t = self._threads.get(key)
+        if t is None:
+            return None
+
+        t[1].join()
+        with self._lock:
+            self._threads.pop(key, None)
+            return self._results.pop(key, None)
+
+    def discard(self, keep: set[str]) -> None:
+        # Forgets the prefetched corrections, except for the `keep` queries.
+        with self._lock:
+            for key, (query, _) in list(self._threads.items()):
+                if query not in keep:
+                    del self._threads[key]
+                    self._results.pop(key, None)
+
+
+_corrections = _Corrections(SPELLING_WORDS_PATH)
+
+
 def _query(key: dictkey_t, query: str, db: db_t) -> Dictionary:
     try:
-        return db[key + query]
+        return cached(key, query, db)
     except KeyError:
+        pass
+
+    # The query might be a correction that is still being prefetched.
+    result = _corrections.wait(key + normalize_query(query, key))
+    if result is None:
         # Lookup might raise a DictionaryError or a ConnectionError.
         # Invalid results will not be cached.
         result = DICTIONARY_LOOKUP[key](query)
-        db[key + query] = result
-        return result
+    _cache_put(db, key, query, result)
+    return result
+
+
+def perror_suggest_corrections(
+        status: StatusProto,
+        query: str,
+        keys: list[dictkey_t],
+        db: db_t
+) -> None:
+    # Called after the lookup of `query` has failed.
+    corrections = _corrections.suggest(query)
+    if not corrections:
+        return
+
+    status.attention('Did you mean:', ', '.join(corrections[:3]))
+    for key in keys:
+        _corrections.prefetch(key, corrections[0], db)
 
 
 def _query_thread(
@@ -157,7 +488,7 @@ def perror_threaded_query(
 
     for keyid, key in enumerate(keys):
         try:
-            success[keyid] = db[key + query]
+            success[keyid] = cached(key, query, db)
         except KeyError:
             # I hope it's ok to make them daemonic. It simplifies the handling
             # of SIGINT, but try-finally blocks don't run inside of urllib3.
@@ -187,6 +518,47 @@ def perror_threaded_query(
     return result
 
 
+def lookup_many(
+        queries: Iterable[str],
+        key: dictkey_t, *,
+        nworkers: int = BULK_LOOKUP_WORKERS
+) -> Iterator[tuple[str, Dictionary | DictionaryError | ConnectionError]]:
+    # Looks up `queries` in the order they come. Cached entries are served
+    # right away, others are looked up by a pool of threads, at most twice
+    # as many as there are workers at a time. Only this generator touches
+    # the cache, the threads just make requests.
+    db, _ = _cache.db
+    pending: deque[tuple[str, Dictionary | Future[Dictionary]]] = deque()
+
+    def pop() -> tuple[str, Dictionary | DictionaryError | ConnectionError]:
+        query, entry = pending.popleft()
+        if isinstance(entry, Dictionary):
+            return query, entry
+        try:
+            result = entry.result()
+        except (DictionaryError, ConnectionError) as e:
+            return query, e
+        _cache_put(db, key, query, result)
+        return query, result
+
+    with ThreadPoolExecutor(nworkers) as pool:
+        for query in queries:
+            try:
+                pending.append((query, cached(key, query, db)))
+            except KeyError:
+                pending.append((query, pool.submit(DICTIONARY_LOOKUP[key], query)))
+
+            while pending and (
+                   len(pending) > 2 * nworkers
+                or isinstance(pending[0][1], Dictionary)
+                or pending[0][1].done()
+            ):
+                yield pop()
+
+        while pending:
+            yield pop()
+
+
 class Query(NamedTuple):
     query:       str
     dict_flags:  list[dictkey_t]
@@ -221,7 +593,7 @@ def perror_query_with_fallback(
 
 
 def parse(s: str) -> list[Query] | None:
-    to_strip = QUERY_SEPARATOR + ' '
+    to_strip = QUERY_SEPARATOR + QUERY_STRIP_CHARS
 
     s = s.strip(to_strip)
     if not s:
@@ -235,6 +607,9 @@ def parse(s: str) -> list[Query] | None:
             continue
 
         query, *flags = field.split(' -')
+        query = query.strip(QUERY_STRIP_CHARS)
+        if not query:
+            continue
 
         dict_flags: list[dictkey_t] = []
         query_flags = []
@@ -283,28 +658,39 @@ def search(
         status.attention('- close it and continue using this one, alternatively')
         status.attention('- disable the \'cachefile\' option in the F2 Config')
 
-    result = []
+    # Corrections that haven't been taken up are not needed anymore.
+    _corrections.discard({normalize_query(x.query) for x in queries})
+    # Start building the index, so that it's ready when a lookup fails.
+    _corrections.index()
+
+    result: list[list[Dictionary] | None] = []
     for query, flags, _ in queries:
+        keys = flags or [getconf('primary')]
         if len(flags) == 0:
             fallback_key = getconf('secondary')
             if fallback_key == '-':
                 result.append(perror_query(status, query, getconf('primary'), db))
             else:
-                cached = []
+                cached_dictionaries = []
                 for key in DICTIONARY_LOOKUP:
                     try:
-                        cached.append(db[key + query])
+                        cached_dictionaries.append(cached(key, query, db))
                     except KeyError:
                         continue
 
                 result.append(
-                    cached or perror_query_with_fallback(
+                    cached_dictionaries or perror_query_with_fallback(
                         status, query, getconf('primary'), fallback_key, db
                     )
                 )
         elif len(flags) == 1:
-            result.append(perror_query(status, query, flags.pop(), db))
+            result.append(perror_query(status, query, flags[0], db))
         else:
             result.append(perror_threaded_query(status, query, flags, db))
 
+        if result[-1] is None:
+            perror_suggest_corrections(status, query, keys, db)
+        for dictionary in result[-1] or ():
+            _corrections.add(dictionary)
+
     return result
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+# Deletes are generated only for the first few characters of a word, typos
+# further in are caught by the full distance check. Same as in SymSpell.
+PREFIX_LENGTH = 7
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    # Optimal string alignment distance, i.e. Levenshtein distance that also
+    # counts a transposition of two adjacent characters as a single edit.
+    # Returns `max_distance + 1` if the distance exceeds `max_distance`.
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    prev2: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            x = min(
+                prev[j] + 1,
+                cur[j - 1] + 1,
+                prev[j - 1] + (ca != cb),
+            )
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                x = min(x, prev2[j - 2] + 1)
+            cur.append(x)
+
+        if min(cur) > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+
+    return min(prev[-1], max_distance + 1)
+
+
+def _deletes(word: str, max_distance: int) -> set[str]:
+    result = {word}
+    edge = {word}
+    for _ in range(max_distance):
+        edge = {
+            w[:i] + w[i + 1:]
+            for w in edge if len(w) > 1
+            for i in range(len(w))
+        }
+        result.update(edge)
+
+    return result
+
+
+class SpellingIndex:
+    # Symmetric delete spelling correction, see:
+    # https://github.com/wolfgarbe/SymSpell
+    def __init__(self, max_distance: int = 2) -> None:
+        self.max_distance = max_distance
+        self._words: set[str] = set()
+        self._deletes: dict[str, list[str]] = {}
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._words
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def add(self, word: str) -> None:
+        if not word or word in self._words:
+            return
+
+        self._words.add(word)
+        for d in _deletes(word[:PREFIX_LENGTH], self.max_distance):
+            self._deletes.setdefault(d, []).append(word)
+
+    def update(self, words: Iterable[str]) -> None:
+        for word in words:
+            self.add(word)
+
+    def lookup(self, word: str, max_distance: int | None = None) -> list[str]:
+        # Returns known words within `max_distance` edits of `word`, closest
+        # first. Short words allow for a single edit only.
+        if max_distance is None:
+            max_distance = 1 if len(word) <= 4 else self.max_distance
+        max_distance = min(max_distance, self.max_distance)
+
+        candidates: set[str] = set()
+        for d in _deletes(word[:PREFIX_LENGTH], max_distance):
+            candidates.update(self._deletes.get(d, ()))
+
+        result = []
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                result.append((distance, abs(len(candidate) - len(word)), candidate))
+
+        result.sort()
+        return [x for _, _, x in result]
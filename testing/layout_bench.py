@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# Run from the `testing` directory.
+#
+# Compares the time it takes to lay out the first frame of a huge entry
+# eagerly and lazily, and what wrapping the rest of it costs in the
+# background. Uses the synthetic dictionary from `navigation_bench.py`.
+from __future__ import annotations
+
+import os
+import sys
+import timeit
+
+if os.path.basename(sys.path[0]) == 'testing':
+    sys.path[0] = os.path.dirname(sys.path[0])
+
+import src.Curses.screen as screen
+from src.Curses.color import Color
+from testing.navigation_bench import generate
+
+NOPS = (1000, 5000, 20000)
+COLUMN_WIDTH = 60
+NCOLUMNS = 3
+PAGE_HEIGHT = 50
+
+
+def main() -> int:
+    for name in Color.__slots__:
+        setattr(Color, name, 0)
+
+    width = COLUMN_WIDTH - 2*screen.COLUMN_MARGIN
+    for nops in NOPS:
+        d = generate(nops)
+
+        def eager() -> None:
+            screen._layout.__wrapped__(d, COLUMN_WIDTH, NCOLUMNS, Color.values())
+
+        def lazy_first_frame() -> None:
+            layout = screen._lazy_layout(d, width, NCOLUMNS)
+            layout.fill(2 * PAGE_HEIGHT)
+
+        def lazy_rest() -> None:
+            layout = screen._lazy_layout(d, width, NCOLUMNS)
+            layout.fill(2 * PAGE_HEIGHT)
+            while layout.fill_idle():
+                pass
+
+        saved = screen.LAZY_LAYOUT_MIN_OPS
+        screen.LAZY_LAYOUT_MIN_OPS = sys.maxsize
+        t_eager = min(timeit.repeat(eager, number=1, repeat=3))
+        screen.LAZY_LAYOUT_MIN_OPS = saved
+        t_first = min(timeit.repeat(lazy_first_frame, number=1, repeat=3))
+        t_rest = min(timeit.repeat(lazy_rest, number=1, repeat=3)) - t_first
+
+        print(
+            f'{len(d.contents):6d} ops  eager {t_eager * 1e3:8.2f} ms  '
+            f'lazy first frame {t_first * 1e3:7.2f} ms  '
+            f'rest while idle {t_rest * 1e3:8.2f} ms'
+        )
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
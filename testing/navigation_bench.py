@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# Run from the `testing` directory.
+#
+# Times selector and cursor navigation on a synthetic 5,000-op dictionary,
+# the kind of entry that made holding `j` lag. Every figure is the average
+# cost of a single call.
+from __future__ import annotations
+
+import os
+import random
+import sys
+import timeit
+from typing import Callable
+
+if os.path.basename(sys.path[0]) == 'testing':
+    sys.path[0] = os.path.dirname(sys.path[0])
+
+from src.Curses.color import Color
+from src.Curses.screen import _layout
+from src.Curses.screen import Cursor
+from src.Dictionaries.base import AUDIO
+from src.Dictionaries.base import DEF
+from src.Dictionaries.base import Dictionary
+from src.Dictionaries.base import EntrySelector
+from src.Dictionaries.base import ETYM
+from src.Dictionaries.base import HEADER
+from src.Dictionaries.base import LABEL
+from src.Dictionaries.base import PHRASE
+from src.Dictionaries.base import POS
+from src.Dictionaries.base import SYN
+
+NOPS = 5000
+COLUMN_WIDTH = 60
+NCOLUMNS = 3
+
+
+def generate(nops: int) -> Dictionary:
+    rng = random.Random(0)
+    words = 'of relating to or having the quality a person who is easily deceived'.split()
+
+    def sentence() -> str:
+        return ' '.join(rng.choices(words, k=rng.randrange(4, 30)))
+
+    d = Dictionary([HEADER('AH Dictionary')])
+    while len(d.contents) < nops:
+        d.add(PHRASE(f'word{len(d.contents)}', 'wûrd'))
+        d.add(AUDIO('https://example.com/word.wav'))
+        for _ in range(rng.randrange(1, 4)):
+            d.add(LABEL('adj.', ''))
+            for j in range(rng.randrange(3, 20)):
+                d.add(DEF(sentence(), [sentence()], '', subdef=bool(j % 3)))
+        d.add(SYN('gullible, credulous', sentence(), []))
+        d.add(POS([('gullibility', 'gul·li·bil·i·ty')]))
+        d.add(ETYM(sentence()))
+
+    return d
+
+
+def bench(name: str, f: Callable[[], int]) -> None:
+    ncalls = f()
+    t = min(timeit.repeat(f, number=1, repeat=5))
+    print(f'{name:32s} {t / ncalls * 1e6:9.3f} us')
+
+
+def main() -> int:
+    for name in Color.__slots__:
+        setattr(Color, name, 0)
+
+    d = generate(NOPS)
+    layout = _layout(d, COLUMN_WIDTH, NCOLUMNS, Color.values())
+    layout.complete()
+    columns = layout.columns
+    selector = EntrySelector(d)
+    nlines = max(map(len, columns))
+    ndefs = d.count(lambda x: isinstance(x, (DEF, SYN)))
+    print(f'{len(d.contents)} ops, {ndefs} toggleable, {nlines} lines per column')
+
+    def phrase_index_for() -> int:
+        for i in range(1, len(d.contents)):
+            selector.phrase_index_for(i)
+        return len(d.contents) - 1
+
+    def toggle_def_index() -> int:
+        for i in range(1, ndefs + 1):
+            selector.toggle_def_index(i)
+        return ndefs
+
+    def cursor_down() -> int:
+        # What `Screen.move_down()` asks of the cursor on every step.
+        cursor = Cursor(selector, columns)
+        n = 0
+        while cursor.down():
+            cursor.line_at_cur()
+            cursor.line_at_next_cur_down()
+            n += 1
+        return n
+
+    def cursor_go_to_line() -> int:
+        cursor = Cursor(selector, columns)
+        for i in range(nlines):
+            cursor.go_to_cur_at_line_after(i)
+            cursor.go_to_cur_at_line_before(i)
+        return 2 * nlines
+
+    def cursor_change_columns() -> int:
+        cursor = Cursor(selector, columns)
+        n = 0
+        while cursor.down():
+            cursor.right()
+            cursor.left()
+            n += 2
+        return n
+
+    bench('EntrySelector.phrase_index_for', phrase_index_for)
+    bench('EntrySelector.toggle_def_index', toggle_def_index)
+    bench('Cursor.down', cursor_down)
+    bench('Cursor.go_to_cur_at_line_*', cursor_go_to_line)
+    bench('Cursor.right/left', cursor_change_columns)
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
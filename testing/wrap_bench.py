@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# Run from the `testing` directory.
+#
+# Compares `format_dictionary()` throughput with the word-level `wrap()` and
+# the character by character implementation it replaced. Dictionaries are
+# taken from the dictionary cache file if there is one, otherwise a sample
+# with long AHD-like definitions is generated.
+from __future__ import annotations
+
+import os
+import random
+import shelve
+import sys
+import timeit
+
+if os.path.basename(sys.path[0]) == 'testing':
+    sys.path[0] = os.path.dirname(sys.path[0])
+
+import src.Curses.screen as screen
+from src.Curses.color import Color
+from src.data import DATA_DIR
+from src.Dictionaries.base import DEF
+from src.Dictionaries.base import Dictionary
+from src.Dictionaries.base import HEADER
+from src.Dictionaries.base import LABEL
+from src.Dictionaries.base import MAGIC
+from src.Dictionaries.base import PHRASE
+from tests.Curses.screen_test import wrap_reference
+
+WIDTHS = (24, 50, 80, 160)
+
+
+def load_cached(limit: int) -> list[Dictionary]:
+    path = os.path.join(DATA_DIR, f'dictionary_cache.{MAGIC}')
+    try:
+        db = shelve.open(path, flag='r')
+    except Exception:
+        return []
+
+    with db:
+        return [x for x in db.values() if isinstance(x, Dictionary)][:limit]
+
+
+def generate(n: int) -> list[Dictionary]:
+    rng = random.Random(0)
+    words = (
+        'of relating to or characteristic of having the quality a person '
+        'who is easily deceived or cheated especially one that is trusting '
+        'the act or an instance of'
+    ).split()
+
+    def sentence(lo: int, hi: int) -> str:
+        return ' '.join(rng.choices(words, k=rng.randrange(lo, hi)))
+
+    result = []
+    for i in range(n):
+        d = Dictionary([HEADER('AH Dictionary'), PHRASE(f'word{i}', 'wûrd')])
+        for _ in range(rng.randrange(1, 4)):
+            d.add(LABEL('adj.', 'gul·li·bler, gul·li·blest'))
+            for j in range(rng.randrange(3, 15)):
+                d.add(DEF(
+                    sentence(8, 60),
+                    [f'"{sentence(5, 20)}"' for _ in range(rng.randrange(0, 3))],
+                    'Informal' if j % 5 == 0 else '',
+                    subdef=bool(j % 3)
+                ))
+        result.append(d)
+
+    return result
+
+
+def bench(dictionaries: list[Dictionary], width: int, repeat: int) -> float:
+    def run() -> None:
+        for d in dictionaries:
+            screen.format_dictionary(d, width)
+
+    return min(timeit.repeat(run, number=1, repeat=repeat)) / len(dictionaries)
+
+
+def main() -> int:
+    for name in Color.__slots__:
+        setattr(Color, name, 0)
+
+    dictionaries = load_cached(200)
+    source = 'dictionary cache'
+    if not dictionaries:
+        dictionaries = generate(200)
+        source = 'generated sample'
+
+    print(f'{len(dictionaries)} dictionaries from the {source}')
+
+    new_wrap = screen.wrap
+    for width in WIDTHS:
+        times = []
+        results = []
+        for f in (wrap_reference, new_wrap):
+            screen.wrap = f
+            results.append([screen.format_dictionary(d, width) for d in dictionaries])
+            times.append(bench(dictionaries, width, repeat=5))
+        screen.wrap = new_wrap
+
+        if results[0] != results[1]:
+            sys.stderr.write(f'outputs differ at width {width}\n')
+            return 1
+
+        old, new = times
+        print(
+            f'width {width:3d}  char-level {old * 1e3:7.3f} ms  '
+            f'word-level {new * 1e3:7.3f} ms  x{old / new:.1f}'
+        )
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import functools
+from typing import Callable
+
+from src.Curses.main import Screens
+from src.Curses.screen import Screen
+
+
+def _thunks(n: int, built: list[int]) -> list[Callable[[], Screen]]:
+    def thunk(i: int) -> Screen:
+        built.append(i)
+        return Screen.__new__(Screen)
+
+    return [functools.partial(thunk, i) for i in range(n)]
+
+
+def test_screens_are_built_on_access():
+    built: list[int] = []
+    screens = Screens(_thunks(4, built))
+    assert len(screens) == 4
+    assert built == []
+
+    first = screens.current
+    assert screens.current is first
+    screens.next()
+    screens.next()
+    screens.current
+    screens.prev(wrap=True)
+    screens.prev(wrap=True)
+    screens.prev(wrap=True)
+    screens.current
+    assert built == [0, 2, 3]
+    assert len(screens.built()) == 3
+
+
+def test_screens_prebuild_next():
+    built: list[int] = []
+    screens = Screens(_thunks(3, built))
+    screens.next()
+    assert screens.prebuild_next()
+    assert screens.prebuild_next()
+    assert not screens.prebuild_next()
+    assert built == [2, 0]
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import curses
+from typing import cast
+
+import src.Curses.pager as pager
+from src.Curses.pager import Pager
+
+
+def _pager(lines: list[str]) -> Pager:
+    return Pager(cast(curses.window, None), [(x, []) for x in lines])
+
+
+def test_hlsearch_regex():
+    p = _pager(['Colour and color', 'colors', 'no match'])
+    assert p.hlsearch('/colou?r\\b') == 2
+    assert p.hl is not None
+    assert p.hl.hl == {0: [(0, 6), (11, 5)]}
+
+    assert p.hlsearch('/(') == 0
+    assert p.hl is None
+
+
+def test_hlsearch_escaped_prefix():
+    p = _pager(['gullible /ˈɡʌləbəl/', 'gullible'])
+    assert p.hlsearch('//ˈɡʌləbəl/') == 1
+    assert p.hl is not None
+    assert p.hl.hl == {0: [(9, 10)]}
+
+
+def test_hlsearch_regex_smartcase_ignores_escapes():
+    p = _pager(['COLORS', 'colors'])
+    assert p.hlsearch('/color\\S') == 2
+    assert p.hlsearch('/COLOR\\S') == 1
+
+
+def test_hlsearch_in_chunks(monkeypatch):
+    monkeypatch.setattr(pager, 'PAGER_SEARCH_CHUNK', 2)
+    p = _pager(['a', 'b', 'a', 'b', 'a'])
+    assert p.hlsearch('a') == 1
+    assert p.search_more()
+    assert p.hl is not None and p.hl.nmatches == 2
+
+    p.hl_next()
+    assert p._scroll == 2
+    p.hl_next()
+    assert p._scroll == 4
+    assert p.hl.nmatches == 3
+    assert not p.search_more()
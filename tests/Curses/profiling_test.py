@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import json
+
+from src.Curses.profiling import percentile
+from src.Curses.profiling import Profiler
+
+
+def test_percentile():
+    assert percentile(range(100), 0.95) == 95
+    assert percentile([3.0], 0.95) == 3.0
+
+
+def test_profiler_disabled():
+    p = Profiler()
+    with p.measure('draw'):
+        pass
+    p.add('calls', 10)
+    assert p.stats('draw') is None
+    assert p.stats('calls') is None
+
+
+def test_profiler_log(tmp_path):
+    path = str(tmp_path / 'frames.jsonl')
+    p = Profiler()
+    p.open_log(path)
+
+    p.add('layout', 1.5)
+    p.add('layout', 0.5)
+    p.add('calls', 40)
+    with p.paused():
+        p.add('layout', 100)
+    p.end_frame()
+    p.end_frame()  # nothing measured, nothing written
+    p.add('calls', 20)
+    p.end_frame()
+    p.close_log()
+
+    with open(path) as f:
+        frames = [json.loads(line) for line in f]
+    assert [{k: v for k, v in x.items() if k != 'time'} for x in frames] == [
+        {'layout': 2.0, 'calls': 40},
+        {'calls': 20},
+    ]
+    assert p.stats('layout') == (0.5, 1.5)
+    assert p.stats('calls') == (20, 40)
@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import curses
+import random
+import re
+from typing import Sequence
+
+import pytest
+
+import src.Curses.screen as screen
+from src.Curses.color import Color
+from src.Curses.screen import _SearchIndex
+from src.Curses.screen import _substitute_hls
+from src.Curses.screen import Cursor
+from src.Curses.screen import FLine
+from src.Curses.screen import wrap
+from src.Curses.util import Attr
+from src.Curses.util import merge_attrs
+from src.Curses.util import truncate
+from src.Dictionaries.base import DEF
+from src.Dictionaries.base import Dictionary
+from src.Dictionaries.base import EntrySelector
+from src.Dictionaries.base import HEADER
+from src.Dictionaries.base import LABEL
+from src.Dictionaries.base import PHRASE
+
+
+# The character by character implementation `wrap()` has replaced.
+def _next_hl_reference(hls: Sequence[tuple[int, int]], hl_i: int) -> tuple[int, int, int]:
+    try:
+        while True:
+            hl_i += 1
+            span_left, attr = hls[hl_i]
+            if span_left > 0:
+                return hl_i, span_left, attr
+    except IndexError:
+        # TODO: If handling of incomplete hls is ever desired.
+        w = sum(x[0] for x in hls)
+        raise AssertionError(f'sum of lengths of hls spans ({w}) < len(s)')
+
+
+def wrap_reference(
+        dest: list[FLine],
+        op_i: int,
+        s: str,
+        hls: Sequence[tuple[int, int]],
+        width: int, *,
+        predent: str = '',
+        indent: str = ''
+) -> None:
+    # displaying '\n' and '\r' is undesirable
+    if '\n' in s:
+        s = s.replace('\n', ' ')
+    if '\r' in s:
+        s = s.replace('\r', ' ')
+
+    s_len = len(s)
+    cur_indent = predent
+    cur_indent_len = len(predent)
+
+    # fast path
+    if s_len <= width - cur_indent_len:
+        attrs = []
+        _attr_i = cur_indent_len
+        for span, attr in hls:
+            attrs.append(Attr(_attr_i, span, attr))
+            _attr_i += span
+
+        dest.append(FLine(op_i, predent + s, attrs))
+        return
+
+    indent_len = len(indent)
+    hl_i = attr_i = line_i = brk_i = 0
+
+    span_left, attr = hls[hl_i]
+    attrs = []
+
+    # skipping preceding spaces to avoid line breaks
+    # if there is not enough space for single words.
+    try:
+        while s[brk_i] == ' ':
+            brk_i += 1
+    except IndexError:
+        brk_i = 0
+    else:
+        brk_i = s.find(' ', brk_i + 1)
+        if brk_i == -1:
+            brk_i = 0
+
+    break_line = word_cannot_fit = brk_i > width
+    overflow = False
+
+    def PUSH_LINE(_line: str) -> None:
+        _attr_i = cur_indent_len + attr_i
+        if overflow:
+            _trunc_line = truncate(_line, width)
+            if _trunc_line is None:
+                # we don't want to lose any FLines,
+                # even if they can't be displayed
+                _trunc_line = ''
+            else:
+                # -1: space for the truncation character "»"
+                _span = width - _attr_i - 1
+                if _span > 0:
+                    attrs.append(Attr(_attr_i, _span, attr))
+                attrs.append(Attr(width - 1, 1, Color.err | curses.A_STANDOUT))
+            dest.append(FLine(op_i, _trunc_line, attrs))
+        else:
+            span = line_i - attr_i
+            if span > 0:
+                attrs.append(Attr(_attr_i, span, attr))
+                dest.append(FLine(op_i, _line, attrs))
+            else:
+                raise AssertionError('unreachable')
+
+    for i in range(s_len):
+        if line_i == brk_i:
+            e = s.find(' ', i + 1)
+            if e != -1:
+                brk_i += e - i
+            else:
+                brk_i += s_len - i
+
+            break_line = brk_i > width - cur_indent_len
+            word_cannot_fit = break_line and not line_i
+
+        if not break_line:
+            if not span_left:
+                span = line_i - attr_i
+                if span > 0:
+                    attrs.append(Attr(attr_i + cur_indent_len, span, attr))
+                    attr_i = line_i
+
+                hl_i, span_left, attr = _next_hl_reference(hls, hl_i)
+
+            line_i += 1
+        elif word_cannot_fit:
+            if not span_left:
+                hl_i, span_left, attr = _next_hl_reference(hls, hl_i)
+
+            line_i += 1
+            overflow = True
+        else:
+            PUSH_LINE(cur_indent + s[i - line_i:i])
+
+            if not span_left:
+                hl_i, span_left, attr = _next_hl_reference(hls, hl_i)
+
+            cur_indent = indent
+            cur_indent_len = indent_len
+            attr_i = line_i = brk_i = 0
+            attrs = []
+            overflow = False
+
+        span_left -= 1
+
+    if line_i:
+        PUSH_LINE(cur_indent + s[-line_i:])
+
+
+def _random_case(rng: random.Random) -> tuple[str, list[tuple[int, int]], int, str, str]:
+    words = []
+    for _ in range(rng.randrange(1, 12)):
+        words.append('x' * rng.randrange(1, 20))
+        words.append(' ' * rng.choice((1, 1, 1, 2, 3)))
+    s = ' ' * rng.choice((0, 0, 0, 1, 2)) + ''.join(words) + rng.choice(('', 'y', '\n z'))
+
+    hls = []
+    left = len(s)
+    attr = 1
+    while left > 0:
+        span = min(rng.randrange(0, 8), left)
+        hls.append((span, attr))
+        attr += 1
+        left -= span
+    if rng.random() < 0.2:
+        hls.append((0, attr))
+
+    return (
+        s, hls, rng.randrange(2, 40),
+        ' ' * rng.randrange(0, 4), ' ' * rng.randrange(0, 4),
+    )
+
+
+@pytest.fixture
+def color_err():
+    try:
+        prev = Color.err
+    except AttributeError:
+        prev = None
+    Color.err = 1 << 20
+    yield
+    if prev is not None:
+        Color.err = prev
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_wrap_matches_reference(color_err, seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        s, hls, width, predent, indent = _random_case(rng)
+        expected: list[FLine] = []
+        wrap_reference(expected, 7, s, hls, width, predent=predent, indent=indent)
+        result: list[FLine] = []
+        wrap(result, 7, s, hls, width, predent=predent, indent=indent)
+        assert result == expected, (s, hls, width, predent, indent)
+
+
+def test_wrap():
+    result: list[FLine] = []
+    wrap(result, 0, '>1 an example definition', [(1, 1), (1, 2), (1, 0), (22, 3)], 14, indent='   ')
+    assert result == [
+        FLine(0, '>1 an example', [Attr(0, 1, 1), Attr(1, 1, 2), Attr(2, 1, 0), Attr(3, 10, 3)]),
+        FLine(0, '   definition', [Attr(3, 10, 3)]),
+    ]
+
+
+def test_merge_attrs():
+    attrs = [Attr(2, 3, 1), Attr(5, 0, 2), Attr(5, 2, 1), Attr(7, 4, 3), Attr(11, 2, 4)]
+    assert merge_attrs(attrs, 9) == [Attr(2, 5, 1), Attr(7, 2, 3)]
+
+
+def test_substitute_hls():
+    attrs = [Attr(2, 4, 1), Attr(6, 4, 2)]
+    assert _substitute_hls(attrs, [(0, 2), (5, 2), (9, 2)], 9) == [
+        Attr(0, 2, 9),
+        Attr(2, 3, 1),
+        Attr(5, 2, 9),
+        Attr(7, 2, 2),
+        Attr(9, 2, 9),
+    ]
+
+
+def _search_layout(d: Dictionary, columns: list[list[FLine]]) -> screen.Layout:
+    n = len(d.contents)
+    return screen.Layout(d, 20, columns, [(n, n)] * len(columns))
+
+
+def test_search_index_across_lines():
+    d = Dictionary([
+        HEADER('Dict'), PHRASE('a word', ''),
+        DEF('an example definition', [], '', subdef=False), PHRASE('Example', ''),
+    ])
+    layout = _search_layout(d, [
+        [FLine(1, 'a word', []), FLine(2, '>1 an example', []), FLine(2, '   definition', [])],
+        [FLine(3, 'Example', [])],
+    ])
+    index = _SearchIndex(d)
+
+    matches = index.search('example definition')
+    assert len(matches) == 1
+    x = matches[0]
+    assert list(index.locate(layout, [(x, x + len('example definition'))])) == [
+        (0, 1, 6, 7), (0, 2, 3, 10),
+    ]
+
+    # Smartcase, and no matches across ops.
+    assert len(index.search('example')) == 2
+    assert len(index.search('Example')) == 1
+    assert index.search('word >1') == []
+
+    # The text doesn't depend on the layout.
+    narrow = _search_layout(d, [[
+        FLine(1, 'a word', []), FLine(2, '>1 an', []), FLine(2, '   example', []),
+        FLine(2, '   definition', []), FLine(3, 'Example', []),
+    ]])
+    assert list(index.locate(narrow, [(x, x + len('example definition'))])) == [
+        (0, 2, 3, 7), (0, 3, 3, 10),
+    ]
+
+
+def test_search_index_lines_of_examples_and_headers():
+    d = Dictionary([
+        HEADER(''), DEF('one', ['ex a', 'ex b'], '', subdef=False), HEADER('Other'),
+    ])
+    layout = _search_layout(d, [[
+        FLine(1, '>1 one', []), FLine(1, '  ex a', []), FLine(1, '  ex b', []),
+        FLine(2, '─[ Other ]─────', []),
+    ]])
+    index = _SearchIndex(d)
+
+    matches = [(x, x + 2) for x in index.search('ex')]
+    matches.extend((x, x + 3) for x in index.search('the'))
+    assert list(index.locate(layout, matches)) == [
+        (0, 1, 2, 2), (0, 2, 2, 2), (0, 3, 4, 3),
+    ]
+
+
+def test_search_index_narrows_overlapping_matches():
+    index = _SearchIndex(Dictionary([PHRASE('aaab aa', '')]))
+    assert len(index.search('aa')) == 2
+    assert len(index.search('aab')) == 1
+    assert len(index.search('aab a')) == 1
+
+
+def test_search_index_regex():
+    index = _SearchIndex(Dictionary([
+        LABEL('adj.', 'colour'), DEF('the color red', [], '', subdef=False),
+    ]))
+    pattern = re.compile('^[>\\w]+|colou?r red', re.MULTILINE)
+    assert [index.text[start:end] for start, end in index.search_regex(pattern)] == [
+        'adj', '>1', 'color red',
+    ]
+
+
+def test_cursor_lines():
+    d = Dictionary([PHRASE('a', ''), *(DEF(str(i), [], '', subdef=False) for i in range(5))])
+    # ops 1 and 4 take two lines, op 3 continues in the second column.
+    columns = [
+        [FLine(0, 'a', []), FLine(1, '1', []), FLine(1, '1', []), FLine(2, '2', []), FLine(3, '3', [])],
+        [FLine(3, '3', []), FLine(4, '4', []), FLine(4, '4', []), FLine(5, '5', [])],
+    ]
+    cursor = Cursor(EntrySelector(d), columns)
+
+    assert [cursor.cur(), cursor.line_at_cur(), cursor.line_at_next_cur_down()] == [1, 1, 3]
+    cursor.go_to_cur_at_line_after(2)
+    assert cursor.cur() == 2
+    cursor.go_to_cur_at_line_before(4)
+    assert cursor.cur() == 2
+    cursor.go_to_cur_at_line_after(5)
+    assert cursor.cur() == 3
+    assert cursor.line_at_next_cur_down() == 5
+
+    assert cursor.right()
+    assert cursor.cur() == 5
+    cursor.go_to_cur_at_line_before(2)
+    assert cursor.cur() == 4
+    cursor.go_bottom()
+    assert cursor.line_at_next_cur_down() == 4
+
+
+@pytest.fixture
+def colors():
+    prev = {name: getattr(Color, name, None) for name in Color.__slots__}
+    for name in Color.__slots__:
+        setattr(Color, name, 0)
+    yield
+    for name, value in prev.items():
+        if value is not None:
+            setattr(Color, name, value)
+
+
+def test_lazy_layout(colors):
+    d = Dictionary([HEADER('Test')])
+    for i in range(20):
+        d.add(PHRASE(f'phrase {i}', ''))
+        d.add(LABEL('noun', ''))
+        for j in range(5):
+            d.add(DEF(f'definition {j} ' * (j + 1), ['an example'], '', subdef=False))
+
+    layout = screen._lazy_layout(d, 30, 3)
+    assert layout.fill(10)
+    assert all(10 <= len(column) < 40 for column in layout.columns)
+    prefix = [list(column) for column in layout.columns]
+
+    assert layout.fill_idle()
+    assert layout.complete()
+    assert layout.is_complete()
+    assert not layout.fill_idle()
+
+    # Lines are only appended and columns break between ops.
+    for column, before in zip(layout.columns, prefix):
+        assert column[:len(before)] == before
+    for left, right in zip(layout.columns, layout.columns[1:]):
+        assert left[-1].op_i < right[0].op_i
+
+    lines = [line for column in layout.columns for line in column]
+    assert [(op_i, text) for op_i, text, _ in lines] == [
+        (op_i, text) for op_i, text, _ in screen.format_dictionary(d, 30)
+    ]
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import threading
+
+from src.anki import AnkiError
+from src.Curses.proto import StatusProto
+from src.Curses.worker import Worker
+
+
+class FakeStatus:
+    def __init__(self) -> None:
+        self.lines: list[tuple[str, str, str | None]] = []
+
+    def writeln(self, header: str, body: str | None = None) -> None:
+        self.lines.append(('writeln', header, body))
+
+    def error(self, header: str, body: str | None = None) -> None:
+        self.lines.append(('error', header, body))
+
+    def success(self, header: str, body: str | None = None) -> None:
+        self.lines.append(('success', header, body))
+
+    def attention(self, header: str, body: str | None = None) -> None:
+        self.lines.append(('attention', header, body))
+
+    def clear(self) -> None:
+        self.lines.clear()
+
+
+def test_worker_replays_status_and_results():
+    worker = Worker()
+    results: list[object] = []
+
+    def add(status: StatusProto) -> list[int]:
+        status.success('Card added successfully:', 'press "b" to open in Anki')
+        return [1]
+
+    def fail(status: StatusProto) -> None:
+        raise AnkiError('could not connect with Anki')
+
+    worker.submit('Adding cards', add, results.append)
+    worker.submit('Recheck-note', fail)
+    assert worker.wait(5)
+
+    status = FakeStatus()
+    assert worker.poll(status)
+    assert not worker.busy
+    assert results == [[1]]
+    assert status.lines == [
+        ('success', 'Card added successfully:', 'press "b" to open in Anki'),
+        ('error', 'Recheck-note failed:', 'could not connect with Anki'),
+    ]
+
+
+def test_worker_reports_unexpected_errors():
+    worker = Worker()
+    results: list[object] = []
+
+    def fail(status: StatusProto) -> None:
+        raise KeyError('result')
+
+    worker.submit('Recheck-note', fail, results.append)
+    worker.submit('Adding cards', lambda status: [1], results.append)
+    assert worker.wait(5)
+
+    status = FakeStatus()
+    assert worker.poll(status)
+    assert not worker.busy
+    assert results == [None, [1]]
+    assert status.lines == [('error', 'Recheck-note failed:', "'result'")]
+
+
+def test_worker_cancel():
+    worker = Worker()
+    release = threading.Event()
+    results: list[object] = []
+
+    def slow(status: StatusProto) -> int:
+        release.wait(5)
+        status.writeln('slow')
+        return 1
+
+    worker.submit('Slow', slow, results.append)
+    worker.submit('Queued', lambda status: 2, results.append)
+    assert worker.cancel() == 2
+    assert not worker.busy
+    release.set()
+    assert worker.wait(5)
+
+    status = FakeStatus()
+    assert not worker.poll(status)
+    assert results == [] and status.lines == []
@@ -0,0 +1,71 @@
+import pytest
+
+from src.Dictionaries.ahd import _fix_stress_and_remove_private_symbols
+from src.Dictionaries.ahd import ahd_to_ipa
+
+
+@pytest.mark.parametrize(
+    ('phon', 'th', 'expected'),
+    (
+        ('(chûrch)', 'θ', '/tʃɝtʃ/'),
+        ('(ə-băn′dən)', 'θ', '/əˈbænˌdən/'),
+        ('(kôr′ĭ-dôr′, -dər)', 'θ', '/kɔːrˌɪˈdɔːrˌ, ˈdɚ/'),
+        ('(thôt)', 'θ', '/θɔːt/'),
+        ('(thăt)', 'ð', '/ðæt/'),
+        ('(ĭn-dĭs′pĕn-sə-bəl)', 'θ', '/ɪnˈdɪsˌpɛnˈsəˈbəl/'),
+        ('(mə-lĭsh′əs)', 'θ', '/məˈlɪʃˌəs/'),
+        ('(boi′stər-əs)', 'θ', '/bɔɪˌstɚˈəs/'),
+        ('(ouch)', 'θ', '/aʊtʃ/'),
+        ('(ĭm′ə-gāt′)', 'θ', '/ɪmˌəˈgeɪtˌ/'),
+        ('(bŭt\ue01fn)', 'θ', '/bʌtən/'),
+        ('(lĭt\ue01fl)', 'θ', '/lɪtɫ/'),
+        ('(t\ue012r)', 'θ', '/tʊəɹ/'),
+        ('(plĕzh′ər)', 'θ', '/plɛʒˌɚ/'),
+        ('(sĭng′ər)', 'θ', '/sɪŋˌɚ/'),
+        ('(bîr)', 'θ', '/bɪəɹ/'),
+        ('(kâr)', 'θ', '/kɛəɹ/'),
+        ('(g\ue012d)', 'θ', '/gʊd/'),
+        ('(f\ue013d)', 'θ', '/fu:d/'),
+        ('(yo͞o′nə-vûr′sə-tē)', 'θ', '/jo͞oˌnəˈvɝˌsəˈtiː/'),
+        ('(jŭj)', 'θ', '/dʒʌdʒ/'),
+        ('(äm′ə-tē)', 'θ', '/ɑːmˌəˈtiː/'),
+        ('(hwĭch, wĭch)', 'θ', '/hwɪtʃ, wɪtʃ/'),
+        ('(ī′ə-lə-jē)', 'θ', '/aɪˌəˈləˈdʒiː/'),
+        ('(ō′vər-thrō′)', 'θ', '/oʊˌvɚˈθroʊˌ/'),
+        ('(bĕ-thēz′)', 'ð', '/bɛˈðiːzˌ/'),
+        ('(mŏnk)', 'θ', '/mɒnk/'),
+        ('(bôr′zhwä′)', 'θ', '/bɔːrˌʒwɑːˌ/'),
+        ('(ĭ\ue01fng)', 'θ', '/ɪ.ŋ/'),
+        ('(lŏk, lôk)', 'θ', '/lɒk, lɔːk/'),
+        ('(fyo͝or)', 'θ', '/fjo͝or/'),
+        ('(kroud)', 'θ', '/kraʊd/'),
+        ('(ûr)', 'θ', '/ɝ/'),
+        ('(ə-sûr′)', 'θ', '/əˈsɝˌ/'),
+        ('(ēch)', 'θ', '/iːtʃ/'),
+        ('(ăn′ə-fə-lăk′sĭs)', 'θ', '/ænˌəˈfəˈlækˌsɪs/'),
+        ('', 'θ', ''),
+    )
+)
+def test_ahd_to_ipa(phon, th, expected):
+    assert ahd_to_ipa(phon, th) == expected
+
+
+@pytest.mark.parametrize(
+    ('phon', 'expected'),
+    (
+        ('(chûrch)', '(chûrch)'),
+        ('(ə-băn′dən)', '(ə-bănˌdən)'),
+        ('(kôr′ĭ-dôr′, -dər)', '(kôrˌĭ-dôrˌ, -dər)'),
+        ('(thôt)', '(thôt)'),
+        ('(thăt)', '(thăt)'),
+        ('(ĭn-dĭs′pĕn-sə-bəl)', '(ĭn-dĭsˌpĕn-sə-bəl)'),
+        ('(mə-lĭsh′əs)', '(mə-lĭshˌəs)'),
+        ('(boi′stər-əs)', '(boiˌstər-əs)'),
+        ('(ouch)', '(ouch)'),
+        ('(ĭm′ə-gāt′)', '(ĭmˌə-gātˌ)'),
+        ('(bŭt\ue01fn)', '(bŭt.n)'),
+        ('(lĭt\ue01fl)', '(lĭt.l)'),
+    )
+)
+def test_fix_stress_and_remove_private_symbols(phon, expected):
+    assert _fix_stress_and_remove_private_symbols(phon) == expected
@@ -1,3 +1,5 @@
+import pytest
+
 from src.Dictionaries.base import AUDIO
 from src.Dictionaries.base import DEF
 from src.Dictionaries.base import Dictionary
@@ -100,3 +102,24 @@ def test_dump_selection():
     assert e.dump_selection(respect_phrase_boundaries=False) == [
         DictionarySelection(audio_two, [def_three, def_four], etym_two, phrase_two, pos_two, [])
     ]
+
+
+def test_entry_selector_indices():
+    d = Dictionary([
+        HEADER('Test'),
+        PHRASE('1', '1'), AUDIO('1'), DEF('1', [], '', subdef=False),
+        PHRASE('2', '2'), DEF('2', [], '', subdef=False), DEF('3', [], '', subdef=False),
+    ])
+    e = EntrySelector(d)
+    assert [e.phrase_index_for(i) for i in range(1, 7)] == [1, 1, 1, 4, 4, 4]
+    with pytest.raises(ValueError):
+        e.phrase_index_for(0)
+
+    e.toggle_def_index(3)
+    e.toggle_def_index(4)
+    assert [e.is_toggled(i) for i in range(7)] == [False, False, False, False, True, False, True]
+
+    e.toggle_def_index(3)
+    assert not e.is_toggled(4)
+    e.toggle_def_index(1)
+    assert [e.is_toggled(i) for i in range(4)] == [False, True, True, True]
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from src.data import config
+from src.Dictionaries.base import DictionaryError
+from src.Dictionaries.base import HEADER
+from src.Dictionaries.base import LABEL
+from src.Dictionaries.base import PHRASE
+from src.Dictionaries.base import SYN
+from src.Dictionaries.wordnet import ask_wordnet_local
+
+LICENSE = '  1 This software and database is being provided to you, the LICENSEE...\n'
+
+DATA_NOUN = [
+    '02084071 05 n 03 dog 0 domestic_dog 0 Canis_familiaris 0 000 | a member of the genus Canis; "the dog barked all night"',
+    '10114209 18 n 01 dog 1 000 | a dull unattractive unpleasant girl or woman; "she got a reputation as a frump"; "she\'s a real dog"',
+    '03223499 06 n 01 house 0 000 | a dwelling that serves as living quarters for one or more families; "he has a house on Cape Cod; she lives in a flat"; "he bought a house"',
+]
+DATA_VERB = [
+    '02005948 38 v 01 dog 0 000 | go after with the intent to catch; "The policeman chased the mugger down the alley"',
+    '01835496 38 v 01 go 0 000 | change location; move, travel, or proceed',
+]
+DATA_ADJ = [
+    '00013887 00 s 02 galore(ip) 0 abundant 0 000 | in great numbers',
+]
+
+
+def _write_data(path: Path, pos: str, lines: list[str]) -> list[int]:
+    offsets = []
+    buf = LICENSE
+    for line in lines:
+        offset = len(buf.encode())
+        offsets.append(offset)
+        buf += line.replace(line[:8], f'{offset:08d}', 1) + '  \n'
+    path.joinpath(f'data.{pos}').write_text(buf)
+    return offsets
+
+
+def _write_index(path: Path, pos: str, entries: dict[str, list[int]]) -> None:
+    buf = LICENSE
+    for lemma, offsets in sorted(entries.items()):
+        p = pos[0] if pos != 'adj' else 'a'
+        buf += f'{lemma} {p} {len(offsets)} 0 {len(offsets)} 0 {" ".join(f"{x:08d}" for x in offsets)}  \n'
+    path.joinpath(f'index.{pos}').write_text(buf)
+
+
+@pytest.fixture
+def wordnetdir(tmp_path):
+    noun = _write_data(tmp_path, 'noun', DATA_NOUN)
+    verb = _write_data(tmp_path, 'verb', DATA_VERB)
+    adj = _write_data(tmp_path, 'adj', DATA_ADJ)
+    _write_data(tmp_path, 'adv', [])
+    _write_index(tmp_path, 'noun', {'dog': noun[:2], 'domestic_dog': noun[:1], 'house': noun[2:]})
+    _write_index(tmp_path, 'verb', {'dog': verb[:1], 'go': verb[1:]})
+    _write_index(tmp_path, 'adj', {'galore': adj, 'abundant': adj})
+    _write_index(tmp_path, 'adv', {})
+    tmp_path.joinpath('verb.exc').write_text('gone go\nwent go\n')
+
+    config['wordnetdir'] = str(tmp_path)
+    yield tmp_path
+    config['wordnetdir'] = '-'
+
+
+def test_wordnet_local(wordnetdir):
+    assert ask_wordnet_local('Dog').contents == [
+        HEADER('WordNet'),
+        PHRASE('Dog', ''),
+        LABEL('Noun', ''),
+        SYN(
+            'dog, domestic dog, Canis familiaris',
+            '(a member of the genus Canis)',
+            ['"the dog barked all night"']
+        ),
+        SYN(
+            'dog',
+            '(a dull unattractive unpleasant girl or woman)',
+            ['"she got a reputation as a frump"', '"she\'s a real dog"']
+        ),
+        LABEL('Verb', ''),
+        SYN(
+            'dog',
+            '(go after with the intent to catch)',
+            ['"The policeman chased the mugger down the alley"']
+        ),
+    ]
+
+
+def test_wordnet_local_examples_with_semicolons(wordnetdir):
+    assert ask_wordnet_local('house').contents[-1] == SYN(
+        'house',
+        '(a dwelling that serves as living quarters for one or more families)',
+        ['"he has a house on Cape Cod; she lives in a flat"', '"he bought a house"'],
+    )
+
+
+@pytest.mark.parametrize(
+    ('query', 'expected'),
+    (
+        ('domestic  dog', 'dog, domestic dog, Canis familiaris'),
+        ('houses', 'house'),
+        ('went', 'go'),
+        ('going', 'go'),
+        ('galore', 'galore, abundant'),
+    )
+)
+def test_wordnet_local_lemmas(wordnetdir, query, expected):
+    syn = ask_wordnet_local(query).contents[3]
+    assert isinstance(syn, SYN)
+    assert syn.synonyms == expected
+
+
+@pytest.mark.parametrize('query', ('cat', 'do', 'dogg', 'houseboat'))
+def test_wordnet_local_not_found(wordnetdir, query):
+    with pytest.raises(DictionaryError, match='not found'):
+        ask_wordnet_local(query)
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import json
+from concurrent.futures import Future
+from typing import Any
+
+import pytest
+
+import src.anki as anki
+from src.data import config
+from src.Dictionaries.base import Dictionary
+from src.Dictionaries.base import PHRASE
+
+
+@pytest.fixture
+def fake_anki(monkeypatch):
+    config['deck'] = 'Default'
+    config['note'] = 'gryzus-std'
+    config['tags'] = 'dodawacz'
+    config['duplicates'] = True
+    requests: list[list[dict[str, Any]]] = []
+    responses: list[Any] = []
+
+    def invoke(action, **params):
+        assert action == 'multi'
+        requests.append(params['actions'])
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def get_model(model, recheck=False):
+        if recheck:
+            return {'Front': 'PHRASE', 'Back': 'DEF'}
+        return {'Front': None, 'Back': 'DEF'}
+
+    monkeypatch.setattr(anki, 'invoke', invoke)
+    monkeypatch.setattr(anki.models, 'get_model', get_model)
+    return requests, responses
+
+
+def _card(phrase: str) -> Any:
+    return {'DEF': 'a definition', 'PHRASE': phrase}
+
+
+def test_add_cards_maps_errors_per_note(fake_anki):
+    requests, responses = fake_anki
+    responses.append([
+        {'result': 1, 'error': None},
+        {'result': None, 'error': 'cannot create note because it is a duplicate'},
+        {'result': None, 'error': 'something else'},
+    ])
+
+    result = anki.add_cards([_card('a'), _card('b'), _card('c')])
+    assert len(requests) == 1
+    assert [x['action'] for x in requests[0]] == ['addNote'] * 3
+    assert result[0] == 1
+    assert type(result[1]) is anki.AnkiError and str(result[1]) == 'card is a duplicate'
+    assert type(result[2]) is Exception
+
+
+def test_add_cards_retries_first_field_empty(fake_anki):
+    requests, responses = fake_anki
+    responses.append([
+        {'result': None, 'error': 'cannot create note because it is empty'},
+        {'result': 2, 'error': None},
+    ])
+    responses.append([{'result': 3, 'error': None}])
+
+    assert anki.add_cards([_card('a'), _card('b')]) == [3, 2]
+    assert len(requests) == 2
+    assert requests[1][0]['params']['note']['fields'] == {'Front': 'a', 'Back': 'a definition'}
+
+
+def test_card_queue_journal(tmp_path, fake_anki):
+    requests, responses = fake_anki
+    config['duplicates'] = False
+    path = str(tmp_path / 'queue.jsonl')
+    queue = anki._CardQueue(path)
+    queue.enqueue([_card('a'), _card('b')])
+    assert len(queue) == 2
+
+    # A request that never got a response.
+    responses.append(anki.AnkiUnreachableError('could not connect with Anki'))
+    with pytest.raises(anki.AnkiUnreachableError):
+        queue.flush()
+    requests.clear()
+
+    # The journal is replayed after a restart.
+    queue = anki._CardQueue(path)
+    assert len(queue) == 2
+    responses.append([
+        {'result': None, 'error': 'cannot create note because it is a duplicate'},
+        {'result': 5, 'error': None},
+    ])
+    assert queue.flush()
+    for action in requests[0]:
+        assert action['params']['note']['options']['allowDuplicate'] is False
+
+    # The duplicate was added by the interrupted request.
+    assert queue.poll() == (1, [])
+    assert len(queue) == 0
+    assert not queue.flush()
+    assert len(anki._CardQueue(path)) == 0
+
+
+def test_card_queue_keeps_allow_duplicate(tmp_path, fake_anki):
+    requests, responses = fake_anki
+    queue = anki._CardQueue(str(tmp_path / 'queue.jsonl'))
+    queue.enqueue([_card('a')])
+
+    responses.append(anki.AnkiUnreachableError('could not connect with Anki'))
+    with pytest.raises(anki.AnkiUnreachableError):
+        queue.flush()
+
+    # Duplicates were allowed when the card was queued.
+    responses.append([{'result': None, 'error': 'cannot create note because it is a duplicate'}])
+    assert queue.flush()
+    assert requests[1][0]['params']['note']['options']['allowDuplicate'] is True
+    assert queue.poll() == (0, [('a', 'card is a duplicate')])
+
+
+def test_card_queue_uploads_media_first(tmp_path, fake_anki, monkeypatch):
+    requests, responses = fake_anki
+    uploaded: list[str | None] = []
+
+    def upload(url):
+        future: Future[None] = Future()
+        if uploaded:
+            uploaded.append(url)
+            future.set_result(None)
+        else:
+            uploaded.append(None)
+            future.set_exception(anki.AnkiUnreachableError('could not connect with Anki'))
+        return url.rpartition('/')[2], future
+
+    monkeypatch.setattr(anki.media_uploads, 'upload', upload)
+    queue = anki._CardQueue(str(tmp_path / 'queue.jsonl'))
+    queue.enqueue([_card('a'), _card('b')], ['https://example.com/a.mp3', None])
+
+    # Cards are not sent until their audio is in Anki.
+    with pytest.raises(anki.AnkiUnreachableError):
+        queue.flush()
+    assert requests == []
+    assert not queue._sent
+
+    responses.append([{'result': 1, 'error': None}, {'result': 2, 'error': None}])
+    assert queue.flush()
+    assert uploaded == [None, 'https://example.com/a.mp3']
+    assert queue.poll() == (2, [])
+
+
+def test_models_cache_revalidate(tmp_path, fake_anki):
+    requests, responses = fake_anki
+    path = str(tmp_path / 'anki_cache.json')
+    with open(path, 'w') as f:
+        json.dump({
+            'version': anki.ANKI_CACHE_VERSION,
+            'models': {
+                'gryzus-std': {'Front': 'PHRASE'},
+                'Deleted': {'Front': 'PHRASE'},
+            },
+            'modelNames': ['gryzus-std', 'Deleted'],
+            'deckNames': ['Default'],
+        }, f)
+
+    # Served from the cache, without a request.
+    cache = anki._AnkiModels(path)
+    assert cache.get_model('gryzus-std') == {'Front': 'PHRASE'}
+    assert cache.deck_names() == ['Default']
+    assert requests == []
+
+    responses.append([
+        {'result': ['gryzus-std', 'Basic'], 'error': None},
+        {'result': ['Default', 'English'], 'error': None},
+        {'result': ['Phrase', 'Definition'], 'error': None},
+        {'result': None, 'error': 'model was not found: Deleted'},
+    ])
+    cache._revalidate()
+    assert len(requests) == 1
+
+    cache = anki._AnkiModels(path)
+    assert cache.model_names() == ['gryzus-std', 'Basic']
+    assert cache.deck_names() == ['Default', 'English']
+    assert cache.get_model('gryzus-std') == {'Phrase': 'PHRASE', 'Definition': 'DEF'}
+    assert len(requests) == 1
+
+
+def test_duplicate_index(monkeypatch):
+    config['deck'] = 'Default'
+    config['note'] = 'gryzus-std'
+    config['dupescope'] = 'deck'
+    config['duplicates'] = False
+    requests: list[tuple[str, dict[str, Any]]] = []
+
+    def invoke(action, **params):
+        requests.append((action, params))
+        if action == 'modelFieldNames':
+            return ['Definition', 'Phrase']
+        elif action == 'findNotes':
+            return [1, 2]
+        elif action == 'notesInfo':
+            return [
+                {'fields': {'Phrase': {'value': 'x', 'order': 1}, 'Definition': {'value': '<b>a</b> ', 'order': 0}}},
+                {'fields': {'Definition': {'value': 'it&#39;s', 'order': 0}, 'Phrase': {'value': 'Y', 'order': 1}}},
+            ]
+        elif action == 'multi':
+            return [{'result': 10, 'error': None} for _ in params['actions']]
+        raise AssertionError(action)
+
+    monkeypatch.setattr(anki, 'invoke', invoke)
+    monkeypatch.setattr(anki.models, 'get_model', lambda model, recheck=False: {'Definition': 'DEF', 'Phrase': 'PHRASE'})
+    index = anki._DuplicateIndex()
+    monkeypatch.setattr(anki, 'duplicates', index)
+
+    index._build(index._scope('gryzus-std', 'Default'))
+    assert requests[1] == ('findNotes', {'query': '"note:gryzus-std" "deck:Default" -"deck:Default::*"'})
+
+    def card(definition: str, phrase: str) -> Any:
+        return {'DEF': definition, 'PHRASE': phrase}
+
+    # Duplicates are notes with the same first field, only the new ones
+    # are sent.
+    result = anki.add_cards([card('a', 'b'), card("it's", 'c'), card('d', 'y')])
+    assert type(result[0]) is anki.AnkiError and type(result[1]) is anki.AnkiError
+    assert result[2] == 10
+    assert len(requests[-1][1]['actions']) == 1
+
+    # Phrases are marked by the field they go into, added notes included.
+    d = Dictionary([PHRASE('x', ''), PHRASE('b', ''), PHRASE('y', ''), PHRASE('a', '')])
+    assert index.phrase_indices(d) == {0, 2}
+    anki.add_cards([card('e', 'b')])
+    assert index.phrase_indices(d) == {0, 1, 2}
+
+    # An out of date index is kept for the marks, but duplicates are left
+    # to Anki.
+    index._built[index._scope('gryzus-std', 'Default')] = 0
+    monkeypatch.setattr(index, 'start', lambda: None)
+    note = {'modelName': 'gryzus-std', 'deckName': 'Default', 'fields': {'Definition': 'a'}}
+    assert not index.is_duplicate(note)
+    assert index.phrase_indices(d) == {0, 1, 2}
+
+
+def test_media_uploads_skip_known_files(tmp_path, monkeypatch):
+    stored = []
+
+    class Response:
+        data = b'audio'
+
+    monkeypatch.setattr('src.anki.http.urlopen', lambda method, url: Response())
+    monkeypatch.setattr(
+        anki, 'invoke',
+        lambda action, **params: stored.append((action, params['filename']))
+    )
+    uploads = anki._MediaUploads(str(tmp_path / 'media_index.json'))
+    uploads._index = {}
+
+    filename, upload = uploads.upload('https://example.com/a/word.mp3')
+    assert filename == 'word.mp3'
+    upload.result()
+    uploads.upload('https://example.com/b/word.mp3')[1].result()
+    assert stored == [('storeMediaFile', 'word.mp3')]
+
+    Response.data = b'other audio'
+    uploads.upload('https://example.com/a/word.mp3')[1].result()
+    assert len(stored) == 2
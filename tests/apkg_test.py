@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import zipfile
+from typing import Any
+
+from src.apkg import export_apkg
+from src.data import config
+
+
+def _card(phrase: str, audio: str = '') -> Any:
+    return {
+        'DEF': 'a <b>definition</b>', 'SYN': '', 'PHRASE': phrase, 'EXSEN': '',
+        'POS': '', 'ETYM': '', 'AUDIO': audio,
+    }
+
+
+def test_export_apkg(tmp_path):
+    config['deck'] = 'Words'
+    config['tags'] = 'dodawacz, english'
+    (tmp_path / 'a.mp3').write_bytes(b'audio')
+    path = tmp_path / 'out.apkg'
+
+    cards = [_card('a', '[sound:a.mp3]'), _card('b', '[sound:missing.mp3]')]
+    assert export_apkg(str(path), cards, audio_dir=str(tmp_path)) == 2
+
+    with zipfile.ZipFile(path) as z:
+        assert json.loads(z.read('media')) == {'0': 'a.mp3'}
+        assert z.read('0') == b'audio'
+        (tmp_path / 'collection.anki2').write_bytes(z.read('collection.anki2'))
+
+    conn = sqlite3.connect(tmp_path / 'collection.anki2')
+    models = json.loads(conn.execute('SELECT models FROM col').fetchone()[0])
+    decks = json.loads(conn.execute('SELECT decks FROM col').fetchone()[0])
+    model, = models.values()
+    assert model['name'] == 'gryzus-std'
+    assert {x['name'] for x in decks.values()} == {'Default', 'Words'}
+
+    notes = conn.execute('SELECT id, mid, tags, flds, sfld FROM notes').fetchall()
+    assert [x[4] for x in notes] == ['a definition'] * 2
+    assert notes[0][1] == model['id']
+    assert notes[0][2] == ' dodawacz english '
+    fields = dict(zip((x['name'] for x in model['flds']), notes[0][3].split('\x1f')))
+    assert fields['Target phrase'] == 'a'
+    assert fields['Audio'] == '[sound:a.mp3]'
+
+    cards_ = conn.execute('SELECT nid, did, due FROM cards').fetchall()
+    assert [(nid, due) for nid, _, due in cards_] == [(notes[0][0], 1), (notes[1][0], 2)]
+    assert str(cards_[0][1]) in decks
+    conn.close()
+
+
+def test_export_apkg_stable_guid(tmp_path):
+    def guid(card: Any) -> str:
+        path = tmp_path / 'out.apkg'
+        export_apkg(str(path), [card], audio_dir=str(tmp_path))
+        with zipfile.ZipFile(path) as z:
+            (tmp_path / 'collection.anki2').write_bytes(z.read('collection.anki2'))
+        conn = sqlite3.connect(tmp_path / 'collection.anki2')
+        result: str = conn.execute('SELECT guid FROM notes').fetchone()[0]
+        conn.close()
+        return result
+
+    edited = {**_card('a'), 'SYN': 'an edited synonym'}
+    assert guid(_card('a')) == guid(edited)
+    assert guid(_card('a')) != guid({**_card('a'), 'DEF': 'another definition'})
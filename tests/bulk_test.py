@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import io
+import time
+from concurrent.futures import Future
+
+import src.anki as anki
+import src.bulk as bulk
+from src.bulk import clear_enriched
+from src.bulk import load_enriched
+from src.bulk import mark_enriched
+from src.bulk import missing_fields
+from src.bulk import PrintStatus
+from src.bulk import read_words
+from src.bulk import select_by_policy
+from src.bulk import SelectionPolicy
+from src.Dictionaries.base import AUDIO
+from src.Dictionaries.base import DEF
+from src.data import config
+from src.Dictionaries.base import Dictionary
+from src.Dictionaries.base import DictionarySelection
+from src.Dictionaries.base import DictionaryError
+from src.Dictionaries.base import PHRASE
+from src.Dictionaries.base import SYN
+
+
+def test_read_words():
+    lines = ['gullible\n', '\n', '# comment\n', 'Gullible \n', ' take a hike\n']
+    assert list(read_words(lines)) == ['gullible', 'take a hike']
+
+
+def _def(s: str, subdef: bool = False) -> DEF:
+    return DEF(s, [], '', subdef=subdef)
+
+
+def test_select_by_policy():
+    d = Dictionary([
+        PHRASE('first', ''), AUDIO('https://example.com/a.mp3'),
+        _def('a'), _def('a1', subdef=True), _def('b'), _def('c'),
+        SYN('s', 'a definition', []), SYN('t', 'a definition', []),
+        PHRASE('second', ''), _def('d'),
+        PHRASE('third', ''), _def('e'),
+    ])
+
+    selections = select_by_policy(d, SelectionPolicy(ndefs=2, nsyns=1, nphrases=2))
+    assert selections is not None
+    assert [x.PHRASE.phrase for x in selections] == ['first', 'second']
+    first, second = selections
+    assert [x.definition for x in first.DEF] == ['a', 'b']
+    assert [x.synonyms for x in first.SYN] == ['s']
+    assert first.AUDIO is not None
+    assert [x.definition for x in second.DEF] == ['d']
+
+    selections = select_by_policy(d, SelectionPolicy(ndefs=2, subdefs=True))
+    assert selections is not None
+    assert [x.definition for x in selections[0].DEF] == ['a', 'a1']
+
+    assert select_by_policy(d, SelectionPolicy(ndefs=0)) is None
+
+
+def test_missing_fields(monkeypatch):
+    monkeypatch.setattr(
+        anki.models, 'get_model',
+        lambda model, recheck=False: {
+            'Phrase': 'PHRASE', 'Definition': 'DEF', 'Audio': 'AUDIO', 'Notes': None,
+        }
+    )
+
+    def info(**values: str) -> dict:
+        return {
+            'noteId': 1,
+            'modelName': 'gryzus-std',
+            'fields': {k: {'value': v, 'order': i} for i, (k, v) in enumerate(values.items())},
+        }
+
+    assert missing_fields(info(Phrase='<b>gullible</b>', Definition='easily deceived', Audio=' ', Notes='')) == (
+        'gullible', {'Audio': 'AUDIO'}
+    )
+    assert missing_fields(info(Phrase='gullible', Definition='easily deceived', Audio='[sound:a.mp3]')) is None
+    assert missing_fields(info(Phrase='', Definition='', Audio='')) is None
+    assert missing_fields(info(Front='gullible', Back='')) is None
+
+
+def test_enrich_progress(tmp_path):
+    path = str(tmp_path / 'enrich_progress.jsonl')
+    assert load_enriched(path, 'English') == set()
+
+    mark_enriched(path, 'English', [1, 2])
+    mark_enriched(path, 'Other', [3])
+    mark_enriched(path, 'English', [4])
+    assert load_enriched(path, 'English') == {1, 2, 4}
+
+    clear_enriched(path, 'English')
+    assert load_enriched(path, 'English') == set()
+    assert load_enriched(path, 'Other') == {3}
+
+
+def test_enrich_batch_retries_failed_lookups(monkeypatch):
+    config['audio'] = False
+    monkeypatch.setattr(
+        anki.models, 'get_model',
+        lambda model, recheck=False: {'Phrase': 'PHRASE', 'Definition': 'DEF'}
+    )
+
+    def invoke(action, **params):
+        assert action == 'notesInfo'
+        return [
+            {
+                'noteId': nid, 'modelName': 'gryzus-std',
+                'fields': {
+                    'Phrase': {'value': phrase, 'order': 0},
+                    'Definition': {'value': '', 'order': 1},
+                },
+            }
+            for nid, phrase in zip(params['notes'], ('first', 'missing', 'offline'))
+        ]
+
+    def lookup_many(queries, key):
+        for query in queries:
+            if query == 'missing':
+                yield query, DictionaryError('could not find')
+            elif query == 'offline':
+                yield query, ConnectionError('no internet')
+            else:
+                yield query, Dictionary([PHRASE(query, ''), _def('a definition')])
+
+    updates = []
+
+    def invoke_multi(actions):
+        updates.extend(actions)
+        return [None] * len(actions)
+
+    monkeypatch.setattr(anki, 'invoke', invoke)
+    monkeypatch.setattr(anki, 'invoke_multi', invoke_multi)
+    monkeypatch.setattr(bulk, 'lookup_many', lookup_many)
+
+    nupdated, done = bulk._enrich_batch(PrintStatus(io.StringIO()), [1, 2, 3], 'ahd', SelectionPolicy())
+    assert nupdated == 1
+    assert done == [1]
+    assert [x[1]['note']['id'] for x in updates] == [1]
+
+
+def _selections(phrases: list[str]) -> list[DictionarySelection]:
+    result = []
+    for phrase in phrases:
+        d = Dictionary([PHRASE(phrase, ''), AUDIO(f'https://example.com/{phrase}.mp3'), _def('a')])
+        selected = select_by_policy(d, SelectionPolicy())
+        assert selected is not None
+        result.extend(selected)
+    return result
+
+
+def test_make_cards_fetches_audio_concurrently(monkeypatch):
+    monkeypatch.setitem(config, 'audio', True)
+    monkeypatch.setitem(config, 'hidepreps', True)
+    monkeypatch.setitem(config, 'hides', '___')
+
+    def save_audio(status, selection):
+        # Later cards are fetched first.
+        time.sleep(0.01 * (3 - len(selection.PHRASE.phrase)))
+        return f'[sound:{selection.PHRASE.phrase}.mp3]'
+
+    monkeypatch.setattr(bulk, 'perror_save_audio', save_audio)
+    status = PrintStatus(io.StringIO())
+    cards = bulk.make_cards(status, _selections(['a', 'bb', 'ccc']), nworkers=3)
+    assert [x['AUDIO'] for x in cards] == ['[sound:a.mp3]', '[sound:bb.mp3]', '[sound:ccc.mp3]']
+
+
+def test_make_cards_uploads_audio(monkeypatch):
+    monkeypatch.setitem(config, 'audio', True)
+    monkeypatch.setitem(config, 'mediaupload', True)
+    monkeypatch.setitem(config, 'hidepreps', True)
+    monkeypatch.setitem(config, 'hides', '___')
+    uploaded = []
+
+    def upload(url):
+        uploaded.append(url)
+        future: Future[None] = Future()
+        if url.endswith('b.mp3'):
+            future.set_exception(anki.AnkiError('no space left'))
+        else:
+            future.set_result(None)
+        return url.rpartition('/')[2], future
+
+    monkeypatch.setattr(anki.media_uploads, 'upload', upload)
+    file = io.StringIO()
+    selections = _selections(['a', 'b'])
+
+    cards = list(bulk.make_cards(PrintStatus(file), selections, upload=True))
+    assert [x['AUDIO'] for x in cards] == ['[sound:a.mp3]', '[sound:b.mp3]']
+    assert uploaded == ['https://example.com/a.mp3', 'https://example.com/b.mp3']
+    assert file.getvalue() == 'Uploading audio failed: no space left\n'
+
+    # .apkg files need the audio in the media directory.
+    monkeypatch.setattr(bulk, 'perror_save_audio', lambda status, selection: '[sound:saved.mp3]')
+    cards = list(bulk.make_cards(PrintStatus(file), selections))
+    assert [x['AUDIO'] for x in cards] == ['[sound:saved.mp3]'] * 2
+    assert len(uploaded) == 2
+
+
+def test_main_reports_errors(tmp_path, capsys):
+    assert bulk.main([str(tmp_path / 'missing.txt')]) == 1
+    assert 'Making cards failed:' in capsys.readouterr().err
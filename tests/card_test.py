@@ -1,7 +1,14 @@
+import io
+
 import pytest
 
+import src.anki as anki
 import src.card as card
+from src.bulk import PrintStatus
 from src.data import config
+from src.Dictionaries.base import DEF
+from src.Dictionaries.base import DictionarySelection
+from src.Dictionaries.base import PHRASE
 
 
 @pytest.mark.parametrize(
@@ -44,3 +51,4 @@ def test_hide_nohidepreps(target, phrase_to_hide, expected):
     config['hides'] = '___'
     hide_func = card.prepare_hide_func(phrase_to_hide)
     assert hide_func(target) == expected
+
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import pytest
+
+import src.search as search
+from src.Dictionaries.base import Dictionary
+from src.Dictionaries.base import DictionaryError
+from src.Dictionaries.base import HEADER
+from src.Dictionaries.base import LABEL
+from src.Dictionaries.base import PHRASE
+from src.Dictionaries.base import POS
+
+
+def _dictionary(phrase: str, inflections: str = '', pos: str = '') -> Dictionary:
+    result = Dictionary([HEADER('AH Dictionary'), PHRASE(phrase, '')])
+    result.add(LABEL('n.', inflections))
+    if pos:
+        result.add(POS([(pos, '')]))
+    return result
+
+
+@pytest.mark.parametrize(
+    ('query', 'expected'),
+    (
+        ('Gullible', 'gullible'),
+        ('  "Take  a   Hike";', 'take a hike'),
+        ("'tis", "'tis"),
+        ("goin';", "goin'"),
+    )
+)
+def test_normalize_query(query, expected):
+    assert search.normalize_query(query) == expected
+
+
+def test_normalize_query_case_sensitive_dictionary():
+    assert search.normalize_query(' Weg ', 'diki-de') == 'Weg'
+    assert search.normalize_query(' Weg ', 'diki-en') == 'weg'
+
+
+@pytest.mark.parametrize(
+    ('word', 'lemma'),
+    (
+        ('dogs', 'dog'),
+        ('berries', 'berry'),
+        ('wolves', 'wolf'),
+        ('boxes', 'box'),
+        ('running', 'run'),
+        ('liked', 'like'),
+        ('bigger', 'big'),
+        ('gullibly', 'gullible'),
+        ('happily', 'happy'),
+    )
+)
+def test_lemmatize(word, lemma):
+    assert lemma in search.lemmatize(word)
+
+
+@pytest.mark.parametrize('word', ('is', 'as', 'dog'))
+def test_lemmatize_no_candidates(word):
+    assert search.lemmatize(word) == []
+
+
+def test_parse_strips_punctuation():
+    result = search.parse('"dog" -ahd, ;cat;')
+    assert result is not None
+    assert [(x.query, x.dict_flags) for x in result] == [('dog', ['ahd']), ('cat', [])]
+
+
+def test_cached_lemma_alias():
+    dog = _dictionary('dog', 'dogs', 'dogged adj.')
+    new = _dictionary('new', 'newer, newest')
+    db: search.db_t = {'ahddog': dog, 'ahdnew': new}
+
+    assert search.cached('ahd', 'Dog', db) is dog
+    dogs = search.cached('ahd', 'dogs', db)
+    assert dogs.contents == [dog.contents[0], search.REDIRECT_NOTE, *dog.contents[1:]]
+    # Reading the cache doesn't write to it.
+    assert 'ahddogs' not in db
+    assert search.cached('ahd', 'dogged', db).contents == dogs.contents
+
+    # "news" is not listed among the forms of "new".
+    with pytest.raises(KeyError):
+        search.cached('ahd', 'news', db)
+    # Lemmas are not looked up for non-English dictionaries.
+    db['diki-frchat'] = dog
+    with pytest.raises(KeyError):
+        search.cached('diki-fr', 'chats', db)
+
+
+def test_query_caches_redirects_as_aliases(monkeypatch):
+    def lookup(query: str) -> Dictionary:
+        result = Dictionary([HEADER('AH Dictionary')])
+        if query.lower() != 'malicious':
+            result.add(search.REDIRECT_NOTE)
+        result.add(PHRASE('malicious', ''))
+        return result
+
+    monkeypatch.setitem(search.DICTIONARY_LOOKUP, 'ahd', lookup)
+    db: search.db_t = {}
+    redirected = search._query('ahd', 'maliciously', db)
+    assert search.REDIRECT_NOTE in redirected.contents
+    assert db['ahdmaliciously'] == search.Alias('ahdmalicious')
+
+    canonical = search._query('ahd', 'Malicious', db)
+    assert search.REDIRECT_NOTE not in canonical.contents
+    assert search._query('ahd', 'maliciously', db).contents == redirected.contents
+    assert len(db) == 2
+
+
+
+def test_query_redirect_in_later_section_is_not_canonical(monkeypatch):
+    def lookup(query: str) -> Dictionary:
+        return Dictionary([
+            HEADER('Diki'), PHRASE('pies', ''),
+            HEADER('Diki'), search.REDIRECT_NOTE, PHRASE('pie', ''),
+        ])
+
+    monkeypatch.setitem(search.DICTIONARY_LOOKUP, 'diki-en', lookup)
+    db: search.db_t = {}
+    result = search._query('diki-en', 'pies', db)
+    assert db == {'diki-enpies': result}
+
+def test_query_caches_normalized(monkeypatch):
+    calls = []
+
+    def lookup(query: str) -> Dictionary:
+        calls.append(query)
+        return _dictionary(query)
+
+    monkeypatch.setitem(search.DICTIONARY_LOOKUP, 'ahd', lookup)
+    db: search.db_t = {}
+    first = search._query('ahd', 'Gullible', db)
+    assert search._query('ahd', 'gullible ', db) is first
+    assert calls == ['Gullible']
+    assert list(db) == ['ahdgullible']
+
+
+class _Status:
+    def __init__(self) -> None:
+        self.lines: list[tuple[str, str | None]] = []
+
+    def writeln(self, header: str, body: str | None = None) -> None:
+        self.lines.append((header, body))
+
+    error = success = attention = writeln
+
+    def clear(self) -> None:
+        self.lines.clear()
+
+
+def test_suggest_and_prefetch_correction(monkeypatch, tmp_path):
+    calls = []
+
+    def lookup(query: str) -> Dictionary:
+        calls.append(query)
+        return _dictionary(query)
+
+    monkeypatch.setitem(search.DICTIONARY_LOOKUP, 'ahd', lookup)
+    path = tmp_path / 'spelling_words.txt'
+    path.write_text('malicious\nsuggestion\n')
+    corrections = search._Corrections(str(path))
+    monkeypatch.setattr(search, '_corrections', corrections)
+
+    db: search.db_t = {}
+    status = _Status()
+    # The index is built in the background.
+    search.perror_suggest_corrections(status, 'gulible', ['ahd'], db)
+    assert status.lines == []
+    thread = corrections._index_thread
+    assert thread is not None
+    corrections.add(_dictionary('Gullible'))
+    thread.join()
+
+    # Phrases added while the index was being built are saved too.
+    assert path.read_text() == 'malicious\nsuggestion\ngullible\n'
+    corrections.add(_dictionary('gullible'))
+    assert path.read_text() == 'malicious\nsuggestion\ngullible\n'
+
+    db['ahdgullible'] = _dictionary('gullible')
+    search.perror_suggest_corrections(status, 'gulible', ['ahd'], db)
+    search.perror_suggest_corrections(status, 'malicous', ['ahd'], db)
+    assert status.lines == [
+        ('Did you mean:', 'gullible'),
+        ('Did you mean:', 'malicious'),
+    ]
+
+    # "gullible" is cached, only "malicious" had to be prefetched.
+    dictionary = search._query('ahd', 'Malicious', db)
+    assert calls == ['malicious']
+    assert db['ahdmalicious'] is dictionary
+
+    # Corrections that are not searched for are not cached.
+    search.perror_suggest_corrections(status, 'sugestion', ['ahd'], db)
+    corrections.discard({'something else'})
+    assert search._query('ahd', 'something else', db) is db['ahdsomething else']
+    assert 'ahdsuggestion' not in db
+
+
+def test_prefetch_case_sensitive_dictionary(monkeypatch, tmp_path):
+    monkeypatch.setitem(search.DICTIONARY_LOOKUP, 'diki-de', _dictionary)
+    corrections = search._Corrections(str(tmp_path / 'spelling_words.txt'))
+    monkeypatch.setattr(search, '_corrections', corrections)
+
+    db: search.db_t = {}
+    corrections.prefetch('diki-de', 'Weg', db)
+    assert corrections.wait('diki-de' + search.normalize_query('Weg', 'diki-de'))
+
+
+def test_lookup_many(monkeypatch):
+    db: dict[str, Dictionary | search.Alias] = {'ahdcached': _dictionary('cached')}
+    cache = search._Cache()
+    cache._db = db
+    monkeypatch.setattr(search, '_cache', cache)
+
+    def lookup(query: str) -> Dictionary:
+        if query == 'missing':
+            raise DictionaryError('ahd: could not find')
+        return _dictionary(query)
+    monkeypatch.setitem(search.DICTIONARY_LOOKUP, 'ahd', lookup)
+
+    queries = ['a', 'cached', 'missing', *(f'w{i}' for i in range(20))]
+    result = list(search.lookup_many(queries, 'ahd', nworkers=2))
+    assert [query for query, _ in result] == queries
+    assert isinstance(result[2][1], DictionaryError)
+    assert result[1][1] is db['ahdcached']
+    assert 'ahdw19' in db and 'ahdmissing' not in db
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import pytest
+
+from src.spelling import SpellingIndex
+from src.spelling import edit_distance
+
+
+@pytest.mark.parametrize(
+    ('a', 'b', 'expected'),
+    (
+        ('gullible', 'gullible', 0),
+        ('gulible', 'gullible', 1),
+        ('gullibel', 'gullible', 1),
+        ('gulibel', 'gullible', 2),
+        ('dog', 'cat', 3),
+        ('', 'ab', 2),
+    )
+)
+def test_edit_distance(a, b, expected):
+    assert edit_distance(a, b, 3) == expected
+
+
+def test_edit_distance_cutoff():
+    assert edit_distance('abcdefgh', 'hgfedcba', 2) == 3
+
+
+@pytest.fixture
+def index():
+    result = SpellingIndex()
+    result.update(('gullible', 'gull', 'guillemot', 'dog', 'dig', 'take a hike', 'maliciously'))
+    return result
+
+
+@pytest.mark.parametrize(
+    ('word', 'expected'),
+    (
+        ('gulible', ['gullible']),
+        ('gullibel', ['gullible']),
+        ('dgo', ['dog']),
+        ('dug', ['dig', 'dog']),
+        ('take a hkie', ['take a hike']),
+        ('malicously', ['maliciously']),
+        ('cat', []),
+        ('guillotine', []),
+    )
+)
+def test_lookup(index, word, expected):
+    assert index.lookup(word) == expected
+
+
+def test_lookup_closest_first(index):
+    index.add('dug')
+    assert index.lookup('dugg') == ['dug']
+    assert index.lookup('gulls') == ['gull']